@@ -0,0 +1,164 @@
+from functools import partial
+from decimal import Decimal
+import structlog
+from flask import current_app
+from sqlalchemy import event, func, inspect, select, type_coerce
+from src.history import committed_value, track_previous_values
+from src.models.user import db
+from src.models.contract import Budget, BudgetLedgerEntry, Cost
+
+logger = structlog.get_logger()
+
+# A budget's spend is the sum of its approved costs. Every change to that
+# sum, whether a cost is approved, un-approved, re-priced, moved to another
+# budget or deleted, appends a signed entry to budget_ledger and adds the
+# same amount to budgets.spent_budget (recomputing remaining_budget) with a
+# single UPDATE, from the session's flush events and in the same
+# transaction as the cost write. Reading a budget's spend is therefore one
+# row, and spent_budget always equals the sum of its ledger entries.
+#
+# Bulk Query.update()/delete() callers bypass the events; reconcile_budgets()
+# finds (and with repair=True fixes) any budget whose totals drifted from
+# its costs.
+
+MONEY = db.Numeric(14, 2)
+SPENT_STATUS = 'approved'
+
+
+def cost_spend(budget_id, status, amount):
+    """(budget id, amount) a cost in this state counts against, or (None, 0)"""
+    if budget_id is None or status != SPENT_STATUS or amount is None:
+        return None, Decimal('0')
+    return budget_id, Decimal(str(amount))
+
+
+def ledger_entries(cost_id, old, new):
+    """Ledger entries for a cost moving from spend ``old`` to ``new`` (each a cost_spend() pair)"""
+    (old_budget, old_amount), (new_budget, new_amount) = old, new
+    if old_budget is not None and old_budget == new_budget:
+        difference = new_amount - old_amount
+        return [(old_budget, cost_id, difference, 'adjustment')] if difference else []
+    entries = []
+    if old_budget is not None and old_amount:
+        entries.append((old_budget, cost_id, -old_amount, 'reallocation' if new_budget else 'reversal'))
+    if new_budget is not None and new_amount:
+        entries.append((new_budget, cost_id, new_amount, 'reallocation' if old_budget else 'approval'))
+    return entries
+
+
+def apply_ledger_entries(conn, entries):
+    """Append ``[(budget_id, cost_id, amount, reason)]`` to the ledger and move the budgets' running totals"""
+    if not entries:
+        return
+    conn.execute(BudgetLedgerEntry.__table__.insert(), [
+        {'budget_id': budget_id, 'cost_id': cost_id, 'amount': amount, 'reason': reason}
+        for budget_id, cost_id, amount, reason in entries
+    ])
+    totals = {}
+    for budget_id, _, amount, _ in entries:
+        totals[budget_id] = totals.get(budget_id, Decimal('0')) + amount
+    budgets = Budget.__table__
+    for budget_id, amount in totals.items():
+        if not amount:
+            continue
+        spent = func.coalesce(budgets.c.spent_budget, 0) + amount
+        conn.execute(budgets.update().where(budgets.c.id == budget_id).values(
+            spent_budget=spent, remaining_budget=budgets.c.total_budget - spent
+        ))
+
+
+def _budget_balances(conn):
+    """(budget id, spent_budget, ledger total, approved cost total) for every budget"""
+    costs = select(
+        Cost.budget_allocation_id.label('budget_id'), type_coerce(func.sum(Cost.amount), MONEY).label('total')
+    ).where(Cost.status == SPENT_STATUS, Cost.budget_allocation_id.isnot(None)).group_by(
+        Cost.budget_allocation_id
+    ).subquery()
+    ledger = select(
+        BudgetLedgerEntry.budget_id, type_coerce(func.sum(BudgetLedgerEntry.amount), MONEY).label('total')
+    ).group_by(BudgetLedgerEntry.budget_id).subquery()
+    rows = conn.execute(
+        select(Budget.id, Budget.spent_budget, ledger.c.total, costs.c.total)
+        .outerjoin(ledger, ledger.c.budget_id == Budget.id)
+        .outerjoin(costs, costs.c.budget_id == Budget.id)
+        .order_by(Budget.id)
+    ).all()
+    zero = Decimal('0')
+    return [(budget_id, spent or zero, ledger_total or zero, cost_total or zero)
+            for budget_id, spent, ledger_total, cost_total in rows]
+
+
+def _rebase(conn, budget_id, ledger_total, cost_total, reason):
+    budgets = Budget.__table__
+    if cost_total != ledger_total:
+        conn.execute(BudgetLedgerEntry.__table__.insert().values(
+            budget_id=budget_id, amount=cost_total - ledger_total, reason=reason
+        ))
+    conn.execute(budgets.update().where(budgets.c.id == budget_id).values(
+        spent_budget=cost_total, remaining_budget=budgets.c.total_budget - cost_total
+    ))
+
+
+def reconcile_budgets(repair=None):
+    """Check every budget's spent_budget and ledger against its approved costs.
+
+    Returns the budgets that disagree. With ``repair`` (default
+    BUDGET_RECONCILE_REPAIR) each one gets a 'reconciliation' ledger entry
+    for the difference and its running totals reset to match its costs.
+    """
+    if repair is None:
+        repair = current_app.config.get('BUDGET_RECONCILE_REPAIR', False)
+    conn = db.session.connection()
+    mismatches = []
+    for budget_id, spent, ledger_total, cost_total in _budget_balances(conn):
+        if spent == ledger_total == cost_total:
+            continue
+        mismatches.append({'budget_id': budget_id, 'spent_budget': spent, 'ledger_total': ledger_total,
+                           'approved_costs': cost_total})
+        logger.warning("budget_totals_mismatch", budget_id=budget_id, spent_budget=str(spent),
+                       ledger_total=str(ledger_total), approved_costs=str(cost_total), repaired=repair)
+        if repair:
+            _rebase(conn, budget_id, ledger_total, cost_total, 'reconciliation')
+    if repair:
+        db.session.commit()
+    return mismatches
+
+
+def backfill_budget_ledger():
+    """Open the ledger on first start against an existing database"""
+    if db.session.query(BudgetLedgerEntry.id).first() is not None:
+        return
+    conn = db.session.connection()
+    for budget_id, spent, ledger_total, cost_total in _budget_balances(conn):
+        if spent != cost_total:
+            _rebase(conn, budget_id, ledger_total, cost_total, 'opening')
+    db.session.commit()
+
+
+# The ledger needs a cost's old budget, status and amount to reverse it
+track_previous_values(Cost.budget_allocation_id, Cost.status, Cost.amount)
+
+
+def _spend_of(read):
+    return cost_spend(read('budget_allocation_id'), read('status'), read('amount'))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _update_budget_ledger(session, flush_context):
+    entries = []
+    nothing = (None, Decimal('0'))
+    for obj in session.new:
+        if isinstance(obj, Cost):
+            entries.extend(ledger_entries(obj.id, nothing, _spend_of(partial(getattr, obj))))
+    for obj in session.dirty:
+        if isinstance(obj, Cost):
+            state = inspect(obj)
+            old = _spend_of(lambda name: committed_value(state, name))
+            entries.extend(ledger_entries(obj.id, old, _spend_of(partial(getattr, obj))))
+    for obj in session.deleted:
+        if isinstance(obj, Cost):
+            state = inspect(obj)
+            entries.extend(ledger_entries(obj.id, _spend_of(lambda name: committed_value(state, name)), nothing))
+
+    if entries:
+        apply_ledger_entries(session.connection(), entries)
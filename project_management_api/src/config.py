@@ -8,3 +8,39 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Password KDF runs in a bounded process pool; 0 workers hashes inline.
+    # The pool is per gunicorn worker, so the host runs up to
+    # PASSWORD_HASH_WORKERS x gunicorn workers hashes at once
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 64))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5))
+    # last_login writes are buffered and flushed in batches
+    LAST_LOGIN_FLUSH_SIZE = int(os.environ.get('LAST_LOGIN_FLUSH_SIZE', 500))
+    LAST_LOGIN_FLUSH_INTERVAL = float(os.environ.get('LAST_LOGIN_FLUSH_INTERVAL', 5))
+    USER_IMPORT_BATCH_SIZE = int(os.environ.get('USER_IMPORT_BATCH_SIZE', 500))
+    COST_IMPORT_BATCH_SIZE = int(os.environ.get('COST_IMPORT_BATCH_SIZE', 500))
+    # Generated contract numbers: {number} is the sequence value; {year}, {month} and {day} are also available
+    CONTRACT_NUMBER_FORMAT = os.environ.get('CONTRACT_NUMBER_FORMAT', 'CNT-{year}-{number:06d}')
+    CONTRACT_NUMBER_BLOCK_SIZE = int(os.environ.get('CONTRACT_NUMBER_BLOCK_SIZE', 100))
+    PERMISSION_CACHE_TTL = float(os.environ.get('PERMISSION_CACHE_TTL', 60))
+    # Background sweep of expired role assignments; 0 disables the timer
+    ROLE_SWEEP_INTERVAL = float(os.environ.get('ROLE_SWEEP_INTERVAL', 60))
+    ROLE_SWEEP_BATCH_SIZE = int(os.environ.get('ROLE_SWEEP_BATCH_SIZE', 1000))
+    # Deepest level GET /tasks/<id>/tree will descend to
+    TASK_TREE_MAX_DEPTH = int(os.environ.get('TASK_TREE_MAX_DEPTH', 50))
+    TASK_BULK_MAX_ITEMS = int(os.environ.get('TASK_BULK_MAX_ITEMS', 1000))
+    BOARD_COLUMN_MAX_LIMIT = int(os.environ.get('BOARD_COLUMN_MAX_LIMIT', 100))
+    # Full-time hours per week, and the longest window GET /workload covers
+    WORKLOAD_WEEKLY_HOURS = int(os.environ.get('WORKLOAD_WEEKLY_HOURS', 40))
+    WORKLOAD_MAX_WEEKS = int(os.environ.get('WORKLOAD_MAX_WEEKS', 52))
+    # Nightly fold of old daily cost rollups into months; 0 disables the timer
+    COST_ROLLUP_COMPACT_INTERVAL = float(os.environ.get('COST_ROLLUP_COMPACT_INTERVAL', 86400))
+    COST_ROLLUP_DAILY_RETENTION_DAYS = int(os.environ.get('COST_ROLLUP_DAILY_RETENTION_DAYS', 90))
+    # Check of budget running totals against approved costs; 0 disables the timer
+    BUDGET_RECONCILE_INTERVAL = float(os.environ.get('BUDGET_RECONCILE_INTERVAL', 86400))
+    BUDGET_RECONCILE_REPAIR = os.environ.get('BUDGET_RECONCILE_REPAIR', 'false').lower() == 'true'
+    # Exchange rates for ?report_currency=, loaded from a local CSV at startup
+    FX_BASE_CURRENCY = os.environ.get('FX_BASE_CURRENCY', 'USD')
+    FX_RATES_FILE = os.environ.get('FX_RATES_FILE')
+    FX_RATE_CACHE_TTL = float(os.environ.get('FX_RATE_CACHE_TTL', 300))
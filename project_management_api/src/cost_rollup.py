@@ -0,0 +1,185 @@
+from functools import partial
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import structlog
+from flask import current_app
+from sqlalchemy import Date, cast, event, func, inspect, select, type_coerce, union_all
+from src.history import committed_value, track_previous_values
+from src.models.user import db
+from src.models.contract import Cost, CostDailyRollup, CostMonthlyRollup
+
+logger = structlog.get_logger()
+
+# cost_daily_rollup holds cost totals per (project, contract, category,
+# currency, status, day). ORM inserts, updates and deletes of costs adjust it from the
+# session's flush events, in the same transaction as the cost write; bulk
+# Query.update()/delete() callers bypass the events and must call
+# apply_cost_deltas() or rebuild_cost_rollups() themselves.
+#
+# The compaction job folds the daily rows of months that closed more than
+# COST_ROLLUP_DAILY_RETENTION_DAYS ago into cost_monthly_rollup. A later
+# edit to a cost in a compacted month lands as a fresh daily row and is
+# folded in on the next run. Readers always SUM, so a key appearing in more
+# than one row (from that, or from two writers racing to insert it) still
+# adds up correctly.
+
+KEY_COLUMNS = ('project_id', 'contract_id', 'category', 'currency', 'status')
+TRACKED_ATTRIBUTES = KEY_COLUMNS + ('amount', 'date_incurred')
+
+
+def day_of(column):
+    """SQL date of a timestamp column"""
+    if db.engine.dialect.name == 'sqlite':
+        return type_coerce(func.date(column), Date)
+    return cast(column, Date)
+
+
+def month_of(column):
+    """SQL first day of the month of a date column"""
+    if db.engine.dialect.name == 'sqlite':
+        return type_coerce(func.date(column, 'start of month'), Date)
+    return cast(func.date_trunc('month', column), Date)
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def compacted_before(today=None):
+    """First month whose daily rows are kept; earlier months may be compacted"""
+    today = today or datetime.utcnow().date()
+    retention = current_app.config.get('COST_ROLLUP_DAILY_RETENTION_DAYS', 90)
+    return month_start(today - timedelta(days=retention))
+
+
+def add_cost_delta(deltas, key, day, amount, count):
+    """Accumulate ``count`` costs totalling ``amount`` for a rollup key and day into ``deltas``"""
+    if day is None or amount is None:
+        return
+    if isinstance(day, datetime):
+        day = day.date()
+    totals = deltas.setdefault(key + (day,), [Decimal('0'), 0])
+    totals[0] += Decimal(str(amount)) * count
+    totals[1] += count
+
+
+def apply_cost_deltas(conn, deltas):
+    """Apply ``{(project_id, contract_id, category, currency, status, day): [amount, count]}`` to cost_daily_rollup"""
+    rollup = CostDailyRollup.__table__
+    for key, (amount, count) in deltas.items():
+        if not amount and not count:
+            continue
+        match = [rollup.c[name].is_not_distinct_from(value) for name, value in zip(KEY_COLUMNS + ('day',), key)]
+        result = conn.execute(
+            rollup.update().where(*match).values(
+                amount=rollup.c.amount + amount, cost_count=rollup.c.cost_count + count
+            )
+        )
+        if result.rowcount == 0:
+            conn.execute(rollup.insert().values(dict(zip(KEY_COLUMNS + ('day',), key), amount=amount,
+                                                     cost_count=count)))
+
+
+def rebuild_cost_rollups(conn=None):
+    """Recount cost_daily_rollup from costs and empty cost_monthly_rollup"""
+    conn = conn or db.session.connection()
+    costs = Cost.__table__
+    day = day_of(costs.c.date_incurred)
+    keys = [costs.c[name] for name in KEY_COLUMNS]
+    totals = select(*keys, day, func.sum(costs.c.amount), func.count()).where(
+        costs.c.date_incurred.isnot(None)
+    ).group_by(*keys, day)
+    conn.execute(CostMonthlyRollup.__table__.delete())
+    conn.execute(CostDailyRollup.__table__.delete())
+    conn.execute(CostDailyRollup.__table__.insert().from_select(
+        list(KEY_COLUMNS) + ['day', 'amount', 'cost_count'], totals
+    ))
+
+
+def _recreate_outdated_tables():
+    # The rollups are derived data, so a table from before a key column was
+    # added is dropped and rebuilt rather than migrated
+    inspector = inspect(db.engine)
+    for model in (CostDailyRollup, CostMonthlyRollup):
+        existing = {column['name'] for column in inspector.get_columns(model.__tablename__)}
+        if set(model.__table__.columns.keys()) - existing:
+            model.__table__.drop(db.engine)
+            model.__table__.create(db.engine)
+
+
+def backfill_cost_rollups():
+    """Build cost_daily_rollup on first start against an existing database"""
+    _recreate_outdated_tables()
+    if db.session.query(CostDailyRollup.id).first() is None and \
+            db.session.query(CostMonthlyRollup.id).first() is None and \
+            db.session.query(Cost.id).first() is not None:
+        rebuild_cost_rollups()
+        db.session.commit()
+
+
+def compact_cost_rollups(before=None):
+    """Fold daily rollups of months before ``before`` into monthly rows.
+
+    Defaults to compacted_before(). Returns the number of daily rows folded.
+    """
+    before = before or compacted_before()
+    daily = CostDailyRollup.__table__
+    monthly = CostMonthlyRollup.__table__
+    conn = db.session.connection()
+
+    month = month_of(daily.c.day)
+    touched = select(month).where(daily.c.day < before).distinct()
+    rows = union_all(
+        select(*[daily.c[name] for name in KEY_COLUMNS], month.label('month'), daily.c.amount,
+               daily.c.cost_count).where(daily.c.day < before),
+        select(*[monthly.c[name] for name in KEY_COLUMNS], monthly.c.month, monthly.c.amount,
+               monthly.c.cost_count).where(monthly.c.month.in_(touched))
+    ).subquery()
+    keys = [rows.c[name] for name in KEY_COLUMNS] + [rows.c.month]
+    merged = conn.execute(
+        select(*keys, type_coerce(func.sum(rows.c.amount), db.Numeric(14, 2)), func.sum(rows.c.cost_count))
+        .group_by(*keys)
+    ).all()
+
+    conn.execute(monthly.delete().where(monthly.c.month.in_(touched)))
+    folded = conn.execute(daily.delete().where(daily.c.day < before)).rowcount
+    # Buckets whose costs all moved elsewhere net out to nothing
+    records = [dict(zip(KEY_COLUMNS + ('month', 'amount', 'cost_count'), row))
+               for row in merged if row[-1] or row[-2]]
+    if records:
+        conn.execute(monthly.insert(), records)
+    db.session.commit()
+    logger.info("cost_rollups_compacted", before=before.isoformat(), daily_rows=folded, monthly_rows=len(records))
+    return folded
+
+
+# The rollup needs a cost's old key and amount to take it out of its bucket
+track_previous_values(*[getattr(Cost, name) for name in TRACKED_ATTRIBUTES])
+
+
+def _rollup_key(read):
+    return tuple(read(name) for name in KEY_COLUMNS)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _update_cost_rollups(session, flush_context):
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Cost):
+            add_cost_delta(deltas, _rollup_key(partial(getattr, obj)), obj.date_incurred, obj.amount, 1)
+    for obj in session.dirty:
+        if isinstance(obj, Cost):
+            state = inspect(obj)
+            if not any(state.attrs[name].history.has_changes() for name in TRACKED_ATTRIBUTES):
+                continue
+            old = lambda name: committed_value(state, name)
+            add_cost_delta(deltas, _rollup_key(old), old('date_incurred'), old('amount'), -1)
+            add_cost_delta(deltas, _rollup_key(partial(getattr, obj)), obj.date_incurred, obj.amount, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Cost):
+            state = inspect(obj)
+            old = lambda name: committed_value(state, name)
+            add_cost_delta(deltas, _rollup_key(old), old('date_incurred'), old('amount'), -1)
+
+    if deltas:
+        apply_cost_deltas(session.connection(), deltas)
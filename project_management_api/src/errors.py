@@ -1,4 +1,4 @@
-from flask import jsonify
+from flask import jsonify, request
 import structlog
 from functools import wraps
 
@@ -28,6 +28,12 @@ def handle_errors(f):
     return decorated_function
 
 def register_error_handlers(app):
+    @app.errorhandler(HttpException)
+    def handle_http_exception(e):
+        logger.error("http_exception", status_code=e.status_code, message=e.message)
+        response = {"error": e.message}
+        return jsonify(response), e.status_code
+
     @app.errorhandler(404)
     def handle_not_found(e):
         logger.error("not_found", path=request.path)
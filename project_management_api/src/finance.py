@@ -0,0 +1,225 @@
+from datetime import time, timedelta
+from decimal import Decimal
+from sqlalchemy import and_, case, func, literal, select, true, type_coerce, union_all
+from src.errors import HttpException
+from src.models.user import db
+from src.models.contract import Contract, Cost, Budget, CostDailyRollup, CostMonthlyRollup
+from src.cost_rollup import compacted_before, month_start
+from src.fx import check_report_currency, converted_on, converted_today
+
+# Financial totals computed by the database.
+#
+# Every figure is a SUM/COUNT aggregate over contracts, costs and budgets,
+# so no rows are loaded into Python, and sums come back as exact Decimals
+# (money columns are Numeric; summing them as floats drifts on large
+# ledgers). Date filters apply to costs only, by date_incurred.
+#
+# Cost figures are read from the daily and monthly rollups (see
+# src/cost_rollup.py) whenever they can answer the question exactly: date
+# bounds given as whole days that do not cut through an already compacted
+# month. On either path a date_to given as a bare date includes that whole
+# day. Otherwise, and for vendor
+# breakdowns, which the rollups do not key on, they come from raw costs.
+#
+# With a report currency every amount is converted inside the same
+# aggregates (see src/fx.py): costs at the rate effective on the day they
+# were incurred, contract values and budgets at today's rates. Monthly
+# rollups no longer know the day, so converted totals only use the rollups
+# for windows that start after the last month that may be compacted, and
+# read raw costs otherwise; the answer does not change when compaction
+# runs. Amounts are otherwise summed as stored, whatever their currency.
+
+MONEY = db.Numeric(14, 2)
+CENT = Decimal('0.01')
+GROUP_BY = ('project', 'category', 'month', 'vendor')
+MONEY_KEYS = ('total_contract_value', 'total_approved_costs', 'total_pending_costs', 'total_budget_allocated')
+
+
+def _money_sum(expression):
+    return type_coerce(func.coalesce(func.sum(expression), 0), MONEY)
+
+
+def _unconverted(amount, value):
+    return func.coalesce(func.sum(case((and_(amount.isnot(None), value.is_(None)), 1), else_=0)), 0)
+
+
+def _result(row, report_currency):
+    """A result row as a dict, refusing totals that silently dropped unconvertible amounts"""
+    row = dict(row)
+    unconverted = sum(row.pop(key) for key in list(row) if key.endswith('_unconverted'))
+    if unconverted:
+        raise HttpException(400, f'Missing exchange rates to convert {unconverted} amounts to {report_currency}')
+    if report_currency:
+        for key in MONEY_KEYS:
+            if key in row:
+                row[key] = row[key].quantize(CENT)
+    return row
+
+
+def _month(column):
+    if db.engine.dialect.name == 'sqlite':
+        return func.strftime('%Y-%m', column)
+    return func.to_char(column, 'YYYY-MM')
+
+
+def _contract_totals(project_id, report_currency):
+    value = converted_today(Contract.total_value, Contract.currency, report_currency)
+    query = select(_money_sum(value).label('total_contract_value'), func.count(Contract.id).label('contract_count'))
+    if report_currency:
+        query = query.add_columns(_unconverted(Contract.total_value, value).label('contract_unconverted'))
+    if project_id:
+        query = query.where(Contract.project_id == project_id)
+    return query
+
+
+def _rollups_cover(date_from, date_to, daily_only=False):
+    cutoff = compacted_before()
+    if daily_only and (date_from is None or date_from.date() < cutoff):
+        return False
+    for bound, aligned in ((date_from, lambda day: day.day == 1),
+                           (date_to, lambda day: (day + timedelta(days=1)).day == 1)):
+        if bound is None:
+            continue
+        if bound.time() != time(0):
+            return False
+        if not aligned(bound.date()) and month_start(bound) < cutoff:
+            return False
+    return True
+
+
+def _rollup_rows(project_id, date_from, date_to):
+    daily, monthly = CostDailyRollup, CostMonthlyRollup
+    parts = []
+    for model, period in ((daily, daily.day), (monthly, monthly.month)):
+        part = select(model.project_id, model.category, model.status, _month(period).label('month'),
+                      model.currency, period.label('rate_date'), model.amount, model.cost_count)
+        if project_id:
+            part = part.where(model.project_id == project_id)
+        if date_from:
+            part = part.where(period >= date_from.date())
+        if date_to:
+            part = part.where(period <= date_to.date())
+        parts.append(part)
+    return union_all(*parts).subquery()
+
+
+def _before_end_of(column, date_to):
+    # A date_to at midnight (a bare date) includes that whole day, as it
+    # does on the rollup path
+    if date_to.time() == time(0):
+        return column < date_to + timedelta(days=1)
+    return column <= date_to
+
+
+def _raw_cost_rows(project_id, date_from, date_to):
+    query = select(Cost.project_id, Cost.category, Cost.vendor, Cost.status,
+                   _month(Cost.date_incurred).label('month'), Cost.currency, Cost.date_incurred.label('rate_date'),
+                   Cost.amount, literal(1).label('cost_count'))
+    if project_id:
+        query = query.where(Cost.project_id == project_id)
+    if date_from:
+        query = query.where(Cost.date_incurred >= date_from)
+    if date_to:
+        query = query.where(_before_end_of(Cost.date_incurred, date_to))
+    return query.subquery()
+
+
+def _cost_rows(project_id, date_from, date_to, report_currency=None, by_vendor=False):
+    """Subquery of per-cost or pre-aggregated cost rows to total"""
+    if not by_vendor and _rollups_cover(date_from, date_to, daily_only=report_currency is not None):
+        return _rollup_rows(project_id, date_from, date_to)
+    return _raw_cost_rows(project_id, date_from, date_to)
+
+
+def _cost_totals(rows, report_currency):
+    value = converted_on(rows.c.amount, rows.c.currency, rows.c.rate_date, report_currency)
+    query = select(
+        _money_sum(case((rows.c.status == 'approved', value), else_=0)).label('total_approved_costs'),
+        _money_sum(case((rows.c.status == 'pending', value), else_=0)).label('total_pending_costs'),
+        func.coalesce(func.sum(rows.c.cost_count), 0).label('cost_count')
+    ).select_from(rows)
+    if report_currency:
+        query = query.add_columns(_unconverted(rows.c.amount, value).label('cost_unconverted'))
+    return query
+
+
+def _budget_totals(project_id, report_currency):
+    value = converted_today(Budget.total_budget, Budget.currency, report_currency)
+    query = select(
+        _money_sum(case((Budget.approval_status == 'approved', value), else_=0)).label('total_budget_allocated'),
+        func.count(Budget.id).label('budget_count')
+    )
+    if report_currency:
+        query = query.add_columns(_unconverted(Budget.total_budget, value).label('budget_unconverted'))
+    if project_id:
+        query = query.where(Budget.project_id == project_id)
+    return query
+
+
+def _with_utilization(totals):
+    approved, allocated = totals['total_approved_costs'], totals['total_budget_allocated']
+    totals['budget_utilization'] = (approved / allocated * 100).quantize(CENT) if allocated else Decimal('0.00')
+    return totals
+
+
+def _project_breakdown(project_id, date_from, date_to, report_currency):
+    # One grouped pass per table, merged on project_id
+    groups = {}
+    costs = _cost_rows(project_id, date_from, date_to, report_currency)
+    for query, column in ((_contract_totals(project_id, report_currency), Contract.project_id),
+                          (_cost_totals(costs, report_currency), costs.c.project_id),
+                          (_budget_totals(project_id, report_currency), Budget.project_id)):
+        result = db.session.execute(query.add_columns(column.label('project_id')).group_by(column))
+        for row in result.mappings():
+            groups.setdefault(row['project_id'], {'project_id': row['project_id']}).update(
+                _result(row, report_currency)
+            )
+    empty = {
+        'total_contract_value': Decimal('0.00'), 'contract_count': 0,
+        'total_approved_costs': Decimal('0.00'), 'total_pending_costs': Decimal('0.00'), 'cost_count': 0,
+        'total_budget_allocated': Decimal('0.00'), 'budget_count': 0
+    }
+    return [_with_utilization({**empty, **groups[key]})
+            for key in sorted(groups, key=lambda key: (key is None, key or ''))]
+
+
+def _cost_breakdown(group_by, project_id, date_from, date_to, report_currency):
+    costs = _cost_rows(project_id, date_from, date_to, report_currency, by_vendor=group_by == 'vendor')
+    key = costs.c[group_by]
+    rows = db.session.execute(
+        _cost_totals(costs, report_currency).add_columns(key).group_by(key).order_by(key.is_(None), key)
+    ).mappings()
+    return [{group_by: row[group_by], 'total_approved_costs': row['total_approved_costs'],
+             'total_pending_costs': row['total_pending_costs'], 'cost_count': row['cost_count']}
+            for row in (_result(row, report_currency) for row in rows)]
+
+
+def financial_summary(project_id=None, date_from=None, date_to=None, group_by=None, report_currency=None):
+    """Contract, cost and budget totals, optionally broken down by ``group_by`` and in ``report_currency``"""
+    if group_by and group_by not in GROUP_BY:
+        raise HttpException(400, f"group_by must be one of: {', '.join(GROUP_BY)}")
+    report_currency = check_report_currency(report_currency)
+
+    # The three one-row aggregates cross-joined into a single statement
+    contracts = _contract_totals(project_id, report_currency).subquery()
+    costs = _cost_totals(_cost_rows(project_id, date_from, date_to, report_currency), report_currency).subquery()
+    budgets = _budget_totals(project_id, report_currency).subquery()
+    row = _result(db.session.execute(
+        select(contracts, costs, budgets).select_from(contracts.join(costs, true()).join(budgets, true()))
+    ).mappings().one(), report_currency)
+    summary = _with_utilization({
+        'currency': report_currency,
+        'total_contract_value': row['total_contract_value'],
+        'total_approved_costs': row['total_approved_costs'],
+        'total_pending_costs': row['total_pending_costs'],
+        'total_budget_allocated': row['total_budget_allocated'],
+        'contract_count': row['contract_count'],
+        'cost_count': row['cost_count'],
+        'budget_count': row['budget_count']
+    })
+
+    if group_by == 'project':
+        summary['breakdown'] = _project_breakdown(project_id, date_from, date_to, report_currency)
+    elif group_by:
+        summary['breakdown'] = _cost_breakdown(group_by, project_id, date_from, date_to, report_currency)
+    return summary
@@ -0,0 +1,185 @@
+"""Exchange rates for reporting amounts in one currency.
+
+Rates live in the fx_rates table, loaded from a local CSV file with
+``currency,effective_date,rate`` rows (rate = units of FX_BASE_CURRENCY per
+unit of currency; a rate holds from its effective_date until the next one).
+FX_RATES_FILE is loaded at startup, or reload one by hand with:
+
+    python -m src.fx rates.csv
+
+Conversions happen inside the aggregate queries: dated amounts look up the
+rate effective on their date with a correlated subquery against fx_rates,
+and undated ones (contract values, budgets) use today's rates, which the
+in-process cache resolves into a CASE over the currency column.
+"""
+import csv
+import os
+import sys
+import threading
+import time
+from bisect import bisect_right
+from datetime import date
+from decimal import Decimal, InvalidOperation
+import structlog
+from flask import current_app
+from sqlalchemy import case, func, literal, select
+from src.errors import HttpException
+from src.models.user import db
+from src.models.contract import FxRate
+
+logger = structlog.get_logger()
+
+
+def base_currency():
+    return current_app.config.get('FX_BASE_CURRENCY', 'USD')
+
+
+def read_rates_file(path):
+    """Parse a rates CSV into FxRate column dicts, raising ValueError on the first bad row"""
+    records = {}
+    with open(path, newline='') as handle:
+        for line, row in enumerate(csv.DictReader(handle), start=2):
+            try:
+                currency = row['currency'].strip().upper()
+                effective_date = date.fromisoformat(row['effective_date'].strip())
+                rate = Decimal(row['rate'].strip())
+            except (KeyError, AttributeError, ValueError, InvalidOperation):
+                raise ValueError(f'{path}:{line}: expected currency,effective_date,rate')
+            if len(currency) != 3 or rate <= 0:
+                raise ValueError(f'{path}:{line}: invalid currency or rate')
+            records[currency, effective_date] = {'currency': currency, 'effective_date': effective_date,
+                                                 'rate': rate}
+    return list(records.values())
+
+
+def load_fx_rates(path):
+    """Replace the fx_rates table with the contents of a rates file; returns the row count"""
+    records = read_rates_file(path)
+    db.session.execute(FxRate.__table__.delete())
+    if records:
+        db.session.execute(FxRate.__table__.insert(), records)
+    db.session.commit()
+    fx_rates.invalidate()
+    logger.info("fx_rates_loaded", path=path, count=len(records))
+    return len(records)
+
+
+class FxRateCache:
+    """Per-process copy of fx_rates, reloaded after FX_RATE_CACHE_TTL seconds"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rates = None
+        self._valid_until = 0
+
+    def _table(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._rates is None or now >= self._valid_until:
+                rates = {}
+                rows = db.session.execute(
+                    select(FxRate.currency, FxRate.effective_date, FxRate.rate)
+                    .order_by(FxRate.currency, FxRate.effective_date)
+                )
+                for currency, effective_date, rate in rows:
+                    dates, values = rates.setdefault(currency, ([], []))
+                    dates.append(effective_date)
+                    values.append(rate)
+                self._rates = rates
+                self._valid_until = now + current_app.config.get('FX_RATE_CACHE_TTL', 300)
+            return self._rates
+
+    def currencies(self):
+        return set(self._table()) | {base_currency()}
+
+    def rate(self, currency, on=None):
+        """Base currency units per unit of ``currency`` on a date (today by default), or None"""
+        if currency is None or currency == base_currency():
+            return Decimal('1')
+        dates, values = self._table().get(currency, ((), ()))
+        index = bisect_right(dates, on or date.today())
+        return values[index - 1] if index else None
+
+    def rates_on(self, on=None):
+        """{currency: rate} for every currency with a rate effective on a date"""
+        rates = {currency: self.rate(currency, on) for currency in self._table()}
+        return {currency: rate for currency, rate in rates.items() if rate is not None}
+
+    def invalidate(self):
+        with self._lock:
+            self._rates = None
+
+
+fx_rates = FxRateCache()
+
+
+def check_report_currency(currency):
+    """Normalize a ?report_currency= value, rejecting currencies without a rate in effect today"""
+    if not currency:
+        return None
+    currency = currency.upper()
+    if currency not in fx_rates.currencies():
+        raise HttpException(400, f'No exchange rates loaded for {currency}')
+    # Undated amounts convert at today's rates, so a currency whose rates all start later cannot report
+    if fx_rates.rate(currency) is None:
+        raise HttpException(400, f'No exchange rate in effect today for {currency}')
+    return currency
+
+
+def _rate_at(currency, on):
+    """SQL: rate of ``currency`` (a column or literal) effective on the date expression ``on``"""
+    return case(
+        (func.coalesce(currency, base_currency()) == base_currency(), literal(Decimal('1'), FxRate.rate.type)),
+        else_=select(FxRate.rate).where(FxRate.currency == currency, FxRate.effective_date <= on)
+        .order_by(FxRate.effective_date.desc()).limit(1).scalar_subquery()
+    )
+
+
+def converted_on(amount, currency, on, report_currency):
+    """SQL: ``amount`` in ``currency`` converted at the rates effective on ``on``; NULL when a rate is missing"""
+    if report_currency is None:
+        return amount
+    value = amount * _rate_at(currency, on)
+    if report_currency != base_currency():
+        value = value / _rate_at(literal(report_currency), on)
+    return value
+
+
+def converted_today(amount, currency, report_currency):
+    """SQL: ``amount`` in ``currency`` converted at today's cached rates; NULL when a rate is missing"""
+    if report_currency is None:
+        return amount
+    rates = fx_rates.rates_on()
+    rates[base_currency()] = Decimal('1')
+    report_rate = rates[report_currency]
+    factors = {currency: rate / report_rate for currency, rate in rates.items()}
+    return amount * case(factors, value=func.coalesce(currency, base_currency()), else_=None)
+
+
+def init_fx_rates(app):
+    """Load FX_RATES_FILE into fx_rates, if one is configured"""
+    path = app.config.get('FX_RATES_FILE')
+    if not path:
+        return
+    with app.app_context():
+        if os.path.exists(path):
+            load_fx_rates(path)
+        else:
+            logger.warning("fx_rates_file_missing", path=path)
+
+
+def main():
+    from src.main import create_app
+    from src.config import Config
+
+    if len(sys.argv) != 2:
+        print('usage: python -m src.fx RATES.csv')
+        return 2
+    app = create_app(Config)
+    with app.app_context():
+        print(f'{load_fx_rates(sys.argv[1])} rates loaded')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
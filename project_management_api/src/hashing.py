@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import structlog
+from flask import current_app
+from prometheus_client import Counter, Gauge, Histogram
+from werkzeug.security import generate_password_hash, check_password_hash
+from src.errors import HttpException
+
+logger = structlog.get_logger()
+
+HASH_PENDING = Gauge(
+    'password_hash_pending',
+    'Password hash/verify jobs admitted to the executor and not yet finished'
+)
+HASH_REJECTED = Counter(
+    'password_hash_rejected_total',
+    'Password hash/verify jobs rejected because the executor queue was full',
+    ['operation']
+)
+HASH_WAIT = Histogram(
+    'password_hash_queue_wait_seconds',
+    'Time spent waiting for a slot in the password hashing executor',
+    ['operation']
+)
+HASH_DURATION = Histogram(
+    'password_hash_duration_seconds',
+    'Time from admission to result for password hash/verify jobs',
+    ['operation']
+)
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+class PasswordHasher:
+    """Runs the deliberately slow password KDF in a bounded process pool.
+
+    At most PASSWORD_HASH_WORKERS jobs run at once and at most
+    PASSWORD_HASH_QUEUE_SIZE more wait for a slot; a caller that cannot get
+    a slot within PASSWORD_HASH_QUEUE_TIMEOUT seconds gets a 503 rather
+    than piling more CPU work onto the host. PASSWORD_HASH_WORKERS=0 hashes
+    inline on the request thread. The pool is created lazily per process so
+    it survives gunicorn forking its workers, which also means every limit
+    here is per worker: keep PASSWORD_HASH_WORKERS small (the default is 2)
+    so gunicorn workers x hash workers stays within the host's cores.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._methods = {}
+
+    def _get_executor(self):
+        config = current_app.config
+        with self._lock:
+            if self._pid != os.getpid():
+                workers = config.get('PASSWORD_HASH_WORKERS', 2)
+                self._executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+                self._slots = threading.BoundedSemaphore(workers + config.get('PASSWORD_HASH_QUEUE_SIZE', 0))
+                self._pid = os.getpid()
+            return self._executor, self._slots
+
+    @contextmanager
+    def _admitted(self, operation, slots):
+        started = time.monotonic()
+        if not slots.acquire(timeout=current_app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5)):
+            HASH_REJECTED.labels(operation).inc()
+            logger.warning("password_hash_rejected", operation=operation)
+            raise HttpException(503, 'Authentication service is busy, please retry')
+        HASH_WAIT.labels(operation).observe(time.monotonic() - started)
+        HASH_PENDING.inc()
+        try:
+            yield
+        finally:
+            HASH_PENDING.dec()
+            slots.release()
+            HASH_DURATION.labels(operation).observe(time.monotonic() - started)
+
+    def _run(self, operation, fn, *args):
+        executor, slots = self._get_executor()
+        if executor is None:
+            return fn(*args)
+        with self._admitted(operation, slots):
+            return executor.submit(fn, *args).result()
+
+    def hash(self, password):
+        """Hash a password with the configured PASSWORD_HASH_METHOD"""
+        return self._run('hash', _hash, password, current_app.config.get('PASSWORD_HASH_METHOD', 'scrypt'))
+
+    def hash_many(self, passwords):
+        """Hash a batch of passwords across all pool workers.
+
+        The whole batch takes a single admission slot, so bulk imports cannot
+        starve interactive logins of queue space.
+        """
+        method = current_app.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+        executor, slots = self._get_executor()
+        if executor is None:
+            return [_hash(password, method) for password in passwords]
+        workers = current_app.config.get('PASSWORD_HASH_WORKERS', 2)
+        chunksize = max(1, len(passwords) // (workers * 4))
+        with self._admitted('hash_many', slots):
+            return list(executor.map(_hash, passwords, [method] * len(passwords), chunksize=chunksize))
+
+    def verify(self, pwhash, password):
+        """Check a password against a stored hash"""
+        return self._run('verify', _verify, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Whether a stored hash was made with different parameters than the configured method"""
+        method = current_app.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+        if method not in self._methods:
+            # Werkzeug expands a bare method name with its current defaults,
+            # so read the full parameter string off a throwaway hash
+            self._methods[method] = generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._methods[method]
+
+
+password_hasher = PasswordHasher()
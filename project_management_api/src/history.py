@@ -0,0 +1,29 @@
+from sqlalchemy import event
+
+# Helpers for flush listeners that maintain derived data (task stats, cost
+# rollups, budget totals) and so need each changed row's committed values.
+
+
+def committed_value(state, name):
+    """Value an attribute had when last loaded or flushed"""
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return state.attrs[name].value
+
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+def track_previous_values(*attributes):
+    """Make setting these attributes load their old value first.
+
+    Setting an expired attribute normally skips loading what it held, which
+    leaves committed_value() nothing to report.
+    """
+    for attribute in attributes:
+        if not event.contains(attribute, 'set', _load_previous_value):
+            event.listen(attribute, 'set', _load_previous_value, active_history=True, retval=True)
@@ -0,0 +1,116 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+import structlog
+from flask import current_app
+from src.models.user import db
+from src.models.lease import JobLease
+from src.models.role import UserRole
+from src.permissions import permission_resolver
+from src.cost_rollup import compact_cost_rollups
+from src.budget_ledger import reconcile_budgets
+
+logger = structlog.get_logger()
+
+
+class PeriodicJob:
+    """Runs a function every ``interval`` seconds in one worker at a time.
+
+    Each gunicorn worker starts its own timer thread (lazily, on its first
+    request, because threads do not survive fork). Before running, a worker
+    must win the job's JobLease row. A successful run keeps the lease for
+    the rest of its ``interval``, so however many workers' timers fire in
+    that window the job runs once per interval; a failed run hands it back
+    so another worker can retry. The lease outlives a crashed holder by at
+    most ``interval``.
+    """
+
+    def __init__(self, app, name, interval, fn):
+        self.app = app
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        threading.Thread(target=self._loop, name=f'job-{self.name}', daemon=True).start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            self.run_once()
+
+    def run_once(self):
+        """Run the job now if this worker can take the lease; returns its result"""
+        with self.app.app_context():
+            try:
+                if not JobLease.acquire(self.name, self.owner, max(self.interval, 1)):
+                    return None
+                try:
+                    return self.fn()
+                except Exception:
+                    db.session.rollback()
+                    JobLease.release(self.name, self.owner)
+                    raise
+            except Exception as e:
+                db.session.rollback()
+                logger.exception("periodic_job_failed", job=self.name, exc_info=e)
+                return None
+            finally:
+                db.session.remove()
+
+
+def expire_role_assignments(batch_size=None):
+    """Flip active assignments past their expires_at to 'expired' in batches.
+
+    Each batch reads due ids through the (status, expires_at) index and
+    expires them with a single UPDATE ... WHERE id IN (...). Returns the
+    number of assignments expired.
+    """
+    batch_size = batch_size or current_app.config.get('ROLE_SWEEP_BATCH_SIZE', 1000)
+    now = datetime.utcnow()
+    expired = 0
+    while True:
+        due = db.session.query(UserRole.id, UserRole.user_id).filter(
+            UserRole.status == 'active',
+            UserRole.expires_at <= now
+        ).limit(batch_size).all()
+        if not due:
+            return expired
+        UserRole.query.filter(
+            UserRole.id.in_([row.id for row in due]),
+            UserRole.status == 'active'
+        ).update({'status': 'expired'}, synchronize_session=False)
+        db.session.commit()
+        for user_id in {row.user_id for row in due}:
+            permission_resolver.invalidate_user(user_id)
+        expired += len(due)
+        logger.info("role_assignments_expired", count=len(due))
+
+
+def init_jobs(app):
+    jobs = [
+        PeriodicJob(app, 'expire_role_assignments', app.config.get('ROLE_SWEEP_INTERVAL', 60),
+                    expire_role_assignments),
+        PeriodicJob(app, 'compact_cost_rollups', app.config.get('COST_ROLLUP_COMPACT_INTERVAL', 86400),
+                    compact_cost_rollups),
+        PeriodicJob(app, 'reconcile_budgets', app.config.get('BUDGET_RECONCILE_INTERVAL', 86400),
+                    reconcile_budgets),
+    ]
+    app.extensions['jobs'] = {job.name: job for job in jobs}
+
+    @app.before_request
+    def start_jobs():
+        for job in jobs:
+            job.ensure_started()
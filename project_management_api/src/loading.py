@@ -0,0 +1,103 @@
+from flask import request
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from src.errors import HttpException
+
+
+def eager_load(model, *paths):
+    """Build loader options for the relationships a route is going to serialize.
+
+    Each path names a relationship on ``model``, dotted for nested ones
+    (``'role.parent_role'``). Many-to-one hops are joined into the main
+    SELECT; collections get one extra SELECT ... IN per hop. Either way the
+    number of queries no longer grows with the number of rows:
+
+        UserRole.query.options(*eager_load(UserRole, 'user'))
+    """
+    options = []
+    for path in paths:
+        option = None
+        current = model
+        for name in path.split('.'):
+            relationship = inspect(current).relationships[name]
+            attribute = getattr(current, name)
+            if option is None:
+                option = selectinload(attribute) if relationship.uselist else joinedload(attribute)
+            elif relationship.uselist:
+                option = option.selectinload(attribute)
+            else:
+                option = option.joinedload(attribute)
+            current = relationship.mapper.class_
+        options.append(option)
+    return options
+
+
+def requested_includes(*allowed):
+    """Parse ``?include=a,b`` (or its alias ``?expand=``) against the names a route supports"""
+    raw = request.args.get('include') or request.args.get('expand') or ''
+    names = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = names - set(allowed)
+    if unknown:
+        raise HttpException(400, f"Unknown include: {', '.join(sorted(unknown))}")
+    return names
+
+
+def requested_fields(model, list_view=False):
+    """Column keys a request asked for with ``?fields=a,b``, or None for all.
+
+    Without ``?fields`` a list view still skips the large text columns the
+    model names in ``__list_deferred__``; a detail view loads everything.
+    """
+    columns = [attr.key for attr in inspect(model).column_attrs]
+    raw = request.args.get('fields')
+    if raw is None:
+        if list_view and getattr(model, '__list_deferred__', None):
+            return {key for key in columns if key not in model.__list_deferred__}
+        return None
+    fields = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = fields - set(columns)
+    if unknown:
+        raise HttpException(400, f"Unknown field: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def load_fields(model, fields, *extra):
+    """Loader options narrowing the SELECT to ``fields`` (plus ``extra`` keys the route needs)"""
+    if fields is None:
+        return []
+    return [load_only(*[getattr(model, key) for key in sorted(set(fields) | set(extra))])]
+
+
+class _LoadedView:
+    """Read-only view of an instance whose unloaded columns read as None.
+
+    Serializers passed to sparse() must therefore handle None in every
+    column, including ones that are NOT NULL in the database.
+    """
+
+    def __init__(self, obj, hidden):
+        self._obj = obj
+        self._hidden = hidden
+
+    def __getattr__(self, name):
+        if name in self._hidden:
+            return None
+        return getattr(self._obj, name)
+
+
+def sparse(serializer, fields):
+    """Wrap a ``Model.to_dict``-style serializer so it only emits ``fields``.
+
+    Column keys outside ``fields`` are dropped from the output and are never
+    read from the instance, so deferred columns are not lazy-loaded one row
+    at a time. Keys that are not columns (counts, includes) pass through.
+    """
+    if fields is None:
+        return serializer
+
+    def serialize(obj):
+        columns = {attr.key for attr in inspect(type(obj)).column_attrs}
+        hidden = columns - set(fields) - {'id'}
+        data = serializer(_LoadedView(obj, hidden))
+        return {key: value for key, value in data.items() if key not in hidden}
+    return serialize
@@ -5,7 +5,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory
 from flask_cors import CORS
-from src.models.user import db
+from src.models.user import db, UserSkill
 from prometheus_flask_exporter import PrometheusMetrics
 from src.routes.user import user_bp
 from flask_jwt_extended import JWTManager
@@ -16,6 +16,14 @@ from src.routes.ai_model import ai_model_bp
 from src.config import Config
 from src.logging import configure_logging
 from src.errors import register_error_handlers
+from src.search import init_search
+from src.write_behind import init_last_login_buffer
+from src.schema import ensure_indexes
+from src.jobs import init_jobs
+from src.task_stats import backfill_task_stats
+from src.cost_rollup import backfill_cost_rollups
+from src.budget_ledger import backfill_budget_ledger
+from src.fx import init_fx_rates
 import structlog
 from flask import request
 
@@ -45,13 +53,28 @@ def create_app(config_object=Config):
     db.init_app(app)
 
     # Import all models to ensure they are registered
-    from src.models.role import Role, UserRole
-    from src.models.project import Project, Task, ProjectTeam
-    from src.models.contract import Contract, Cost, Budget
+    from src.models.role import Role, RoleClosure, UserRole
+    from src.models.project import Project, Task, TaskDependency, ProjectTeam, ProjectTaskStats
+    from src.models.contract import Contract, Cost, Budget, CostDailyRollup, CostMonthlyRollup
+    from src.models.contract import BudgetLedgerEntry, FxRate
     from src.models.ai_model import AIModel, Dataset, Report, Metrics
+    from src.models.lease import JobLease
+    from src.models.sequence import SequenceCounter
 
     with app.app_context():
         db.create_all()
+        ensure_indexes()
+        UserSkill.backfill()
+        RoleClosure.backfill()
+        backfill_task_stats()
+        backfill_cost_rollups()
+        backfill_budget_ledger()
+        TaskDependency.backfill()
+
+    init_search(app)
+    init_fx_rates(app)
+    init_last_login_buffer(app)
+    init_jobs(app)
 
     @app.before_request
     def log_request():
@@ -4,6 +4,15 @@ import uuid
 
 class AIModel(db.Model):
     __tablename__ = 'ai_models'
+    __searchable__ = ['name', 'description']
+    __list_deferred__ = ['hyperparameters', 'performance_metrics', 'monitoring_metrics', 'bias_assessment',
+                         'explainability_report']
+    __table_args__ = (
+        db.Index('ix_ai_models_project', 'project_id'),
+        db.Index('ix_ai_models_training_dataset', 'training_dataset_id'),
+        db.Index('ix_ai_models_validation_dataset', 'validation_dataset_id'),
+        db.Index('ix_ai_models_test_dataset', 'test_dataset_id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(200), nullable=False)
@@ -76,6 +85,11 @@ class AIModel(db.Model):
 
 class Dataset(db.Model):
     __tablename__ = 'datasets'
+    __searchable__ = ['name', 'description']
+    __list_deferred__ = ['data_schema', 'preprocessing_steps', 'data_lineage', 'access_permissions']
+    __table_args__ = (
+        db.Index('ix_datasets_project', 'project_id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(200), nullable=False)
@@ -143,6 +157,10 @@ class Dataset(db.Model):
 
 class Report(db.Model):
     __tablename__ = 'reports'
+    __list_deferred__ = ['data_sources', 'metrics', 'visualizations', 'insights', 'recommendations']
+    __table_args__ = (
+        db.Index('ix_reports_project', 'project_id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     title = db.Column(db.String(200), nullable=False)
@@ -200,6 +218,11 @@ class Report(db.Model):
 
 class Metrics(db.Model):
     __tablename__ = 'metrics'
+    __table_args__ = (
+        db.Index('ix_metrics_project_date', 'project_id', 'measurement_date'),
+        db.Index('ix_metrics_user_date', 'user_id', 'measurement_date'),
+        db.Index('ix_metrics_name_date', 'metric_name', 'measurement_date'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     project_id = db.Column(db.String(36), db.ForeignKey('projects.id'))
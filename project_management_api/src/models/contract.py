@@ -4,6 +4,15 @@ import uuid
 
 class Contract(db.Model):
     __tablename__ = 'contracts'
+    __searchable__ = ['title', 'contract_number', 'description']
+    __list_deferred__ = ['payment_schedule', 'milestones', 'deliverables', 'terms_and_conditions',
+                         'penalty_clauses', 'bonus_clauses', 'intellectual_property_terms',
+                         'confidentiality_terms', 'termination_conditions', 'renewal_options', 'amendments']
+    __table_args__ = (
+        db.Index('ix_contracts_project', 'project_id'),
+        db.Index('ix_contracts_client', 'client_id'),
+        db.Index('ix_contracts_status', 'status'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     contract_number = db.Column(db.String(50), unique=True, nullable=False)
@@ -84,6 +93,14 @@ class Contract(db.Model):
 
 class Cost(db.Model):
     __tablename__ = 'costs'
+    __list_deferred__ = ['notes']
+    __table_args__ = (
+        db.Index('ix_costs_project_date', 'project_id', 'date_incurred'),
+        db.Index('ix_costs_contract', 'contract_id'),
+        db.Index('ix_costs_budget_allocation', 'budget_allocation_id'),
+        db.Index('ix_costs_date_incurred', 'date_incurred'),
+        db.Index('ix_costs_vendor_invoice', 'vendor', 'invoice_number'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     project_id = db.Column(db.String(36), db.ForeignKey('projects.id'))
@@ -128,7 +145,7 @@ class Cost(db.Model):
             'category': self.category,
             'subcategory': self.subcategory,
             'description': self.description,
-            'amount': float(self.amount),
+            'amount': float(self.amount) if self.amount is not None else None,
             'currency': self.currency,
             'cost_type': self.cost_type,
             'billing_type': self.billing_type,
@@ -151,6 +168,10 @@ class Cost(db.Model):
 
 class Budget(db.Model):
     __tablename__ = 'budgets'
+    __list_deferred__ = ['categories', 'notes']
+    __table_args__ = (
+        db.Index('ix_budgets_project', 'project_id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     project_id = db.Column(db.String(36), db.ForeignKey('projects.id'))
@@ -189,9 +210,9 @@ class Budget(db.Model):
             'project_id': self.project_id,
             'name': self.name,
             'description': self.description,
-            'total_budget': float(self.total_budget),
-            'allocated_budget': float(self.allocated_budget),
-            'spent_budget': float(self.spent_budget),
+            'total_budget': float(self.total_budget) if self.total_budget is not None else None,
+            'allocated_budget': float(self.allocated_budget) if self.allocated_budget is not None else None,
+            'spent_budget': float(self.spent_budget) if self.spent_budget is not None else None,
             'remaining_budget': float(self.remaining_budget) if self.remaining_budget else None,
             'currency': self.currency,
             'budget_period': self.budget_period,
@@ -208,3 +229,91 @@ class Budget(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+
+class CostDailyRollup(db.Model):
+    """Cost totals per (project, contract, category, currency, status, day), kept current by src/cost_rollup.py"""
+    __tablename__ = 'cost_daily_rollup'
+    __table_args__ = (
+        db.Index('ix_cost_daily_rollup_day', 'day'),
+        db.Index('ix_cost_daily_rollup_project_day', 'project_id', 'day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.String(36))
+    contract_id = db.Column(db.String(36))
+    category = db.Column(db.String(50))
+    currency = db.Column(db.String(3))
+    status = db.Column(db.String(20))
+    day = db.Column(db.Date, nullable=False)
+    amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    cost_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CostDailyRollup {self.project_id} {self.day}>'
+
+class CostMonthlyRollup(db.Model):
+    """Daily rollups of closed months, folded together by the compaction job"""
+    __tablename__ = 'cost_monthly_rollup'
+    __table_args__ = (
+        db.Index('ix_cost_monthly_rollup_month', 'month'),
+        db.Index('ix_cost_monthly_rollup_project_month', 'project_id', 'month'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.String(36))
+    contract_id = db.Column(db.String(36))
+    category = db.Column(db.String(50))
+    currency = db.Column(db.String(3))
+    status = db.Column(db.String(20))
+    month = db.Column(db.Date, nullable=False)  # first day of the month
+    amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    cost_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CostMonthlyRollup {self.project_id} {self.month}>'
+
+class BudgetLedgerEntry(db.Model):
+    """One change to a budget's spend, appended by src/budget_ledger.py"""
+    __tablename__ = 'budget_ledger'
+    __table_args__ = (
+        db.Index('ix_budget_ledger_budget_created', 'budget_id', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    budget_id = db.Column(db.String(36), db.ForeignKey('budgets.id'), nullable=False)
+    cost_id = db.Column(db.String(36))  # not a foreign key: the cost may since have been deleted
+    amount = db.Column(db.Numeric(14, 2), nullable=False)
+    # approval, reversal, adjustment, reallocation, opening, reconciliation
+    reason = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<BudgetLedgerEntry {self.budget_id} {self.amount}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'budget_id': self.budget_id,
+            'cost_id': self.cost_id,
+            'amount': float(self.amount),
+            'reason': self.reason,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class FxRate(db.Model):
+    """Exchange rate into the base currency, effective from a date until the next one; loaded by src/fx.py"""
+    __tablename__ = 'fx_rates'
+
+    currency = db.Column(db.String(3), primary_key=True)
+    effective_date = db.Column(db.Date, primary_key=True)
+    rate = db.Column(db.Numeric(18, 8), nullable=False)  # base currency units per unit of currency
+
+    def __repr__(self):
+        return f'<FxRate {self.currency} {self.effective_date}>'
+
+    def to_dict(self):
+        return {
+            'currency': self.currency,
+            'effective_date': self.effective_date.isoformat(),
+            'rate': float(self.rate)
+        }
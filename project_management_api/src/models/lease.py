@@ -0,0 +1,41 @@
+from src.models.user import db
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+
+class JobLease(db.Model):
+    """A named, expiring lock row so only one worker runs a periodic job at a time"""
+    __tablename__ = 'job_leases'
+
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(200))
+    expires_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<JobLease {self.name}:{self.owner}>'
+
+    @classmethod
+    def acquire(cls, name, owner, ttl_seconds):
+        """Take or renew the lease; returns True when ``owner`` now holds it"""
+        now = datetime.utcnow()
+        if db.session.get(cls, name) is None:
+            try:
+                db.session.add(cls(name=name, owner=None, expires_at=now))
+                db.session.commit()
+            except IntegrityError:
+                # Another worker created it first
+                db.session.rollback()
+
+        # A single conditional UPDATE decides the race between workers
+        taken = cls.query.filter(
+            cls.name == name,
+            (cls.expires_at <= now) | (cls.owner == owner)
+        ).update({'owner': owner, 'expires_at': now + timedelta(seconds=ttl_seconds)},
+                 synchronize_session=False)
+        db.session.commit()
+        return taken == 1
+
+    @classmethod
+    def release(cls, name, owner):
+        cls.query.filter_by(name=name, owner=owner).update({'expires_at': datetime.utcnow()},
+                                                           synchronize_session=False)
+        db.session.commit()
@@ -1,10 +1,20 @@
 from src.models.user import db
 from src.models.comment import Comment
 from datetime import datetime
+from sqlalchemy import func, literal, select, update
+import json
 import uuid
 
 class Project(db.Model):
     __tablename__ = 'projects'
+    __searchable__ = ['name', 'description']
+    __list_deferred__ = ['model_performance_metrics', 'compliance_requirements', 'risk_assessment',
+                         'success_criteria']
+    __table_args__ = (
+        db.Index('ix_projects_archived_created', 'is_archived', 'created_at'),
+        db.Index('ix_projects_manager', 'project_manager_id'),
+        db.Index('ix_projects_client', 'client_id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(200), nullable=False)
@@ -86,6 +96,14 @@ class Project(db.Model):
 
 class Task(db.Model):
     __tablename__ = 'tasks'
+    __searchable__ = ['title', 'description']
+    __list_deferred__ = ['attachments', 'ai_model_metrics']
+    __table_args__ = (
+        db.Index('ix_tasks_project_status', 'project_id', 'status'),
+        db.Index('ix_tasks_parent', 'parent_task_id'),
+        db.Index('ix_tasks_assigned_status', 'assigned_to', 'status'),
+        db.Index('ix_tasks_due_date', 'due_date'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     title = db.Column(db.String(200), nullable=False)
@@ -122,11 +140,36 @@ class Task(db.Model):
     creator = db.relationship('User', foreign_keys=[created_by])
     comments = db.relationship('Comment', back_populates='task', cascade='all, delete-orphan')
 
+    # Counted in the task's own SELECT through the comments.task_id index
+    comment_count = db.column_property(
+        select(func.count(Comment.id)).where(Comment.task_id == id).correlate_except(Comment).scalar_subquery()
+    )
+
     def __repr__(self):
         return f'<Task {self.title}>'
 
-    def to_dict(self):
-        return {
+    @classmethod
+    def subtree(cls, task_id, max_depth):
+        """Query of (Task, depth) for a task and its descendants down to ``max_depth``.
+
+        The whole subtree comes back from one recursive CTE over
+        parent_task_id, parents before children.
+        """
+        tree = select(cls.id.label('id'), literal(0).label('depth')).where(cls.id == task_id).cte(
+            'task_tree', recursive=True
+        )
+        tree = tree.union_all(
+            select(cls.id, (tree.c.depth + 1).label('depth')).join(tree, cls.parent_task_id == tree.c.id).where(
+                tree.c.depth < max_depth
+            )
+        )
+        return db.session.query(cls, tree.c.depth).join(tree, cls.id == tree.c.id).order_by(
+            tree.c.depth, cls.created_at, cls.id
+        )
+
+    def to_dict(self, include=()):
+        """Serialize the task; pass include={'comments'} to embed its comments"""
+        data = {
             'id': self.id,
             'title': self.title,
             'description': self.description,
@@ -153,11 +196,158 @@ class Task(db.Model):
             'created_by': self.created_by,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'comments': [comment.to_dict() for comment in self.comments]
+            'comment_count': self.comment_count
+        }
+        if 'comments' in include:
+            data['comments'] = [comment.to_dict() for comment in self.comments]
+        return data
+
+class TaskDependency(db.Model):
+    """Edge table of the task dependency graph: ``task_id`` waits on ``depends_on_id``.
+
+    Task.dependencies keeps the JSON list the API has always returned; these
+    rows are what scheduling reads. Both ends always belong to ``project_id``.
+    """
+    __tablename__ = 'task_dependencies'
+    __table_args__ = (
+        db.Index('ix_task_dependencies_depends_on', 'depends_on_id'),
+        db.Index('ix_task_dependencies_project', 'project_id'),
+    )
+
+    task_id = db.Column(db.String(36), db.ForeignKey('tasks.id'), primary_key=True)
+    depends_on_id = db.Column(db.String(36), db.ForeignKey('tasks.id'), primary_key=True)
+    project_id = db.Column(db.String(36), db.ForeignKey('projects.id'), nullable=False)
+
+    def __repr__(self):
+        return f'<TaskDependency {self.task_id}->{self.depends_on_id}>'
+
+    @classmethod
+    def would_cycle(cls, task_id, depends_on_ids):
+        """Whether making ``task_id`` wait on ``depends_on_ids`` closes a cycle.
+
+        Walks everything the new prerequisites transitively wait on in one
+        recursive query and checks whether ``task_id`` is among it.
+        """
+        if task_id in depends_on_ids:
+            return True
+        if not depends_on_ids:
+            return False
+        reachable = select(Task.id.label('id')).where(Task.id.in_(depends_on_ids)).cte(
+            'reachable', recursive=True
+        )
+        reachable = reachable.union(
+            select(cls.depends_on_id).join(reachable, cls.task_id == reachable.c.id)
+        )
+        hit = db.session.execute(
+            select(reachable.c.id).where(reachable.c.id == task_id).limit(1)
+        ).first()
+        return hit is not None
+
+    @classmethod
+    def replace(cls, task, depends_on_ids):
+        """Point ``task``'s outgoing edges at exactly ``depends_on_ids``"""
+        wanted = set(depends_on_ids)
+        current = {row.depends_on_id for row in cls.query.filter_by(task_id=task.id)}
+        if current - wanted:
+            cls.query.filter(cls.task_id == task.id, cls.depends_on_id.in_(current - wanted)).delete(
+                synchronize_session=False
+            )
+        rows = [{'task_id': task.id, 'depends_on_id': depends_on_id, 'project_id': task.project_id}
+                for depends_on_id in sorted(wanted - current)]
+        if rows:
+            db.session.execute(cls.__table__.insert(), rows)
+
+    @classmethod
+    def remove_tasks(cls, task_ids):
+        """Drop every edge touching ``task_ids`` and take them out of their dependents' JSON lists"""
+        task_ids = set(task_ids)
+        dependents = {row.task_id for row in db.session.query(cls.task_id).filter(
+            cls.depends_on_id.in_(task_ids)
+        )} - task_ids
+        cls.query.filter(cls.task_id.in_(task_ids) | cls.depends_on_id.in_(task_ids)).delete(
+            synchronize_session=False
+        )
+        if not dependents:
+            return
+        remaining = {task_id: [] for task_id in dependents}
+        for task_id, depends_on_id in db.session.query(cls.task_id, cls.depends_on_id).filter(
+            cls.task_id.in_(dependents)
+        ).order_by(cls.depends_on_id):
+            remaining[task_id].append(depends_on_id)
+        db.session.execute(update(Task), [
+            {'id': task_id, 'dependencies': json.dumps(depends_on_ids)}
+            for task_id, depends_on_ids in remaining.items()
+        ])
+
+    @classmethod
+    def backfill(cls):
+        """Populate the edges from tasks.dependencies when they have never been built"""
+        if cls.query.first() is not None:
+            return
+        tasks = db.session.query(Task.id, Task.project_id, Task.dependencies).filter(
+            Task.dependencies.isnot(None), Task.dependencies != '[]'
+        ).all()
+        if not tasks:
+            return
+        wanted = {}
+        for task_id, project_id, dependencies in tasks:
+            try:
+                parsed = json.loads(dependencies)
+            except ValueError:
+                continue
+            if isinstance(parsed, list):
+                wanted[task_id] = (project_id, {str(item) for item in parsed if item and item != task_id})
+        targets = {target for _, ids in wanted.values() for target in ids}
+        projects = dict(db.session.query(Task.id, Task.project_id).filter(Task.id.in_(targets)).all()) \
+            if targets else {}
+        # Only keep edges between existing tasks of the same project
+        rows = [{'task_id': task_id, 'depends_on_id': target, 'project_id': project_id}
+                for task_id, (project_id, ids) in wanted.items()
+                for target in sorted(ids) if projects.get(target) == project_id]
+        if rows:
+            db.session.execute(cls.__table__.insert(), rows)
+        db.session.commit()
+
+class ProjectTaskStats(db.Model):
+    """Per-project task counters, kept current by src/task_stats.py"""
+    __tablename__ = 'project_task_stats'
+
+    # Task status -> counter column
+    STATUS_COLUMNS = {
+        'todo': 'todo_tasks',
+        'in_progress': 'in_progress_tasks',
+        'review': 'review_tasks',
+        'testing': 'testing_tasks',
+        'completed': 'completed_tasks',
+        'blocked': 'blocked_tasks',
+    }
+
+    project_id = db.Column(db.String(36), db.ForeignKey('projects.id'), primary_key=True)
+    total_tasks = db.Column(db.Integer, nullable=False, default=0)
+    todo_tasks = db.Column(db.Integer, nullable=False, default=0)
+    in_progress_tasks = db.Column(db.Integer, nullable=False, default=0)
+    review_tasks = db.Column(db.Integer, nullable=False, default=0)
+    testing_tasks = db.Column(db.Integer, nullable=False, default=0)
+    completed_tasks = db.Column(db.Integer, nullable=False, default=0)
+    blocked_tasks = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ProjectTaskStats {self.project_id}>'
+
+    def to_summary(self):
+        return {
+            'total_tasks': self.total_tasks,
+            'completed_tasks': self.completed_tasks,
+            'in_progress_tasks': self.in_progress_tasks,
+            'blocked_tasks': self.blocked_tasks
         }
 
 class ProjectTeam(db.Model):
     __tablename__ = 'project_teams'
+    __table_args__ = (
+        db.Index('ix_project_teams_project_active', 'project_id', 'is_active'),
+        db.Index('ix_project_teams_user_active', 'user_id', 'is_active'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     project_id = db.Column(db.String(36), db.ForeignKey('projects.id'), nullable=False)
@@ -1,9 +1,13 @@
 from src.models.user import db
 from datetime import datetime
+from sqlalchemy import and_, literal, select, true, update
 import uuid
 
 class Role(db.Model):
     __tablename__ = 'roles'
+    __table_args__ = (
+        db.Index('ix_roles_parent', 'parent_role_id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(100), nullable=False)
@@ -59,6 +63,11 @@ class Role(db.Model):
 
 class UserRole(db.Model):
     __tablename__ = 'user_roles'
+    __table_args__ = (
+        db.Index('ix_user_roles_status_expires_at', 'status', 'expires_at'),
+        db.Index('ix_user_roles_user_status', 'user_id', 'status'),
+        db.Index('ix_user_roles_role_status', 'role_id', 'status'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
@@ -82,6 +91,11 @@ class UserRole(db.Model):
     def __repr__(self):
         return f'<UserRole {self.user_id}:{self.role_id}>'
 
+    @classmethod
+    def current(cls):
+        """Filter for assignments that are active and not past expires_at"""
+        return (cls.status == 'active') & (cls.expires_at.is_(None) | (cls.expires_at > datetime.utcnow()))
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -98,3 +112,100 @@ class UserRole(db.Model):
             'approved_at': self.approved_at.isoformat() if self.approved_at else None
         }
 
+class RoleClosure(db.Model):
+    """Closure table of the role tree: one row per (ancestor, descendant) pair.
+
+    Every role has a depth-0 row pointing at itself, so a role's ancestors and
+    its whole subtree are each one indexed lookup, and moving or renaming a
+    subtree is a fixed number of set-based statements.
+    """
+    __tablename__ = 'role_closure'
+    __table_args__ = (
+        db.Index('ix_role_closure_descendant_depth', 'descendant_id', 'depth'),
+    )
+
+    ancestor_id = db.Column(db.String(36), db.ForeignKey('roles.id'), primary_key=True)
+    descendant_id = db.Column(db.String(36), db.ForeignKey('roles.id'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<RoleClosure {self.ancestor_id}>{self.descendant_id}:{self.depth}>'
+
+    @classmethod
+    def subtree_ids(cls, role_id):
+        """Select of every role id in a subtree, the root included"""
+        return select(cls.descendant_id).where(cls.ancestor_id == role_id)
+
+    @classmethod
+    def ancestors(cls, role_id):
+        """Ancestors of a role, root first"""
+        return Role.query.join(cls, cls.ancestor_id == Role.id).filter(
+            cls.descendant_id == role_id, cls.depth > 0
+        ).order_by(cls.depth.desc()).all()
+
+    @classmethod
+    def descendants(cls, role_id):
+        """Every role below a role, shallowest first"""
+        return Role.query.join(cls, cls.descendant_id == Role.id).filter(
+            cls.ancestor_id == role_id, cls.depth > 0
+        ).order_by(cls.depth).all()
+
+    @classmethod
+    def is_descendant(cls, role_id, ancestor_id):
+        return cls.query.filter_by(ancestor_id=ancestor_id, descendant_id=role_id).first() is not None
+
+    @classmethod
+    def insert_node(cls, role_id, parent_id=None):
+        """Link a new leaf role under its parent"""
+        db.session.add(cls(ancestor_id=role_id, descendant_id=role_id, depth=0))
+        if parent_id:
+            db.session.execute(cls.__table__.insert().from_select(
+                ['ancestor_id', 'descendant_id', 'depth'],
+                select(cls.ancestor_id, literal(role_id), cls.depth + 1).where(cls.descendant_id == parent_id)
+            ))
+
+    @classmethod
+    def move_subtree(cls, role_id, new_parent_id):
+        """Re-link a role and its subtree under a new parent (None for a root)"""
+        closure = cls.__table__
+        subtree = select(closure.c.descendant_id).where(closure.c.ancestor_id == role_id)
+        # Drop links from the old ancestors into the subtree, keep links inside it
+        db.session.execute(closure.delete().where(
+            closure.c.descendant_id.in_(subtree),
+            closure.c.ancestor_id.notin_(subtree)
+        ))
+        if new_parent_id:
+            above = closure.alias('above')
+            below = closure.alias('below')
+            db.session.execute(closure.insert().from_select(
+                ['ancestor_id', 'descendant_id', 'depth'],
+                select(above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + 1)
+                .select_from(above.join(below, true()))
+                .where(and_(above.c.descendant_id == new_parent_id, below.c.ancestor_id == role_id))
+            ))
+
+    @classmethod
+    def rewrite_subtree(cls, role_id, old_path, new_path, level_delta=0):
+        """Rewrite path prefixes and levels for a whole subtree in one UPDATE"""
+        roles = Role.__table__
+        db.session.execute(update(roles).where(roles.c.id.in_(cls.subtree_ids(role_id))).values(
+            path=literal(new_path) + db.func.substr(roles.c.path, len(old_path or '') + 1),
+            level=roles.c.level + level_delta
+        ))
+
+    @classmethod
+    def backfill(cls):
+        """Build the closure table from parent_role_id when it has never been built"""
+        if cls.query.first() is not None:
+            return
+        parents = dict(db.session.query(Role.id, Role.parent_role_id))
+        rows = []
+        for role_id in parents:
+            ancestor_id, depth, seen = role_id, 0, set()
+            while ancestor_id and ancestor_id not in seen:
+                seen.add(ancestor_id)
+                rows.append({'ancestor_id': ancestor_id, 'descendant_id': role_id, 'depth': depth})
+                ancestor_id, depth = parents.get(ancestor_id), depth + 1
+        if rows:
+            db.session.execute(cls.__table__.insert(), rows)
+        db.session.commit()
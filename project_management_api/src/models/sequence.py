@@ -0,0 +1,37 @@
+from src.models.user import db
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+class SequenceCounter(db.Model):
+    """The next unreserved value of a named sequence; workers take numbers from it in blocks"""
+    __tablename__ = 'sequence_counters'
+
+    name = db.Column(db.String(100), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False, default=1)
+
+    def __repr__(self):
+        return f'<SequenceCounter {self.name}:{self.next_value}>'
+
+    @classmethod
+    def reserve(cls, name, size):
+        """Reserve ``size`` consecutive values; returns the first one.
+
+        Runs in its own short transaction on a separate connection, so the
+        block stays reserved whatever happens to the caller's transaction
+        and the counter row is locked only for the UPDATE.
+        """
+        table = cls.__table__
+        with db.engine.begin() as conn:
+            # A single UPDATE decides the race between workers
+            updated = conn.execute(
+                table.update().where(table.c.name == name).values(next_value=table.c.next_value + size)
+            ).rowcount
+            if updated:
+                return conn.execute(select(table.c.next_value).where(table.c.name == name)).scalar_one() - size
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(table.insert().values(name=name, next_value=1 + size))
+            return 1
+        except IntegrityError:
+            # Another worker created it first
+            return cls.reserve(name, size)
@@ -1,12 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import uuid
-from werkzeug.security import generate_password_hash, check_password_hash
+import json
+from src.hashing import password_hasher
 
 db = SQLAlchemy()
 
 class User(db.Model):
     __tablename__ = 'users'
+    __searchable__ = ['username', 'first_name', 'last_name', 'email', 'bio']
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -32,14 +34,28 @@ class User(db.Model):
     reset_password_token = db.Column(db.String(255))
     reset_password_expires = db.Column(db.DateTime)
 
+    # Relationships
+    skill_entries = db.relationship('UserSkill', backref='user', cascade='all, delete-orphan')
+
     def __repr__(self):
         return f'<User {self.username}>'
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def set_skills(self, skills):
+        """Store the skills JSON and keep the normalized user_skills rows in step"""
+        self.skills = json.dumps(skills)
+        wanted = set(normalize_skills(skills))
+        for entry in list(self.skill_entries):
+            if entry.skill not in wanted:
+                self.skill_entries.remove(entry)
+        existing = {entry.skill for entry in self.skill_entries}
+        for skill in sorted(wanted - existing):
+            self.skill_entries.append(UserSkill(skill=skill))
 
     def to_dict(self):
         return {
@@ -80,3 +96,42 @@ class User(db.Model):
             'is_verified': self.is_verified
         }
 
+
+def normalize_skills(skills):
+    """Lower-case, trim and de-duplicate skill names, keeping their order"""
+    normalized = []
+    for skill in skills or []:
+        skill = str(skill).strip().lower()[:100]
+        if skill and skill not in normalized:
+            normalized.append(skill)
+    return normalized
+
+class UserSkill(db.Model):
+    """Inverted index of users by normalized skill name"""
+    __tablename__ = 'user_skills'
+    __table_args__ = (
+        db.Index('ix_user_skills_skill_user', 'skill', 'user_id'),
+    )
+
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), primary_key=True)
+    skill = db.Column(db.String(100), primary_key=True)
+
+    def __repr__(self):
+        return f'<UserSkill {self.user_id}:{self.skill}>'
+
+    @classmethod
+    def backfill(cls):
+        """Populate the index from users.skills when it has never been built"""
+        if cls.query.first() is not None:
+            return
+        rows = []
+        for user_id, skills in db.session.query(User.id, User.skills).filter(User.skills.isnot(None)):
+            try:
+                parsed = json.loads(skills)
+            except ValueError:
+                continue
+            if isinstance(parsed, list):
+                rows.extend({'user_id': user_id, 'skill': skill} for skill in normalize_skills(parsed))
+        if rows:
+            db.session.execute(cls.__table__.insert(), rows)
+        db.session.commit()
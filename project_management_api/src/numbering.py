@@ -0,0 +1,60 @@
+import os
+import threading
+from datetime import datetime
+from flask import current_app
+from src.errors import HttpException
+from src.models.user import db
+from src.models.sequence import SequenceCounter
+
+# Human-readable document numbers drawn from database-backed sequences.
+#
+# Each worker process reserves a block of CONTRACT_NUMBER_BLOCK_SIZE values
+# from its sequence_counters row with one UPDATE, then hands them out from
+# memory under a lock, so numbering costs one round trip per block rather
+# than one per document and never collides across workers. Values in a
+# block that is not used up before a worker exits are skipped, so numbers
+# are unique and increasing within a worker but may have gaps.
+
+
+class SequenceAllocator:
+    """Hands out values of a named sequence from blocks reserved per process"""
+
+    def __init__(self, name, block_size_setting):
+        self.name = name
+        self.block_size_setting = block_size_setting
+        self._lock = threading.Lock()
+        self._owner = None
+        self._next = 0
+        self._end = 0
+
+    def next_value(self):
+        with self._lock:
+            # A forked worker must not reuse the block its parent had reserved,
+            # nor an app on another database one reserved from this one
+            owner = (os.getpid(), db.engine)
+            if self._owner != owner or self._next >= self._end:
+                size = max(current_app.config.get(self.block_size_setting, 100), 1)
+                self._next = SequenceCounter.reserve(self.name, size)
+                self._end = self._next + size
+                self._owner = owner
+            value = self._next
+            self._next += 1
+            return value
+
+
+contract_numbers = SequenceAllocator('contract_number', 'CONTRACT_NUMBER_BLOCK_SIZE')
+
+
+def format_number(template, number, now=None):
+    """Render a numbering template such as ``CNT-{year}-{number:06d}``"""
+    now = now or datetime.utcnow()
+    try:
+        return template.format(number=number, year=now.year, month=now.month, day=now.day)
+    except (KeyError, IndexError, ValueError):
+        raise HttpException(500, f'Invalid number format: {template}')
+
+
+def next_contract_number():
+    """The next contract number in CONTRACT_NUMBER_FORMAT"""
+    template = current_app.config.get('CONTRACT_NUMBER_FORMAT', 'CNT-{year}-{number:06d}')
+    return format_number(template, contract_numbers.next_value())
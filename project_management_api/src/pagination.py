@@ -0,0 +1,82 @@
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import and_, or_
+from src.errors import HttpException
+from src.loading import load_fields, requested_fields, sparse
+
+
+def encode_cursor(sort_value, row_id):
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor into (sort_value, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(sort_value), row_id
+    except (ValueError, TypeError):
+        raise HttpException(400, 'Invalid cursor')
+
+
+def paginate(query, model, key, serializer=None, sort_column=None):
+    """Paginate a list query and build the response body.
+
+    By default this issues a classic page/per_page OFFSET query with a total
+    count. When the request carries a ``cursor`` argument (empty for the first
+    page) it switches to keyset pagination: rows are ordered by
+    ``(sort_column, id)`` (replacing any ordering already on the query), the
+    page seeks past the cursor, no COUNT(*) is run and the body carries an
+    opaque ``next_cursor`` (null on the last page).
+
+    Rows are loaded and serialized with the sparse fieldset from
+    ``?fields=`` (see src/loading.py), so large text columns are left out
+    of list pages unless asked for.
+    """
+    per_page = request.args.get('per_page', 10, type=int)
+    cursor = request.args.get('cursor')
+    sort_column = sort_column if sort_column is not None else model.created_at
+    fields = requested_fields(model, list_view=True)
+    query = query.options(*load_fields(model, fields, sort_column.key))
+    serializer = sparse(serializer or model.to_dict, fields)
+
+    if cursor is None:
+        page = request.args.get('page', 1, type=int)
+        result = query.paginate(page=page, per_page=per_page, error_out=False, count=False)
+        # Count over ids only, so the COUNT subquery does not drag every column along
+        result.total = query.with_entities(model.id).order_by(None).count()
+        return {
+            key: [serializer(item) for item in result.items],
+            'total': result.total,
+            'pages': result.pages,
+            'current_page': page,
+            'per_page': per_page
+        }
+
+    per_page = max(per_page, 1)
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            sort_column > sort_value,
+            and_(sort_column == sort_value, model.id > last_id)
+        ))
+
+    # Fetch one extra row to learn whether another page exists
+    items = query.order_by(None).order_by(sort_column, model.id).limit(per_page + 1).all()
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), last.id)
+
+    return {
+        key: [serializer(item) for item in items],
+        'next_cursor': next_cursor,
+        'per_page': per_page
+    }
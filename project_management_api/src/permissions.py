@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.orm import aliased
+from src.models.user import db
+from src.models.role import Role, RoleClosure, UserRole
+
+# The can_* role flags always occupy the lowest bits, followed by every name
+# found in the roles' permissions JSON in sorted order, so each worker numbers
+# the bits the same way for the same roles. The numbering is rebuilt from the
+# database when roles change, and only ever covers names some role grants.
+FLAG_PERMISSIONS = {
+    'can_create_subroles': 'create_subroles',
+    'can_assign_roles': 'assign_roles',
+    'can_manage_projects': 'manage_projects',
+    'can_manage_budgets': 'manage_budgets',
+    'can_view_reports': 'view_reports',
+}
+
+
+def _permission_names(permissions):
+    """Names in a role's permissions JSON, ignoring malformed values"""
+    try:
+        names = json.loads(permissions) if permissions else []
+    except ValueError:
+        return set()
+    return {name for name in names if isinstance(name, str)} if isinstance(names, list) else set()
+
+
+class PermissionResolver:
+    """Compiles a user's effective permissions into a cached bitmask.
+
+    A user holds every permission of each active, approved, unexpired role
+    assignment and of all ancestors of those roles. Results are cached per
+    user until role.py writes invalidate them, an assignment expires, or
+    PERMISSION_CACHE_TTL seconds pass (which bounds staleness across
+    workers, since invalidation only reaches the worker that made the write).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bits = None
+        self._names = []
+        self._cache = {}
+
+    def _registry(self):
+        """{permission name: bit}, numbered from the roles currently in the database"""
+        with self._lock:
+            if self._bits is None:
+                flags = list(FLAG_PERMISSIONS.values())
+                granted = set()
+                for (permissions,) in db.session.query(Role.permissions).filter(Role.permissions.isnot(None)):
+                    granted.update(_permission_names(permissions))
+                self._names = flags + sorted(granted - set(flags))
+                self._bits = {name: 1 << index for index, name in enumerate(self._names)}
+                # Masks compiled against the old numbering no longer decode
+                self._cache.clear()
+            return self._bits
+
+    def names(self, mask):
+        """Permission names set in a mask"""
+        return [name for index, name in enumerate(self._names) if mask >> index & 1]
+
+    def _compile(self, user_id):
+        now = datetime.utcnow()
+        assigned = aliased(Role)
+        granting = aliased(Role)
+        rows = db.session.query(granting, UserRole.expires_at).select_from(UserRole).join(
+            assigned, assigned.id == UserRole.role_id
+        ).join(
+            RoleClosure, RoleClosure.descendant_id == UserRole.role_id
+        ).join(
+            granting, granting.id == RoleClosure.ancestor_id
+        ).filter(
+            UserRole.user_id == user_id,
+            UserRole.status == 'active',
+            UserRole.approval_status == 'approved',
+            (UserRole.expires_at.is_(None)) | (UserRole.expires_at > now),
+            assigned.is_active == True,
+            granting.is_active == True
+        ).all()
+
+        granted = set()
+        expires_at = None
+        for role, assignment_expires_at in rows:
+            granted.update(name for flag, name in FLAG_PERMISSIONS.items() if getattr(role, flag))
+            granted.update(_permission_names(role.permissions))
+            if assignment_expires_at and (expires_at is None or assignment_expires_at < expires_at):
+                expires_at = assignment_expires_at
+
+        bits = self._registry()
+        if not granted <= set(bits):
+            # A role this worker has not seen yet; renumber from the database
+            self._reset_registry()
+            bits = self._registry()
+        mask = 0
+        for name in granted:
+            mask |= bits.get(name, 0)
+        return mask, expires_at
+
+    def get_mask(self, user_id):
+        """Effective permission bitmask for a user"""
+        cached = self._cache.get(user_id)
+        now = time.monotonic()
+        if cached is not None:
+            mask, valid_until, expires_at = cached
+            if now < valid_until and (expires_at is None or datetime.utcnow() < expires_at):
+                return mask
+
+        mask, expires_at = self._compile(user_id)
+        ttl = current_app.config.get('PERMISSION_CACHE_TTL', 60)
+        self._cache[user_id] = (mask, now + ttl, expires_at)
+        return mask
+
+    def has_permission(self, user_id, name):
+        mask = self.get_mask(user_id)
+        bit = self._registry().get(name)
+        return bit is not None and bool(mask & bit)
+
+    def invalidate_user(self, user_id):
+        self._cache.pop(user_id, None)
+
+    def _reset_registry(self):
+        with self._lock:
+            self._bits = None
+
+    def invalidate_all(self):
+        self._reset_registry()
+        self._cache.clear()
+
+
+permission_resolver = PermissionResolver()
@@ -0,0 +1,129 @@
+"""Query-plan audit for the list endpoints' filter combinations.
+
+Runs EXPLAIN (EXPLAIN QUERY PLAN on SQLite) for every query shape below
+against the configured database and reports the ones that read a whole
+table. Add a shape here whenever a route gains a filter, and an index to
+the model when the audit flags it:
+
+    python -m src.query_audit
+
+Exits non-zero when any shape scans a full table. Without DATABASE_URL it
+audits a fresh in-memory SQLite schema.
+"""
+import re
+import sys
+from datetime import datetime
+from src.models.user import db, User, UserSkill
+from src.models.role import Role, UserRole
+from src.models.project import Project, Task, TaskDependency, ProjectTeam
+from src.models.contract import Contract, Cost, Budget, BudgetLedgerEntry
+from src.models.ai_model import AIModel, Dataset, Report, Metrics
+
+SOME_ID = '00000000-0000-0000-0000-000000000000'
+SOME_DATE = datetime(2024, 1, 1)
+
+# (route, filter combination) -> query built the way the route builds it
+QUERY_SHAPES = {
+    'get_projects': lambda: Project.query.filter(Project.is_archived == False).order_by(Project.created_at),
+    'get_projects?project_manager_id': lambda: Project.query.filter(
+        Project.is_archived == False, Project.project_manager_id == SOME_ID),
+    'get_projects?client_id': lambda: Project.query.filter(
+        Project.is_archived == False, Project.client_id == SOME_ID),
+    'get_project_tasks': lambda: Task.query.filter(Task.project_id == SOME_ID),
+    'get_project_tasks?status': lambda: Task.query.filter(Task.project_id == SOME_ID, Task.status == 'todo'),
+    'get_project_tasks?assigned_to&priority': lambda: Task.query.filter(
+        Task.project_id == SOME_ID, Task.assigned_to == SOME_ID, Task.priority == 'high'),
+    'get_project_tasks?parent_task_id': lambda: Task.query.filter(
+        Task.project_id == SOME_ID, Task.parent_task_id == SOME_ID),
+    'get_task subtasks': lambda: Task.query.filter(Task.parent_task_id == SOME_ID),
+    'search_tasks?project_ids&statuses': lambda: Task.query.filter(
+        Task.project_id.in_([SOME_ID, SOME_ID]), Task.status.in_(['todo', 'blocked'])),
+    'search_tasks?assigned_to': lambda: Task.query.filter(Task.assigned_to == SOME_ID),
+    'search_tasks?due_date_from&due_date_to': lambda: Task.query.filter(
+        Task.due_date >= SOME_DATE, Task.due_date <= SOME_DATE),
+    'get_project_board': lambda: Task.query.filter(Task.project_id == SOME_ID).order_by(Task.status),
+    'get_project_schedule edges': lambda: TaskDependency.query.filter(TaskDependency.project_id == SOME_ID),
+    'get_project_team': lambda: ProjectTeam.query.filter_by(project_id=SOME_ID, is_active=True),
+    'get_user_projects': lambda: ProjectTeam.query.filter_by(user_id=SOME_ID, is_active=True),
+    'get_contracts?project_id': lambda: Contract.query.filter(Contract.project_id == SOME_ID),
+    'get_contracts?client_id': lambda: Contract.query.filter(Contract.client_id == SOME_ID),
+    'get_contracts?status': lambda: Contract.query.filter(Contract.status == 'active'),
+    'get_contract costs': lambda: Cost.query.filter_by(contract_id=SOME_ID),
+    'get_costs?project_id&date_from': lambda: Cost.query.filter(
+        Cost.project_id == SOME_ID, Cost.date_incurred >= SOME_DATE),
+    'get_costs?date_from&date_to': lambda: Cost.query.filter(
+        Cost.date_incurred >= SOME_DATE, Cost.date_incurred <= SOME_DATE),
+    'bulk_create_costs invoices': lambda: Cost.query.filter(
+        Cost.vendor.in_(['Acme', 'Other']), Cost.invoice_number.in_(['INV-1', 'INV-2'])),
+    'get_budget costs': lambda: Cost.query.filter_by(budget_allocation_id=SOME_ID),
+    'get_budgets?project_id': lambda: Budget.query.filter(Budget.project_id == SOME_ID),
+    'get_budget_ledger': lambda: BudgetLedgerEntry.query.filter(
+        BudgetLedgerEntry.budget_id == SOME_ID).order_by(BudgetLedgerEntry.created_at, BudgetLedgerEntry.id),
+    'get_ai_models?project_id': lambda: AIModel.query.filter(AIModel.project_id == SOME_ID),
+    'get_dataset training models': lambda: AIModel.query.filter_by(training_dataset_id=SOME_ID),
+    'get_dataset validation models': lambda: AIModel.query.filter_by(validation_dataset_id=SOME_ID),
+    'get_dataset test models': lambda: AIModel.query.filter_by(test_dataset_id=SOME_ID),
+    'get_datasets?project_id': lambda: Dataset.query.filter(Dataset.project_id == SOME_ID),
+    'get_reports?project_id': lambda: Report.query.filter(Report.project_id == SOME_ID),
+    'get_metrics?project_id&date_from': lambda: Metrics.query.filter(
+        Metrics.project_id == SOME_ID, Metrics.measurement_date >= SOME_DATE),
+    'get_metrics?user_id': lambda: Metrics.query.filter(Metrics.user_id == SOME_ID),
+    'get_metrics?metric_name': lambda: Metrics.query.filter(Metrics.metric_name == 'accuracy'),
+    'get_roles?parent_id': lambda: Role.query.filter(Role.parent_role_id == SOME_ID),
+    'get_user_roles?user_id': lambda: UserRole.query.filter(UserRole.user_id == SOME_ID),
+    'get_role_users': lambda: UserRole.query.filter(UserRole.role_id == SOME_ID, UserRole.current()),
+    'get_user_roles_by_user': lambda: UserRole.query.filter(UserRole.user_id == SOME_ID, UserRole.current()),
+    'expire_role_assignments': lambda: UserRole.query.filter(
+        UserRole.status == 'active', UserRole.expires_at <= SOME_DATE),
+    'search_users?skills': lambda: UserSkill.query.filter(UserSkill.skill.in_(['python', 'sql'])),
+    'login': lambda: User.query.filter((User.username == 'someone') | (User.email == 'someone')),
+}
+
+# SQLite: "SCAN tasks" / "SCAN tasks USING INDEX ..." read every row;
+# PostgreSQL: "Seq Scan on tasks"
+FULL_SCAN = re.compile(r'^(?:SCAN (?!CONSTANT ROW)(\w+)|.*Seq Scan on (\w+))')
+
+
+def explain(query):
+    """Plan lines for a query on the current database"""
+    compiled = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    params = compiled.construct_params()
+    conn = db.session.connection()
+    if db.engine.dialect.name == 'sqlite':
+        positional = [params[name] for name in compiled.positiontup]
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled.string}', tuple(positional))
+        return [row[-1] for row in rows]
+    rows = conn.exec_driver_sql(f'EXPLAIN {compiled.string}', params)
+    return [row[0] for row in rows]
+
+
+def audit(shapes=None):
+    """Return {shape name: [plan lines that scan a whole table]} for flagged shapes"""
+    findings = {}
+    for name, build in (shapes or QUERY_SHAPES).items():
+        scans = [line for line in explain(build()) if FULL_SCAN.match(line.strip())]
+        if scans:
+            findings[name] = scans
+    return findings
+
+
+def main():
+    from src.main import create_app
+    from src.config import Config
+
+    class AuditConfig(Config):
+        SQLALCHEMY_DATABASE_URI = Config.SQLALCHEMY_DATABASE_URI or 'sqlite:///:memory:'
+
+    app = create_app(AuditConfig)
+    with app.app_context():
+        findings = audit()
+    for name in QUERY_SHAPES:
+        status = 'FULL SCAN' if name in findings else 'ok'
+        print(f'{status:9}  {name}')
+        for line in findings.get(name, []):
+            print(f'           {line}')
+    return 1 if findings else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
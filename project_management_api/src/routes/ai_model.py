@@ -1,6 +1,9 @@
 from flask import Blueprint, jsonify, request
 from src.models.user import db
 from src.models.ai_model import AIModel, Dataset, Report, Metrics
+from src.pagination import paginate
+from src.search import search_filter
+from src.loading import eager_load, load_fields, requested_fields, sparse
 from datetime import datetime
 import json
 
@@ -11,8 +14,6 @@ ai_model_bp = Blueprint('ai_model', __name__)
 @ai_model_bp.route('/ai-models', methods=['GET'])
 def get_ai_models():
     """Get all AI models with optional filtering"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
     project_id = request.args.get('project_id')
     model_type = request.args.get('model_type')
     framework = request.args.get('framework')
@@ -34,20 +35,9 @@ def get_ai_models():
         query = query.filter(AIModel.deployment_status == deployment_status)
     
     if search:
-        query = query.filter(
-            (AIModel.name.contains(search)) |
-            (AIModel.description.contains(search))
-        )
+        query = search_filter(query, AIModel, search)
     
-    models = query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    return jsonify({
-        'ai_models': [model.to_dict() for model in models.items],
-        'total': models.total,
-        'pages': models.pages,
-        'current_page': page,
-        'per_page': per_page
-    })
+    return jsonify(paginate(query, AIModel, 'ai_models'))
 
 @ai_model_bp.route('/ai-models', methods=['POST'])
 def create_ai_model():
@@ -88,8 +78,12 @@ def create_ai_model():
 @ai_model_bp.route('/ai-models/<model_id>', methods=['GET'])
 def get_ai_model(model_id):
     """Get a specific AI model by ID"""
-    ai_model = AIModel.query.get_or_404(model_id)
-    model_data = ai_model.to_dict()
+    fields = requested_fields(AIModel)
+    ai_model = AIModel.query.options(
+        *eager_load(AIModel, 'training_dataset', 'validation_dataset', 'test_dataset'),
+        *load_fields(AIModel, fields, 'training_dataset_id', 'validation_dataset_id', 'test_dataset_id')
+    ).filter(AIModel.id == model_id).first_or_404()
+    model_data = sparse(AIModel.to_dict, fields)(ai_model)
     
     # Include dataset information
     if ai_model.training_dataset:
@@ -176,8 +170,6 @@ def deploy_ai_model(model_id):
 @ai_model_bp.route('/datasets', methods=['GET'])
 def get_datasets():
     """Get all datasets with optional filtering"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
     project_id = request.args.get('project_id')
     dataset_type = request.args.get('dataset_type')
     data_source = request.args.get('data_source')
@@ -199,20 +191,9 @@ def get_datasets():
         query = query.filter(Dataset.privacy_level == privacy_level)
     
     if search:
-        query = query.filter(
-            (Dataset.name.contains(search)) |
-            (Dataset.description.contains(search))
-        )
+        query = search_filter(query, Dataset, search)
     
-    datasets = query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    return jsonify({
-        'datasets': [dataset.to_dict() for dataset in datasets.items],
-        'total': datasets.total,
-        'pages': datasets.pages,
-        'current_page': page,
-        'per_page': per_page
-    })
+    return jsonify(paginate(query, Dataset, 'datasets'))
 
 @ai_model_bp.route('/datasets', methods=['POST'])
 def create_dataset():
@@ -253,8 +234,9 @@ def create_dataset():
 @ai_model_bp.route('/datasets/<dataset_id>', methods=['GET'])
 def get_dataset(dataset_id):
     """Get a specific dataset by ID"""
-    dataset = Dataset.query.get_or_404(dataset_id)
-    dataset_data = dataset.to_dict()
+    fields = requested_fields(Dataset)
+    dataset = Dataset.query.options(*load_fields(Dataset, fields)).filter(Dataset.id == dataset_id).first_or_404()
+    dataset_data = sparse(Dataset.to_dict, fields)(dataset)
     
     # Include models that use this dataset
     training_models = AIModel.query.filter_by(training_dataset_id=dataset_id).all()
@@ -335,8 +317,6 @@ def delete_dataset(dataset_id):
 @ai_model_bp.route('/reports', methods=['GET'])
 def get_reports():
     """Get all reports with optional filtering"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
     project_id = request.args.get('project_id')
     report_type = request.args.get('report_type')
     generated_by = request.args.get('generated_by')
@@ -356,15 +336,7 @@ def get_reports():
     if status:
         query = query.filter(Report.status == status)
     
-    reports = query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    return jsonify({
-        'reports': [report.to_dict() for report in reports.items],
-        'total': reports.total,
-        'pages': reports.pages,
-        'current_page': page,
-        'per_page': per_page
-    })
+    return jsonify(paginate(query, Report, 'reports'))
 
 @ai_model_bp.route('/reports', methods=['POST'])
 def create_report():
@@ -399,8 +371,9 @@ def create_report():
 @ai_model_bp.route('/reports/<report_id>', methods=['GET'])
 def get_report(report_id):
     """Get a specific report by ID"""
-    report = Report.query.get_or_404(report_id)
-    return jsonify(report.to_dict())
+    fields = requested_fields(Report)
+    report = Report.query.options(*load_fields(Report, fields)).filter(Report.id == report_id).first_or_404()
+    return jsonify(sparse(Report.to_dict, fields)(report))
 
 @ai_model_bp.route('/reports/<report_id>', methods=['PUT'])
 def update_report(report_id):
@@ -466,7 +439,8 @@ def get_metrics():
     date_from = request.args.get('date_from')
     date_to = request.args.get('date_to')
     
-    query = Metrics.query
+    fields = requested_fields(Metrics, list_view=True)
+    query = Metrics.query.options(*load_fields(Metrics, fields))
     
     if project_id:
         query = query.filter(Metrics.project_id == project_id)
@@ -486,8 +460,8 @@ def get_metrics():
     if date_to:
         query = query.filter(Metrics.measurement_date <= datetime.fromisoformat(date_to))
     
-    metrics = query.all()
-    return jsonify([metric.to_dict() for metric in metrics])
+    serialize = sparse(Metrics.to_dict, fields)
+    return jsonify([serialize(metric) for metric in query.all()])
 
 @ai_model_bp.route('/metrics', methods=['POST'])
 def create_metric():
@@ -515,8 +489,9 @@ def create_metric():
 @ai_model_bp.route('/metrics/<metric_id>', methods=['GET'])
 def get_metric(metric_id):
     """Get a specific metric by ID"""
-    metric = Metrics.query.get_or_404(metric_id)
-    return jsonify(metric.to_dict())
+    fields = requested_fields(Metrics)
+    metric = Metrics.query.options(*load_fields(Metrics, fields)).filter(Metrics.id == metric_id).first_or_404()
+    return jsonify(sparse(Metrics.to_dict, fields)(metric))
 
 @ai_model_bp.route('/metrics/<metric_id>', methods=['PUT'])
 def update_metric(metric_id):
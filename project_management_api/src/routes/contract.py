@@ -1,8 +1,19 @@
-from flask import Blueprint, jsonify, request
-from src.models.user import db
-from src.models.contract import Contract, Cost, Budget
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from src.models.user import db, User
+from src.models.project import Project
+from src.models.contract import Contract, Cost, Budget, BudgetLedgerEntry
+from src.pagination import paginate
+from src.loading import load_fields, requested_fields, requested_includes, sparse
+from src.search import search_filter
+from src.streaming import import_results, iter_records
+from src.cost_rollup import KEY_COLUMNS, add_cost_delta, apply_cost_deltas
+from src.budget_ledger import apply_ledger_entries, cost_spend, ledger_entries
+from src.finance import financial_summary
+from src.numbering import next_contract_number
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
 import json
+import uuid
 
 contract_bp = Blueprint('contract', __name__)
 
@@ -11,8 +22,6 @@ contract_bp = Blueprint('contract', __name__)
 @contract_bp.route('/contracts', methods=['GET'])
 def get_contracts():
     """Get all contracts with optional filtering"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
     status = request.args.get('status')
     contract_type = request.args.get('contract_type')
     client_id = request.args.get('client_id')
@@ -34,32 +43,17 @@ def get_contracts():
         query = query.filter(Contract.project_id == project_id)
     
     if search:
-        query = query.filter(
-            (Contract.title.contains(search)) |
-            (Contract.contract_number.contains(search)) |
-            (Contract.description.contains(search))
-        )
-    
-    contracts = query.paginate(page=page, per_page=per_page, error_out=False)
+        query = search_filter(query, Contract, search)
     
-    return jsonify({
-        'contracts': [contract.to_dict() for contract in contracts.items],
-        'total': contracts.total,
-        'pages': contracts.pages,
-        'current_page': page,
-        'per_page': per_page
-    })
+    return jsonify(paginate(query, Contract, 'contracts'))
 
 @contract_bp.route('/contracts', methods=['POST'])
 def create_contract():
     """Create a new contract"""
     data = request.json
     
-    # Generate contract number if not provided
-    contract_number = data.get('contract_number')
-    if not contract_number:
-        # Generate a simple contract number based on timestamp
-        contract_number = f"CNT-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+    # Allocate the next contract number if none was provided
+    contract_number = data.get('contract_number') or next_contract_number()
     
     contract = Contract(
         contract_number=contract_number,
@@ -95,8 +89,9 @@ def create_contract():
 @contract_bp.route('/contracts/<contract_id>', methods=['GET'])
 def get_contract(contract_id):
     """Get a specific contract by ID"""
-    contract = Contract.query.get_or_404(contract_id)
-    contract_data = contract.to_dict()
+    fields = requested_fields(Contract)
+    contract = Contract.query.options(*load_fields(Contract, fields)).filter(Contract.id == contract_id).first_or_404()
+    contract_data = sparse(Contract.to_dict, fields)(contract)
     
     # Include related costs
     costs = Cost.query.filter_by(contract_id=contract_id).all()
@@ -212,8 +207,6 @@ def sign_contract(contract_id):
 @contract_bp.route('/costs', methods=['GET'])
 def get_costs():
     """Get all costs with optional filtering"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
     project_id = request.args.get('project_id')
     contract_id = request.args.get('contract_id')
     category = request.args.get('category')
@@ -245,15 +238,7 @@ def get_costs():
     if date_to:
         query = query.filter(Cost.date_incurred <= datetime.fromisoformat(date_to))
     
-    costs = query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    return jsonify({
-        'costs': [cost.to_dict() for cost in costs.items],
-        'total': costs.total,
-        'pages': costs.pages,
-        'current_page': page,
-        'per_page': per_page
-    })
+    return jsonify(paginate(query, Cost, 'costs'))
 
 @contract_bp.route('/costs', methods=['POST'])
 def create_cost():
@@ -286,11 +271,140 @@ def create_cost():
     db.session.commit()
     return jsonify(cost.to_dict()), 201
 
+COST_IMPORT_REQUIRED_FIELDS = ('description', 'amount')
+COST_STATUSES = ('pending', 'approved', 'rejected', 'paid')
+# Imported in one of these states, a cost must name its approver, as /costs/<id>/approve records one
+COST_APPROVED_STATUSES = ('approved', 'paid')
+COST_IMPORT_TEXT_FIELDS = ('project_id', 'contract_id', 'budget_allocation_id', 'category', 'subcategory',
+                           'cost_type', 'billing_type', 'vendor', 'invoice_number', 'receipt_url', 'notes',
+                           'created_by', 'approved_by')
+
+def _parse_cost_record(record):
+    """Turn one imported record into a costs row, or return an error message"""
+    missing = [field for field in COST_IMPORT_REQUIRED_FIELDS if record.get(field) in (None, '')]
+    if missing:
+        return None, f"Missing fields: {', '.join(missing)}"
+    row = {field: str(record[field]) for field in COST_IMPORT_TEXT_FIELDS if record.get(field) not in (None, '')}
+    row['description'] = str(record['description'])
+    row['currency'] = str(record.get('currency') or 'USD').upper()
+    if len(row['currency']) != 3 or not row['currency'].isalpha():
+        return None, 'Invalid currency'
+    row['status'] = record.get('status') or 'pending'
+    if row['status'] not in COST_STATUSES:
+        return None, 'Invalid status'
+    if row['status'] in COST_APPROVED_STATUSES:
+        if 'approved_by' not in row:
+            return None, f"approved_by is required for status {row['status']}"
+    else:
+        row.pop('approved_by', None)
+    for field in ('amount', 'tax_amount', 'tax_rate'):
+        if record.get(field) not in (None, ''):
+            try:
+                value = Decimal(str(record[field]))
+            except InvalidOperation:
+                return None, f'Invalid {field}'
+            # NaN, infinities and values too wide for the column would fail the whole chunk's INSERT
+            column = Cost.__table__.c[field].type
+            if not value.is_finite() or abs(value) >= 10 ** (column.precision - column.scale):
+                return None, f'Invalid {field}'
+            row[field] = value
+    for field in ('date_incurred', 'payment_date', 'approval_date'):
+        if record.get(field):
+            try:
+                row[field] = datetime.fromisoformat(str(record[field]))
+            except ValueError:
+                return None, f'Invalid {field}'
+    return row, None
+
+def _known_ids(model, ids):
+    """The subset of ``ids`` that exist, in one IN query"""
+    if not ids:
+        return set()
+    return {row[0] for row in db.session.query(model.id).filter(model.id.in_(ids))}
+
+def _import_cost_batch(batch):
+    """Validate, de-duplicate and insert one chunk of imported costs"""
+    results = {}
+    candidates = []
+    for row_number, record, error in batch:
+        if not error:
+            row, error = _parse_cost_record(record)
+        if error:
+            results[row_number] = {'row': row_number, 'status': 'error', 'error': error}
+        else:
+            candidates.append((row_number, row))
+    
+    # One set-based lookup per referenced table, and one for the invoices
+    known = {
+        column: _known_ids(model, {row[column] for _, row in candidates if column in row})
+        for column, model in (('project_id', Project), ('contract_id', Contract), ('budget_allocation_id', Budget),
+                              ('approved_by', User))
+    }
+    invoices = {(row['vendor'], row['invoice_number']) for _, row in candidates
+                if 'vendor' in row and 'invoice_number' in row}
+    imported = {}
+    if invoices:
+        # Both IN lists seek the (vendor, invoice_number) index; the exact pairs are matched here
+        existing = db.session.query(Cost.vendor, Cost.invoice_number, Cost.id).filter(
+            Cost.vendor.in_({vendor for vendor, _ in invoices}),
+            Cost.invoice_number.in_({invoice_number for _, invoice_number in invoices})
+        )
+        imported = {(vendor, invoice_number): cost_id for vendor, invoice_number, cost_id in existing
+                    if (vendor, invoice_number) in invoices}
+    
+    now = datetime.utcnow()
+    cost_rows = []
+    for row_number, row in candidates:
+        unknown = [column for column in known if column in row and row[column] not in known[column]]
+        invoice = (row.get('vendor'), row.get('invoice_number'))
+        if unknown:
+            results[row_number] = {'row': row_number, 'status': 'error', 'error': f'Unknown {unknown[0]}'}
+        elif invoice in imported:
+            results[row_number] = {'row': row_number, 'status': 'duplicate', 'id': imported[invoice]}
+        else:
+            row.update(id=str(uuid.uuid4()), created_at=now, updated_at=now)
+            row.setdefault('date_incurred', now)
+            if 'approved_by' in row:
+                row.setdefault('approval_date', now)
+            else:
+                row.pop('approval_date', None)
+            if None not in invoice:
+                imported[invoice] = row['id']
+            cost_rows.append(row)
+            results[row_number] = {'row': row_number, 'status': 'created', 'id': row['id']}
+    
+    if cost_rows:
+        db.session.execute(Cost.__table__.insert(), cost_rows)
+        # The bulk insert skips the flush events that keep rollups and budget spend current
+        deltas = {}
+        entries = []
+        for row in cost_rows:
+            add_cost_delta(deltas, tuple(row.get(column) for column in KEY_COLUMNS), row['date_incurred'],
+                           row['amount'], 1)
+            entries.extend(ledger_entries(row['id'], cost_spend(None, None, None),
+                                          cost_spend(row.get('budget_allocation_id'), row['status'], row['amount'])))
+        conn = db.session.connection()
+        apply_cost_deltas(conn, deltas)
+        apply_ledger_entries(conn, entries)
+    db.session.commit()
+    
+    return [results[row_number] for row_number, _, _ in batch]
+
+@contract_bp.route('/costs/bulk', methods=['POST'])
+def bulk_create_costs():
+    """Stream-import costs from NDJSON or CSV, reporting one result per row"""
+    batch_size = request.args.get('batch_size', current_app.config['COST_IMPORT_BATCH_SIZE'], type=int)
+    records = iter_records(request)
+    # A chunk is all-or-nothing; a failed one is reported and the next one carries on
+    results = import_results(records, batch_size, _import_cost_batch)
+    return Response(stream_with_context(results), mimetype='application/x-ndjson')
+
 @contract_bp.route('/costs/<cost_id>', methods=['GET'])
 def get_cost(cost_id):
     """Get a specific cost by ID"""
-    cost = Cost.query.get_or_404(cost_id)
-    return jsonify(cost.to_dict())
+    fields = requested_fields(Cost)
+    cost = Cost.query.options(*load_fields(Cost, fields)).filter(Cost.id == cost_id).first_or_404()
+    return jsonify(sparse(Cost.to_dict, fields)(cost))
 
 @contract_bp.route('/costs/<cost_id>', methods=['PUT'])
 def update_cost(cost_id):
@@ -354,7 +468,8 @@ def get_budgets():
     approval_status = request.args.get('approval_status')
     budget_period = request.args.get('budget_period')
     
-    query = Budget.query
+    fields = requested_fields(Budget, list_view=True)
+    query = Budget.query.options(*load_fields(Budget, fields))
     
     if project_id:
         query = query.filter(Budget.project_id == project_id)
@@ -365,8 +480,8 @@ def get_budgets():
     if budget_period:
         query = query.filter(Budget.budget_period == budget_period)
     
-    budgets = query.all()
-    return jsonify([budget.to_dict() for budget in budgets])
+    serialize = sparse(Budget.to_dict, fields)
+    return jsonify([serialize(budget) for budget in query.all()])
 
 @contract_bp.route('/budgets', methods=['POST'])
 def create_budget():
@@ -388,8 +503,10 @@ def create_budget():
         created_by=data.get('created_by')
     )
     
-    # Calculate remaining budget
-    budget.remaining_budget = budget.total_budget - budget.allocated_budget
+    # Nothing is spent yet; the budget ledger moves spent and remaining from here
+    budget.allocated_budget = 0
+    budget.spent_budget = 0
+    budget.remaining_budget = budget.total_budget
     
     db.session.add(budget)
     db.session.commit()
@@ -398,17 +515,17 @@ def create_budget():
 @contract_bp.route('/budgets/<budget_id>', methods=['GET'])
 def get_budget(budget_id):
     """Get a specific budget by ID"""
-    budget = Budget.query.get_or_404(budget_id)
-    budget_data = budget.to_dict()
+    fields = requested_fields(Budget)
+    budget = Budget.query.options(*load_fields(Budget, fields, 'total_budget')).filter(Budget.id == budget_id).first_or_404()
+    budget_data = sparse(Budget.to_dict, fields)(budget)
     
-    # Include allocated costs
-    costs = Cost.query.filter_by(budget_allocation_id=budget_id).all()
-    budget_data['allocated_costs'] = [cost.to_dict() for cost in costs]
+    # Spend is kept current by the budget ledger, so it is read off the row
+    budget_data['actual_spent_budget'] = float(budget.spent_budget or 0)
+    budget_data['remaining_budget'] = float(budget.total_budget) - budget_data['actual_spent_budget']
     
-    # Calculate actual spent budget
-    actual_spent = sum(float(cost.amount) for cost in costs if cost.status == 'approved')
-    budget_data['actual_spent_budget'] = actual_spent
-    budget_data['remaining_budget'] = float(budget.total_budget) - actual_spent
+    if 'costs' in requested_includes('costs'):
+        costs = Cost.query.filter_by(budget_allocation_id=budget_id).all()
+        budget_data['allocated_costs'] = [cost.to_dict() for cost in costs]
     
     return jsonify(budget_data)
 
@@ -422,7 +539,6 @@ def update_budget(budget_id):
     budget.description = data.get('description', budget.description)
     budget.total_budget = data.get('total_budget', budget.total_budget)
     budget.allocated_budget = data.get('allocated_budget', budget.allocated_budget)
-    budget.spent_budget = data.get('spent_budget', budget.spent_budget)
     budget.currency = data.get('currency', budget.currency)
     budget.budget_period = data.get('budget_period', budget.budget_period)
     budget.approval_status = data.get('approval_status', budget.approval_status)
@@ -441,8 +557,9 @@ def update_budget(budget_id):
         budget.approved_by = data['approved_by']
         budget.approval_date = datetime.utcnow()
     
-    # Recalculate remaining budget
-    budget.remaining_budget = budget.total_budget - budget.spent_budget
+    # Recalculate remaining budget against the spend column as it stands in
+    # the database, which cost approvals move concurrently
+    budget.remaining_budget = Decimal(str(budget.total_budget)) - Budget.spent_budget
     
     # Increment revision number if significant changes
     if any(key in data for key in ['total_budget', 'categories', 'budget_period']):
@@ -462,10 +579,20 @@ def delete_budget(budget_id):
     if costs > 0:
         return jsonify({'error': 'Cannot delete budget with allocated costs'}), 400
     
+    BudgetLedgerEntry.query.filter_by(budget_id=budget_id).delete(synchronize_session=False)
     db.session.delete(budget)
     db.session.commit()
     return '', 204
 
+@contract_bp.route('/budgets/<budget_id>/ledger', methods=['GET'])
+def get_budget_ledger(budget_id):
+    """Get the spend changes recorded against a budget"""
+    Budget.query.get_or_404(budget_id)
+    query = BudgetLedgerEntry.query.filter(BudgetLedgerEntry.budget_id == budget_id).order_by(
+        BudgetLedgerEntry.created_at, BudgetLedgerEntry.id
+    )
+    return jsonify(paginate(query, BudgetLedgerEntry, 'entries'))
+
 @contract_bp.route('/budgets/<budget_id>/approve', methods=['POST'])
 def approve_budget(budget_id):
     """Approve a budget"""
@@ -484,44 +611,14 @@ def approve_budget(budget_id):
 @contract_bp.route('/financial-summary', methods=['GET'])
 def get_financial_summary():
     """Get financial summary across projects and contracts"""
-    project_id = request.args.get('project_id')
     date_from = request.args.get('date_from')
     date_to = request.args.get('date_to')
-    
-    # Base queries
-    contract_query = Contract.query
-    cost_query = Cost.query
-    budget_query = Budget.query
-    
-    if project_id:
-        contract_query = contract_query.filter(Contract.project_id == project_id)
-        cost_query = cost_query.filter(Cost.project_id == project_id)
-        budget_query = budget_query.filter(Budget.project_id == project_id)
-    
-    if date_from:
-        cost_query = cost_query.filter(Cost.date_incurred >= datetime.fromisoformat(date_from))
-    
-    if date_to:
-        cost_query = cost_query.filter(Cost.date_incurred <= datetime.fromisoformat(date_to))
-    
-    # Calculate totals
-    contracts = contract_query.all()
-    costs = cost_query.all()
-    budgets = budget_query.all()
-    
-    total_contract_value = sum(float(c.total_value) for c in contracts if c.total_value)
-    total_approved_costs = sum(float(c.amount) for c in costs if c.status == 'approved')
-    total_pending_costs = sum(float(c.amount) for c in costs if c.status == 'pending')
-    total_budget_allocated = sum(float(b.total_budget) for b in budgets if b.approval_status == 'approved')
-    
-    return jsonify({
-        'total_contract_value': total_contract_value,
-        'total_approved_costs': total_approved_costs,
-        'total_pending_costs': total_pending_costs,
-        'total_budget_allocated': total_budget_allocated,
-        'budget_utilization': (total_approved_costs / total_budget_allocated * 100) if total_budget_allocated > 0 else 0,
-        'contract_count': len(contracts),
-        'cost_count': len(costs),
-        'budget_count': len(budgets)
-    })
+
+    return jsonify(financial_summary(
+        project_id=request.args.get('project_id'),
+        date_from=datetime.fromisoformat(date_from) if date_from else None,
+        date_to=datetime.fromisoformat(date_to) if date_to else None,
+        group_by=request.args.get('group_by'),
+        report_currency=request.args.get('report_currency')
+    ))
 
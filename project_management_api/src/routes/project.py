@@ -1,7 +1,16 @@
-from flask import Blueprint, jsonify, request
-from src.models.user import db
-from src.models.project import Project, Task, ProjectTeam
+from flask import Blueprint, current_app, jsonify, request
+from src.models.user import db, User
+from src.models.comment import Comment
+from src.models.project import Project, Task, TaskDependency, ProjectTeam, ProjectTaskStats
+from src.pagination import paginate
+from src.search import search_filter, unindex_entities
+from src.streaming import batched
+from src.task_stats import add_task_delta, apply_task_deltas
+from src.scheduling import project_schedule
+from src.errors import HttpException
+from src.loading import eager_load, load_fields, requested_fields, requested_includes, sparse
 from datetime import datetime
+from sqlalchemy import case, func, select
 import json
 
 project_bp = Blueprint('project', __name__)
@@ -11,8 +20,6 @@ project_bp = Blueprint('project', __name__)
 @project_bp.route('/projects', methods=['GET'])
 def get_projects():
     """Get all projects with optional filtering"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
     status = request.args.get('status')
     project_type = request.args.get('project_type')
     priority = request.args.get('priority')
@@ -39,20 +46,9 @@ def get_projects():
         query = query.filter(Project.client_id == client_id)
     
     if search:
-        query = query.filter(
-            (Project.name.contains(search)) |
-            (Project.description.contains(search))
-        )
+        query = search_filter(query, Project, search)
     
-    projects = query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    return jsonify({
-        'projects': [project.to_dict() for project in projects.items],
-        'total': projects.total,
-        'pages': projects.pages,
-        'current_page': page,
-        'per_page': per_page
-    })
+    return jsonify(paginate(query, Project, 'projects'))
 
 @project_bp.route('/projects', methods=['POST'])
 def create_project():
@@ -93,21 +89,19 @@ def create_project():
 @project_bp.route('/projects/<project_id>', methods=['GET'])
 def get_project(project_id):
     """Get a specific project by ID"""
-    project = Project.query.get_or_404(project_id)
-    project_data = project.to_dict()
+    fields = requested_fields(Project)
+    project = Project.query.options(*load_fields(Project, fields)).filter(Project.id == project_id).first_or_404()
+    project_data = sparse(Project.to_dict, fields)(project)
     
     # Include team members
     team_members = ProjectTeam.query.filter_by(project_id=project_id, is_active=True).all()
     project_data['team_members'] = [tm.to_dict() for tm in team_members]
     
     # Include task summary
-    tasks = Task.query.filter_by(project_id=project_id).all()
-    project_data['task_summary'] = {
-        'total_tasks': len(tasks),
-        'completed_tasks': len([t for t in tasks if t.status == 'completed']),
-        'in_progress_tasks': len([t for t in tasks if t.status == 'in_progress']),
-        'blocked_tasks': len([t for t in tasks if t.status == 'blocked'])
-    }
+    stats = db.session.get(ProjectTaskStats, project_id) or ProjectTaskStats(
+        project_id=project_id, total_tasks=0, completed_tasks=0, in_progress_tasks=0, blocked_tasks=0
+    )
+    project_data['task_summary'] = stats.to_summary()
     
     return jsonify(project_data)
 
@@ -176,6 +170,22 @@ def delete_project(project_id):
 
 # Task endpoints
 
+def _set_dependencies(task, depends_on_ids):
+    """Validate and store the tasks ``task`` waits on; the caller commits"""
+    if not isinstance(depends_on_ids, list):
+        raise HttpException(400, 'dependencies must be a list of task IDs')
+    depends_on_ids = sorted({str(task_id) for task_id in depends_on_ids})
+    known = {row.id for row in db.session.query(Task.id).filter(
+        Task.id.in_(depends_on_ids), Task.project_id == task.project_id
+    )}
+    unknown = [task_id for task_id in depends_on_ids if task_id not in known]
+    if unknown:
+        raise HttpException(400, f"Unknown dependency in this project: {', '.join(unknown)}")
+    if TaskDependency.would_cycle(task.id, depends_on_ids):
+        raise HttpException(400, 'Dependencies would create a cycle')
+    TaskDependency.replace(task, depends_on_ids)
+    task.dependencies = json.dumps(depends_on_ids)
+
 @project_bp.route('/projects/<project_id>/tasks', methods=['GET'])
 def get_project_tasks(project_id):
     """Get all tasks for a project"""
@@ -184,7 +194,9 @@ def get_project_tasks(project_id):
     priority = request.args.get('priority')
     parent_task_id = request.args.get('parent_task_id')
     
-    query = Task.query.filter_by(project_id=project_id)
+    include = requested_includes('comments')
+    fields = requested_fields(Task, list_view=True)
+    query = Task.query.options(*eager_load(Task, *include), *load_fields(Task, fields)).filter_by(project_id=project_id)
     
     if status:
         query = query.filter(Task.status == status)
@@ -200,15 +212,12 @@ def get_project_tasks(project_id):
     elif parent_task_id == 'null':
         query = query.filter(Task.parent_task_id.is_(None))
     
-    tasks = query.all()
-    return jsonify([task.to_dict() for task in tasks])
+    serialize = sparse(lambda task: Task.to_dict(task, include), fields)
+    return jsonify([serialize(task) for task in query.all()])
 
-@project_bp.route('/tasks', methods=['POST'])
-def create_task():
-    """Create a new task"""
-    data = request.json
-    
-    task = Task(
+def _new_task(data):
+    """Build a Task from a create payload"""
+    return Task(
         title=data['title'],
         description=data.get('description'),
         project_id=data['project_id'],
@@ -222,28 +231,86 @@ def create_task():
         start_date=datetime.fromisoformat(data['start_date']) if data.get('start_date') else None,
         due_date=datetime.fromisoformat(data['due_date']) if data.get('due_date') else None,
         tags=json.dumps(data.get('tags', [])),
-        dependencies=json.dumps(data.get('dependencies', [])),
+        dependencies=json.dumps([]),
         attachments=json.dumps(data.get('attachments', [])),
-        comments=json.dumps(data.get('comments', [])),
         created_by=data.get('created_by')
     )
+
+@project_bp.route('/tasks', methods=['POST'])
+def create_task():
+    """Create a new task"""
+    data = request.json
     
+    task = _new_task(data)
     db.session.add(task)
+    if data.get('dependencies'):
+        db.session.flush()
+        _set_dependencies(task, data['dependencies'])
     db.session.commit()
     return jsonify(task.to_dict()), 201
 
 @project_bp.route('/tasks/<task_id>', methods=['GET'])
 def get_task(task_id):
     """Get a specific task by ID"""
-    task = Task.query.get_or_404(task_id)
-    task_data = task.to_dict()
+    include = requested_includes('comments')
+    fields = requested_fields(Task)
+    options = eager_load(Task, *include) + load_fields(Task, fields)
+    serialize = sparse(lambda task: Task.to_dict(task, include), fields)
+    task = Task.query.options(*options).filter(Task.id == task_id).first_or_404()
+    task_data = serialize(task)
     
     # Include subtasks
-    subtasks = Task.query.filter_by(parent_task_id=task_id).all()
-    task_data['subtasks'] = [subtask.to_dict() for subtask in subtasks]
+    subtasks = Task.query.options(*options).filter_by(parent_task_id=task_id).all()
+    task_data['subtasks'] = [serialize(subtask) for subtask in subtasks]
     
     return jsonify(task_data)
 
+@project_bp.route('/tasks/<task_id>/tree', methods=['GET'])
+def get_task_tree(task_id):
+    """Get a task with its whole subtree, optionally rolling up hours and progress"""
+    max_depth = current_app.config.get('TASK_TREE_MAX_DEPTH', 50)
+    depth = min(request.args.get('depth', max_depth, type=int), max_depth)
+    rollup = request.args.get('rollup', 'false').lower() == 'true'
+    fields = requested_fields(Task, list_view=True)
+    serialize = sparse(Task.to_dict, fields)
+
+    rows = Task.subtree(task_id, max(depth, 0)).options(
+        *load_fields(Task, fields, 'parent_task_id', 'estimated_hours', 'actual_hours', 'progress_percentage')
+    ).all()
+    if not rows:
+        return jsonify({'error': 'Task not found'}), 404
+
+    # Rows arrive parents first, so every parent is in place before its children
+    nodes = {}
+    order = []
+    for task, level in rows:
+        node = serialize(task)
+        node['depth'] = level
+        node['subtasks'] = []
+        nodes[task.id] = node
+        order.append(task)
+        if level > 0:
+            nodes[task.parent_task_id]['subtasks'].append(node)
+
+    if rollup:
+        # Children before parents; progress is weighted by estimated hours (1 when unset)
+        totals = {}
+        for task in reversed(order):
+            weight = task.estimated_hours or 1
+            own = [1, task.estimated_hours or 0, task.actual_hours or 0, (task.progress_percentage or 0) * weight, weight]
+            for child in nodes[task.id]['subtasks']:
+                own = [mine + theirs for mine, theirs in zip(own, totals[child['id']])]
+            totals[task.id] = own
+            count, estimated, actual, weighted_progress, weights = own
+            nodes[task.id]['rollup'] = {
+                'task_count': count,
+                'estimated_hours': estimated,
+                'actual_hours': actual,
+                'progress_percentage': round(weighted_progress / weights, 2)
+            }
+
+    return jsonify(nodes[order[0].id])
+
 @project_bp.route('/tasks/<task_id>', methods=['PUT'])
 def update_task(task_id):
     """Update a task"""
@@ -276,14 +343,11 @@ def update_task(task_id):
         task.tags = json.dumps(data['tags'])
     
     if 'dependencies' in data:
-        task.dependencies = json.dumps(data['dependencies'])
+        _set_dependencies(task, data['dependencies'])
     
     if 'attachments' in data:
         task.attachments = json.dumps(data['attachments'])
     
-    if 'comments' in data:
-        task.comments = json.dumps(data['comments'])
-    
     if 'ai_model_metrics' in data:
         task.ai_model_metrics = json.dumps(data['ai_model_metrics'])
     
@@ -301,10 +365,226 @@ def delete_task(task_id):
     if subtasks > 0:
         return jsonify({'error': 'Cannot delete task with subtasks'}), 400
     
+    TaskDependency.remove_tasks([task_id])
     db.session.delete(task)
     db.session.commit()
     return '', 204
 
+TASK_PRIORITIES = ('low', 'medium', 'high', 'critical')
+BULK_UPDATE_FIELDS = ('status', 'assigned_to', 'priority', 'due_date')
+# Ids per IN (...) list, well below SQLite's bound-parameter limit
+BULK_IN_CHUNK = 500
+
+def _check_task_values(values):
+    """Error message for an invalid status/priority/date/dependencies in a payload, else None"""
+    if 'status' in values and values['status'] not in ProjectTaskStats.STATUS_COLUMNS:
+        return f"Invalid status: {values['status']}"
+    if 'priority' in values and values['priority'] not in TASK_PRIORITIES:
+        return f"Invalid priority: {values['priority']}"
+    for field in ('start_date', 'due_date'):
+        if values.get(field):
+            try:
+                datetime.fromisoformat(values[field])
+            except (TypeError, ValueError):
+                return f"Invalid {field}: {values[field]}"
+    if values.get('dependencies') and not isinstance(values['dependencies'], list):
+        return 'dependencies must be a list of task IDs'
+    return None
+
+def _bulk_rejected(errors):
+    errors.sort(key=lambda error: (('create', 'update', 'delete').index(error['op']), error['index']))
+    return jsonify({'error': 'Bulk operation rejected, nothing was changed', 'errors': errors}), 400
+
+def _existing(column, values, *columns):
+    """Rows of (column, *columns) whose column is in values, in IN-list sized chunks"""
+    rows = []
+    for chunk in batched(sorted(values, key=str), BULK_IN_CHUNK):
+        rows.extend(db.session.query(column, *columns).filter(column.in_(chunk)).all())
+    return rows
+
+@project_bp.route('/tasks/bulk', methods=['POST'])
+def bulk_tasks():
+    """Create, update and delete many tasks in one transaction"""
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Body must be a JSON object with create, update and delete lists'}), 400
+    creates = data.get('create', [])
+    updates = data.get('update', [])
+    deletes = data.get('delete', [])
+    if not all(isinstance(items, list) for items in (creates, updates, deletes)):
+        return jsonify({'error': 'create, update and delete must be lists'}), 400
+    limit = current_app.config.get('TASK_BULK_MAX_ITEMS', 1000)
+    if len(creates) + len(updates) + len(deletes) > limit:
+        return jsonify({'error': f'At most {limit} items per request'}), 400
+
+    errors = []
+    for index, item in enumerate(creates):
+        if not isinstance(item, dict) or not item.get('title') or not item.get('project_id'):
+            error = 'title and project_id are required'
+        else:
+            error = _check_task_values(item)
+        if error:
+            errors.append({'op': 'create', 'index': index, 'error': error})
+
+    changes_by_id = {}
+    update_index = {}
+    for index, item in enumerate(updates):
+        if not isinstance(item, dict) or not isinstance(item.get('id'), str):
+            errors.append({'op': 'update', 'index': index, 'error': 'id is required'})
+            continue
+        changes = {key: item[key] for key in BULK_UPDATE_FIELDS if key in item}
+        error = _check_task_values(changes)
+        if not changes:
+            error = f"Nothing to update; allowed fields: {', '.join(BULK_UPDATE_FIELDS)}"
+        elif item['id'] in changes_by_id:
+            error = 'Task appears more than once'
+        if error:
+            errors.append({'op': 'update', 'index': index, 'id': item['id'], 'error': error})
+        else:
+            changes_by_id[item['id']] = changes
+            update_index[item['id']] = index
+
+    updated_ids = {item.get('id') for item in updates if isinstance(item, dict)}
+    delete_index = {}
+    for index, task_id in enumerate(deletes):
+        if not isinstance(task_id, str) or task_id in delete_index or task_id in updated_ids:
+            errors.append({'op': 'delete', 'index': index, 'id': task_id,
+                           'error': 'Task ids must be unique and not also updated'})
+        else:
+            delete_index[task_id] = index
+    delete_ids = list(delete_index)
+
+    # One round of lookups covers every existence check in the request
+    current = {row.id: row for row in _existing(Task.id, set(changes_by_id) | set(delete_ids),
+                                                Task.project_id, Task.status)}
+    projects = {row[0] for row in _existing(Project.id, {item['project_id'] for item in creates
+                                                           if isinstance(item, dict) and item.get('project_id')})}
+    assignees = {changes['assigned_to'] for changes in changes_by_id.values() if changes.get('assigned_to')}
+    users = {row[0] for row in _existing(User.id, assignees)}
+    orphaned = {row[0] for row in _existing(Task.parent_task_id, set(delete_ids), Task.id)
+                if row[1] not in delete_index}
+    parents = {row[0] for row in _existing(Task.id, {str(item['parent_task_id']) for item in creates
+                                                     if isinstance(item, dict) and item.get('parent_task_id')})}
+
+    for index, item in enumerate(creates):
+        if not isinstance(item, dict):
+            continue
+        parent_id = str(item['parent_task_id']) if item.get('parent_task_id') else None
+        dependencies = item.get('dependencies') if isinstance(item.get('dependencies'), list) else []
+        deleted_dependencies = sorted({str(task_id) for task_id in dependencies if str(task_id) in delete_index})
+        if item.get('project_id') and item['project_id'] not in projects:
+            errors.append({'op': 'create', 'index': index, 'error': 'Project not found'})
+        elif parent_id and parent_id not in parents:
+            errors.append({'op': 'create', 'index': index, 'error': 'Parent task not found'})
+        elif parent_id in delete_index:
+            errors.append({'op': 'create', 'index': index, 'error': 'Parent task is deleted in this request'})
+        elif deleted_dependencies:
+            errors.append({'op': 'create', 'index': index,
+                           'error': f"Dependency deleted in this request: {', '.join(deleted_dependencies)}"})
+    for task_id, index in update_index.items():
+        if task_id not in current:
+            errors.append({'op': 'update', 'index': index, 'id': task_id, 'error': 'Task not found'})
+        elif changes_by_id[task_id].get('assigned_to') not in users | {None}:
+            errors.append({'op': 'update', 'index': index, 'id': task_id, 'error': 'Assignee not found'})
+    for task_id, index in delete_index.items():
+        if task_id not in current:
+            errors.append({'op': 'delete', 'index': index, 'id': task_id, 'error': 'Task not found'})
+        elif task_id in orphaned:
+            errors.append({'op': 'delete', 'index': index, 'id': task_id, 'error': 'Cannot delete task with subtasks'})
+
+    if errors:
+        return _bulk_rejected(errors)
+
+    created = [_new_task(item) for item in creates]
+    db.session.add_all(created)
+    db.session.flush()
+    # Dependencies can only be checked against the flushed tasks; report every bad one
+    for index, (task, item) in enumerate(zip(created, creates)):
+        if item.get('dependencies'):
+            try:
+                _set_dependencies(task, item['dependencies'])
+            except HttpException as e:
+                errors.append({'op': 'create', 'index': index, 'error': e.message})
+    if errors:
+        db.session.rollback()
+        return _bulk_rejected(errors)
+
+    # Updates sharing the same changes go out as one UPDATE ... WHERE id IN (...)
+    now = datetime.utcnow()
+    deltas = {}
+    groups = {}
+    for task_id, changes in changes_by_id.items():
+        groups.setdefault(tuple(sorted(changes.items())), []).append(task_id)
+        if 'status' in changes and changes['status'] != current[task_id].status:
+            add_task_delta(deltas, current[task_id].project_id, current[task_id].status, -1)
+            add_task_delta(deltas, current[task_id].project_id, changes['status'], 1)
+    for changes, task_ids in groups.items():
+        values = dict(changes)
+        values['updated_at'] = now
+        if 'due_date' in values:
+            values['due_date'] = datetime.fromisoformat(values['due_date']) if values['due_date'] else None
+        if values.get('status') == 'completed':
+            values['completed_at'] = func.coalesce(Task.completed_at, now)
+        for chunk in batched(task_ids, BULK_IN_CHUNK):
+            Task.query.filter(Task.id.in_(chunk)).update(values, synchronize_session=False)
+
+    for task_id in delete_ids:
+        add_task_delta(deltas, current[task_id].project_id, current[task_id].status, -1)
+    for chunk in batched(delete_ids, BULK_IN_CHUNK):
+        Comment.query.filter(Comment.task_id.in_(chunk)).delete(synchronize_session=False)
+        TaskDependency.remove_tasks(chunk)
+        Task.query.filter(Task.id.in_(chunk)).delete(synchronize_session=False)
+        unindex_entities(Task, chunk)
+
+    # Bulk statements skip the session events that keep the counters current
+    apply_task_deltas(db.session.connection(), deltas)
+    db.session.commit()
+    return jsonify({
+        'created': [task.id for task in created],
+        'updated': list(changes_by_id),
+        'deleted': delete_ids
+    })
+
+@project_bp.route('/projects/<project_id>/board', methods=['GET'])
+def get_project_board(project_id):
+    """Get a project's tasks grouped by status, the top ``limit`` of each column"""
+    Project.query.get_or_404(project_id)
+    max_limit = current_app.config.get('BOARD_COLUMN_MAX_LIMIT', 100)
+    limit = max(1, min(request.args.get('limit', 20, type=int), max_limit))
+    fields = requested_fields(Task, list_view=True)
+    serialize = sparse(Task.to_dict, fields)
+
+    # Rank and count every column in one pass with window functions, then
+    # keep only the first ``limit`` rows of each
+    priority_rank = case({priority: rank for rank, priority in enumerate(reversed(TASK_PRIORITIES))},
+                         value=Task.priority, else_=len(TASK_PRIORITIES))
+    ranked = select(
+        Task.id,
+        func.row_number().over(
+            partition_by=Task.status,
+            order_by=(priority_rank, Task.due_date.is_(None), Task.due_date, Task.created_at, Task.id)
+        ).label('position'),
+        func.count().over(partition_by=Task.status).label('column_total')
+    ).where(Task.project_id == project_id).subquery()
+    rows = Task.query.options(*load_fields(Task, fields, 'status')).join(ranked, Task.id == ranked.c.id).filter(
+        ranked.c.position <= limit
+    ).add_columns(ranked.c.column_total).order_by(Task.status, ranked.c.position).all()
+
+    columns = {status: {'status': status, 'total': 0, 'tasks': []} for status in ProjectTaskStats.STATUS_COLUMNS}
+    for task, column_total in rows:
+        column = columns.setdefault(task.status, {'status': task.status, 'total': 0, 'tasks': []})
+        column['total'] = column_total
+        column['tasks'].append(serialize(task))
+
+    return jsonify({'project_id': project_id, 'limit': limit, 'columns': list(columns.values())})
+
+@project_bp.route('/projects/<project_id>/schedule', methods=['GET'])
+def get_project_schedule(project_id):
+    """Critical-path schedule of a project's tasks"""
+    Project.query.get_or_404(project_id)
+    start = request.args.get('start')
+    return jsonify(project_schedule(project_id, datetime.fromisoformat(start) if start else None))
+
 # Project Team endpoints
 
 @project_bp.route('/projects/<project_id>/team', methods=['GET'])
@@ -386,7 +666,7 @@ def get_user_projects(user_id):
     team_memberships = ProjectTeam.query.filter_by(
         user_id=user_id,
         is_active=is_active
-    ).all()
+    ).options(*eager_load(ProjectTeam, 'project')).all()
     
     result = []
     for tm in team_memberships:
@@ -412,13 +692,12 @@ def search_tasks():
     due_date_from = request.args.get('due_date_from')
     due_date_to = request.args.get('due_date_to')
     
-    task_query = Task.query
+    include = requested_includes('comments')
+    fields = requested_fields(Task, list_view=True)
+    task_query = Task.query.options(*eager_load(Task, *include), *load_fields(Task, fields))
     
     if query:
-        task_query = task_query.filter(
-            (Task.title.contains(query)) |
-            (Task.description.contains(query))
-        )
+        task_query = search_filter(task_query, Task, query)
     
     if project_ids:
         task_query = task_query.filter(Task.project_id.in_(project_ids))
@@ -438,6 +717,6 @@ def search_tasks():
     if due_date_to:
         task_query = task_query.filter(Task.due_date <= datetime.fromisoformat(due_date_to))
     
-    tasks = task_query.all()
-    return jsonify([task.to_dict() for task in tasks])
+    serialize = sparse(lambda task: Task.to_dict(task, include), fields)
+    return jsonify([serialize(task) for task in task_query.all()])
 
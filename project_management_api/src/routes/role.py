@@ -1,6 +1,9 @@
 from flask import Blueprint, jsonify, request
 from src.models.user import db
-from src.models.role import Role, UserRole
+from src.models.role import Role, RoleClosure, UserRole
+from src.models.user import User
+from src.permissions import permission_resolver
+from src.loading import eager_load
 from datetime import datetime
 import json
 
@@ -83,6 +86,8 @@ def create_role():
     )
     
     db.session.add(role)
+    db.session.flush()
+    RoleClosure.insert_node(role.id, role.parent_role_id)
     db.session.commit()
     return jsonify(role.to_dict()), 201
 
@@ -97,7 +102,9 @@ def get_role(role_id):
     role_data['subroles'] = [subrole.to_dict() for subrole in subroles]
     
     # Include assigned users
-    user_roles = UserRole.query.filter_by(role_id=role_id, status='active').all()
+    user_roles = UserRole.query.filter_by(role_id=role_id, status='active').options(
+        *eager_load(UserRole, 'user')
+    ).all()
     role_data['assigned_users'] = [ur.user.to_public_dict() for ur in user_roles]
     
     return jsonify(role_data)
@@ -107,6 +114,19 @@ def update_role(role_id):
     """Update a role"""
     role = Role.query.get_or_404(role_id)
     data = request.json
+    old_name = role.name
+    old_path = role.path
+    old_level = role.level
+    
+    # Validate a move before touching anything
+    moving = 'parent_role_id' in data and data['parent_role_id'] != role.parent_role_id
+    new_parent = None
+    if moving and data['parent_role_id']:
+        new_parent = Role.query.get(data['parent_role_id'])
+        if not new_parent:
+            return jsonify({'error': 'Parent role not found'}), 404
+        if RoleClosure.is_descendant(new_parent.id, role.id):
+            return jsonify({'error': 'Cannot move a role under itself or its descendants'}), 400
     
     # Update basic fields
     role.name = data.get('name', role.name)
@@ -127,16 +147,24 @@ def update_role(role_id):
     if 'required_skills' in data:
         role.required_skills = json.dumps(data['required_skills'])
     
-    # Update path if name changed
-    if 'name' in data and data['name'] != role.name:
-        if role.parent_role_id:
-            parent_role = Role.query.get(role.parent_role_id)
-            role.path = f"{parent_role.path}/{data['name']}"
+    role.updated_at = datetime.utcnow()
+    db.session.flush()
+    
+    # Renames and moves rewrite the path (and level) of the whole subtree
+    if moving or role.name != old_name:
+        if moving:
+            RoleClosure.move_subtree(role.id, new_parent.id if new_parent else None)
+            role.parent_role_id = new_parent.id if new_parent else None
+            new_level = new_parent.level + 1 if new_parent else 0
         else:
-            role.path = f"/{data['name']}"
+            new_level = old_level
+            new_parent = Role.query.get(role.parent_role_id) if role.parent_role_id else None
+        new_path = f"{new_parent.path}/{role.name}" if new_parent else f"/{role.name}"
+        db.session.flush()
+        RoleClosure.rewrite_subtree(role.id, old_path, new_path, new_level - old_level)
     
-    role.updated_at = datetime.utcnow()
     db.session.commit()
+    permission_resolver.invalidate_all()
     return jsonify(role.to_dict())
 
 @role_bp.route('/roles/<role_id>', methods=['DELETE'])
@@ -157,6 +185,7 @@ def delete_role(role_id):
     role.is_active = False
     role.updated_at = datetime.utcnow()
     db.session.commit()
+    permission_resolver.invalidate_all()
     return '', 204
 
 @role_bp.route('/roles/<role_id>/hierarchy', methods=['GET'])
@@ -164,25 +193,16 @@ def get_role_hierarchy(role_id):
     """Get the complete hierarchy for a role (ancestors and descendants)"""
     role = Role.query.get_or_404(role_id)
     
-    # Get ancestors
-    ancestors = []
-    current_role = role
-    while current_role.parent_role_id:
-        parent = Role.query.get(current_role.parent_role_id)
-        ancestors.insert(0, parent.to_dict())
-        current_role = parent
-    
-    # Get descendants (recursive)
-    def get_descendants(parent_id):
-        children = Role.query.filter_by(parent_role_id=parent_id).all()
-        result = []
-        for child in children:
-            child_data = child.to_dict()
-            child_data['subroles'] = get_descendants(child.id)
-            result.append(child_data)
-        return result
-    
-    descendants = get_descendants(role_id)
+    # Ancestors and the full subtree are one closure-table lookup each
+    ancestors = [ancestor.to_dict() for ancestor in RoleClosure.ancestors(role_id)]
+    
+    nodes = {role_id: {'subroles': []}}
+    for descendant in RoleClosure.descendants(role_id):
+        node = descendant.to_dict()
+        node['subroles'] = []
+        nodes[descendant.id] = node
+        nodes[descendant.parent_role_id]['subroles'].append(node)
+    descendants = nodes[role_id]['subroles']
     
     return jsonify({
         'role': role.to_dict(),
@@ -251,6 +271,7 @@ def assign_role():
     
     db.session.add(user_role)
     db.session.commit()
+    permission_resolver.invalidate_user(user_role.user_id)
     return jsonify(user_role.to_dict()), 201
 
 @role_bp.route('/user-roles/<user_role_id>', methods=['PUT'])
@@ -279,6 +300,7 @@ def update_user_role(user_role_id):
         user_role.approved_at = datetime.utcnow()
     
     db.session.commit()
+    permission_resolver.invalidate_user(user_role.user_id)
     return jsonify(user_role.to_dict())
 
 @role_bp.route('/user-roles/<user_role_id>', methods=['DELETE'])
@@ -287,12 +309,15 @@ def revoke_role(user_role_id):
     user_role = UserRole.query.get_or_404(user_role_id)
     user_role.status = 'expired'
     db.session.commit()
+    permission_resolver.invalidate_user(user_role.user_id)
     return '', 204
 
 @role_bp.route('/users/<user_id>/roles', methods=['GET'])
 def get_user_roles_by_user(user_id):
     """Get all roles for a specific user"""
-    user_roles = UserRole.query.filter_by(user_id=user_id, status='active').all()
+    user_roles = UserRole.query.filter(UserRole.user_id == user_id, UserRole.current()).options(
+        *eager_load(UserRole, 'role')
+    ).all()
     
     result = []
     for ur in user_roles:
@@ -308,10 +333,22 @@ def get_user_roles_by_user(user_id):
     
     return jsonify(result)
 
+@role_bp.route('/users/<user_id>/permissions', methods=['GET'])
+def get_user_permissions(user_id):
+    """Get a user's effective permissions from active roles and their ancestors"""
+    User.query.get_or_404(user_id)
+    mask = permission_resolver.get_mask(user_id)
+    return jsonify({
+        'user_id': user_id,
+        'permissions': permission_resolver.names(mask)
+    })
+
 @role_bp.route('/roles/<role_id>/users', methods=['GET'])
 def get_role_users(role_id):
     """Get all users assigned to a specific role"""
-    user_roles = UserRole.query.filter_by(role_id=role_id, status='active').all()
+    user_roles = UserRole.query.filter(UserRole.role_id == role_id, UserRole.current()).options(
+        *eager_load(UserRole, 'user')
+    ).all()
     
     result = []
     for ur in user_roles:
@@ -1,16 +1,23 @@
-from flask import Blueprint, jsonify, request
-from src.models.user import User, db
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from src.models.user import User, UserSkill, db, normalize_skills
+from src.pagination import paginate
+from src.loading import load_fields, requested_fields, sparse
+from src.search import index_entities, search_filter
+from src.streaming import import_results, iter_records, split_list
+from src.hashing import password_hasher
+from src.workload import team_workload
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
 import json
+import uuid
 from flask_jwt_extended import create_access_token
+from sqlalchemy import func
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/users', methods=['GET'])
 def get_users():
     """Get all users with optional filtering"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
     search = request.args.get('search', '')
     experience_level = request.args.get('experience_level', '')
     availability_status = request.args.get('availability_status', '')
@@ -19,12 +26,7 @@ def get_users():
     query = User.query
     
     if search:
-        query = query.filter(
-            (User.username.contains(search)) |
-            (User.first_name.contains(search)) |
-            (User.last_name.contains(search)) |
-            (User.email.contains(search))
-        )
+        query = search_filter(query, User, search)
     
     if experience_level:
         query = query.filter(User.experience_level == experience_level)
@@ -35,15 +37,7 @@ def get_users():
     if is_active:
         query = query.filter(User.is_active == (is_active.lower() == 'true'))
     
-    users = query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    return jsonify({
-        'users': [user.to_public_dict() for user in users.items],
-        'total': users.total,
-        'pages': users.pages,
-        'current_page': page,
-        'per_page': per_page
-    })
+    return jsonify(paginate(query, User, 'users', User.to_public_dict))
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -64,13 +58,13 @@ def create_user():
         last_name=data['last_name'],
         phone=data.get('phone'),
         bio=data.get('bio'),
-        skills=json.dumps(data.get('skills', [])),
         experience_level=data.get('experience_level', 'junior'),
         hourly_rate=data.get('hourly_rate'),
         availability_status=data.get('availability_status', 'available'),
         timezone=data.get('timezone', 'UTC'),
         language_preferences=json.dumps(data.get('language_preferences', ['en']))
     )
+    user.set_skills(data.get('skills', []))
     
     if 'password' in data:
         user.set_password(data['password'])
@@ -79,11 +73,107 @@ def create_user():
     db.session.commit()
     return jsonify(user.to_dict()), 201
 
+USER_IMPORT_REQUIRED_FIELDS = ('username', 'email', 'password', 'first_name', 'last_name')
+
+def _import_user_batch(batch):
+    """Validate, de-duplicate and insert one chunk of imported users"""
+    results = {}
+    candidates = []
+    for row_number, record, error in batch:
+        if error:
+            results[row_number] = {'row': row_number, 'status': 'error', 'error': error}
+            continue
+        missing = [field for field in USER_IMPORT_REQUIRED_FIELDS if not record.get(field)]
+        if missing:
+            results[row_number] = {'row': row_number, 'status': 'error',
+                                   'error': f"Missing fields: {', '.join(missing)}"}
+            continue
+        try:
+            if record.get('hourly_rate') is not None:
+                record['hourly_rate'] = Decimal(str(record['hourly_rate']))
+        except InvalidOperation:
+            results[row_number] = {'row': row_number, 'status': 'error', 'error': 'Invalid hourly_rate'}
+            continue
+        candidates.append((row_number, record))
+    
+    # One set-based lookup for every username and email in the chunk
+    usernames = {record['username'] for _, record in candidates}
+    emails = {record['email'] for _, record in candidates}
+    taken_usernames = set()
+    taken_emails = set()
+    if candidates:
+        existing = db.session.query(User.username, User.email).filter(
+            User.username.in_(usernames) | User.email.in_(emails)
+        )
+        for username, email in existing:
+            taken_usernames.add(username)
+            taken_emails.add(email)
+    
+    accepted = []
+    for row_number, record in candidates:
+        if record['username'] in taken_usernames:
+            results[row_number] = {'row': row_number, 'status': 'error', 'error': 'Username already exists'}
+        elif record['email'] in taken_emails:
+            results[row_number] = {'row': row_number, 'status': 'error', 'error': 'Email already exists'}
+        else:
+            taken_usernames.add(record['username'])
+            taken_emails.add(record['email'])
+            accepted.append((row_number, record))
+    
+    if accepted:
+        password_hashes = password_hasher.hash_many([str(record['password']) for _, record in accepted])
+        now = datetime.utcnow()
+        user_rows = []
+        skill_rows = []
+        for (row_number, record), password_hash in zip(accepted, password_hashes):
+            user_id = str(uuid.uuid4())
+            skills = split_list(record.get('skills'))
+            user_rows.append({
+                'id': user_id,
+                'username': record['username'],
+                'email': record['email'],
+                'password_hash': password_hash,
+                'first_name': record['first_name'],
+                'last_name': record['last_name'],
+                'phone': record.get('phone'),
+                'bio': record.get('bio'),
+                'skills': json.dumps(skills),
+                'experience_level': record.get('experience_level', 'junior'),
+                'hourly_rate': record.get('hourly_rate'),
+                'availability_status': record.get('availability_status', 'available'),
+                'timezone': record.get('timezone', 'UTC'),
+                'language_preferences': json.dumps(split_list(record.get('language_preferences')) or ['en']),
+                'created_at': now,
+                'updated_at': now,
+                'is_active': True,
+                'is_verified': False
+            })
+            skill_rows.extend({'user_id': user_id, 'skill': skill} for skill in normalize_skills(skills))
+            results[row_number] = {'row': row_number, 'status': 'created', 'id': user_id}
+        
+        db.session.execute(User.__table__.insert(), user_rows)
+        if skill_rows:
+            db.session.execute(UserSkill.__table__.insert(), skill_rows)
+        index_entities(User, [row['id'] for row in user_rows])
+    db.session.commit()
+    
+    return [results[row_number] for row_number, _, _ in batch]
+
+@user_bp.route('/users/bulk', methods=['POST'])
+def bulk_create_users():
+    """Stream-import users from NDJSON or CSV, reporting one result per row"""
+    batch_size = request.args.get('batch_size', current_app.config['USER_IMPORT_BATCH_SIZE'], type=int)
+    records = iter_records(request)
+    # A chunk is all-or-nothing; a failed one is reported and the next one carries on
+    results = import_results(records, batch_size, _import_user_batch)
+    return Response(stream_with_context(results), mimetype='application/x-ndjson')
+
 @user_bp.route('/users/<user_id>', methods=['GET'])
 def get_user(user_id):
     """Get a specific user by ID"""
-    user = User.query.get_or_404(user_id)
-    return jsonify(user.to_dict())
+    fields = requested_fields(User)
+    user = User.query.options(*load_fields(User, fields)).filter(User.id == user_id).first_or_404()
+    return jsonify(sparse(User.to_dict, fields)(user))
 
 @user_bp.route('/users/<user_id>', methods=['PUT'])
 def update_user(user_id):
@@ -114,7 +204,7 @@ def update_user(user_id):
     user.is_active = data.get('is_active', user.is_active)
     
     if 'skills' in data:
-        user.skills = json.dumps(data['skills'])
+        user.set_skills(data['skills'])
     
     if 'language_preferences' in data:
         user.language_preferences = json.dumps(data['language_preferences'])
@@ -139,8 +229,7 @@ def delete_user(user_id):
 def update_last_login(user_id):
     """Update user's last login timestamp"""
     user = User.query.get_or_404(user_id)
-    user.last_login = datetime.utcnow()
-    db.session.commit()
+    current_app.extensions['last_login_buffer'].record(user.id, datetime.utcnow())
     return jsonify({'message': 'Last login updated'})
 
 @user_bp.route('/users/<user_id>/verify', methods=['POST'])
@@ -158,11 +247,28 @@ def verify_user(user_id):
     else:
         return jsonify({'error': 'Invalid verification token'}), 400
 
+@user_bp.route('/workload', methods=['GET'])
+def get_workload():
+    """Get per-user weekly load from open tasks against capacity"""
+    start = request.args.get('start')
+    weeks = max(1, min(request.args.get('weeks', 12, type=int), current_app.config.get('WORKLOAD_MAX_WEEKS', 52)))
+    workload = team_workload(
+        start=datetime.fromisoformat(start) if start else None,
+        weeks=weeks,
+        project_id=request.args.get('project_id'),
+        weekly_hours=current_app.config.get('WORKLOAD_WEEKLY_HOURS', 40)
+    )
+    if request.args.get('overloaded', 'false').lower() == 'true':
+        workload['users'] = [entry for entry in workload['users'] if entry['overloaded_weeks']]
+    return jsonify(workload)
+
 @user_bp.route('/users/search', methods=['GET'])
 def search_users():
     """Advanced user search"""
     query = request.args.get('q', '')
     skills = request.args.getlist('skills')
+    skills_match = request.args.get('skills_match', 'all')
+    rank_by_skills = request.args.get('rank_by_skills', 'false').lower() == 'true'
     experience_levels = request.args.getlist('experience_levels')
     availability_statuses = request.args.getlist('availability_statuses')
     min_hourly_rate = request.args.get('min_hourly_rate', type=float)
@@ -170,17 +276,24 @@ def search_users():
     
     user_query = User.query.filter(User.is_active == True)
     
-    if query:
-        user_query = user_query.filter(
-            (User.username.contains(query)) |
-            (User.first_name.contains(query)) |
-            (User.last_name.contains(query)) |
-            (User.bio.contains(query))
-        )
-    
+    # Resolve skills through the user_skills index: every requested skill
+    # must match (skills_match=all) or at least one (skills_match=any)
+    skills = normalize_skills(skills)
+    skill_matches = None
     if skills:
-        for skill in skills:
-            user_query = user_query.filter(User.skills.contains(skill))
+        skill_matches = db.session.query(
+            UserSkill.user_id,
+            func.count(UserSkill.skill).label('matched')
+        ).filter(UserSkill.skill.in_(skills)).group_by(UserSkill.user_id)
+        if skills_match == 'all':
+            skill_matches = skill_matches.having(func.count(UserSkill.skill) == len(skills))
+        skill_matches = skill_matches.subquery()
+        user_query = user_query.join(skill_matches, skill_matches.c.user_id == User.id)
+        if rank_by_skills:
+            user_query = user_query.add_columns(skill_matches.c.matched).order_by(skill_matches.c.matched.desc())
+    
+    if query:
+        user_query = search_filter(user_query, User, query)
     
     if experience_levels:
         user_query = user_query.filter(User.experience_level.in_(experience_levels))
@@ -194,6 +307,14 @@ def search_users():
     if max_hourly_rate is not None:
         user_query = user_query.filter(User.hourly_rate <= max_hourly_rate)
     
+    if skill_matches is not None and rank_by_skills:
+        result = []
+        for user, matched in user_query.all():
+            user_data = user.to_public_dict()
+            user_data['skill_match_score'] = matched / len(skills)
+            result.append(user_data)
+        return jsonify(result)
+    
     users = user_query.all()
     return jsonify([user.to_public_dict() for user in users])
 
@@ -210,13 +331,20 @@ def login():
     ).first()
     
     if user and user.check_password(password) and user.is_active:
-        user.last_login = datetime.utcnow()
-        db.session.commit()
+        # Upgrade hashes made with older KDF parameters while we have the plaintext
+        if password_hasher.needs_rehash(user.password_hash):
+            user.set_password(password)
+            db.session.commit()
+        
+        last_login = datetime.utcnow()
+        current_app.extensions['last_login_buffer'].record(user.id, last_login)
+        user_data = user.to_dict()
+        user_data['last_login'] = last_login.isoformat()
         access_token = create_access_token(identity=user.id)
         return jsonify({
             'message': 'Login successful',
             'token': access_token,
-            'user': user.to_dict()
+            'user': user_data
         })
     else:
         return jsonify({'error': 'Invalid credentials or inactive account'}), 401
@@ -240,11 +368,11 @@ def register():
         last_name=data['last_name'],
         phone=data.get('phone'),
         bio=data.get('bio'),
-        skills=json.dumps(data.get('skills', [])),
         experience_level=data.get('experience_level', 'junior'),
         timezone=data.get('timezone', 'UTC'),
         language_preferences=json.dumps(data.get('language_preferences', ['en']))
     )
+    user.set_skills(data.get('skills', []))
     
     user.set_password(data['password'])
     
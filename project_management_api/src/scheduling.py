@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from src.errors import HttpException
+from src.models.user import db
+from src.models.project import Task, TaskDependency
+
+# Critical-path scheduling over a project's task dependency graph.
+#
+# The graph is read with two column-only queries and held as flat lists
+# indexed by task position: durations, deadlines, and successors in
+# compressed sparse row form (``offsets[i]:offsets[i + 1]`` slices
+# ``targets``). No ORM objects are built, and every pass is a single loop
+# over those arrays, so the cost is linear in tasks plus edges.
+#
+# Durations are a task's estimated_hours (0 when unset) and all times are
+# elapsed hours from the schedule start. A task's latest finish is bounded
+# by its due_date as well as by its successors, so slack can go negative
+# for tasks that cannot meet their due date. Criticality ignores due dates:
+# a task is critical when it lies on a longest chain of dependencies, i.e.
+# it has no float against the project's finish, and critical_path is one
+# such chain from a first task to a last one. Edges to tasks that no longer
+# exist in the project are ignored.
+
+EPSILON = 1e-9
+
+
+def _load_graph(project_id, start):
+    conn = db.session.connection()
+    rows = conn.execute(
+        select(Task.id, Task.estimated_hours, Task.due_date).where(Task.project_id == project_id)
+    ).all()
+    ids = [row[0] for row in rows]
+    position = {task_id: index for index, task_id in enumerate(ids)}
+    durations = [float(row[1]) if row[1] else 0.0 for row in rows]
+    deadlines = [(row[2] - start).total_seconds() / 3600 if row[2] else None for row in rows]
+
+    edges = conn.execute(
+        select(TaskDependency.depends_on_id, TaskDependency.task_id).where(TaskDependency.project_id == project_id)
+    ).all()
+    count = len(ids)
+    edges = [row for row in edges if row[0] in position and row[1] in position]
+    sources = [position[row[0]] for row in edges]
+    destinations = [position[row[1]] for row in edges]
+
+    # Successors in compressed sparse row form, bucketed by a counting sort
+    offsets = [0] * (count + 1)
+    indegree = [0] * count
+    for source in sources:
+        offsets[source + 1] += 1
+    for destination in destinations:
+        indegree[destination] += 1
+    for index in range(count):
+        offsets[index + 1] += offsets[index]
+    targets = [0] * len(edges)
+    cursor = offsets[:count]
+    for source, destination in zip(sources, destinations):
+        targets[cursor[source]] = destination
+        cursor[source] += 1
+    return ids, durations, deadlines, offsets, targets, indegree
+
+
+def _topological_order(count, offsets, targets, indegree):
+    indegree = indegree[:]
+    order = [index for index in range(count) if indegree[index] == 0]
+    head = 0
+    while head < len(order):
+        source = order[head]
+        head += 1
+        for edge in range(offsets[source], offsets[source + 1]):
+            target = targets[edge]
+            indegree[target] -= 1
+            if indegree[target] == 0:
+                order.append(target)
+    if len(order) < count:
+        raise HttpException(409, 'Task dependencies contain a cycle')
+    return order
+
+
+def _latest_finish(latest_finish, order, durations, offsets, targets):
+    for source in reversed(order):
+        for edge in range(offsets[source], offsets[source + 1]):
+            target = targets[edge]
+            successor_start = latest_finish[target] - durations[target]
+            if successor_start < latest_finish[source]:
+                latest_finish[source] = successor_start
+    return latest_finish
+
+
+def project_schedule(project_id, start=None):
+    """Earliest/latest start, slack and the critical path of a project's tasks"""
+    start = start or datetime.utcnow()
+    ids, durations, deadlines, offsets, targets, indegree = _load_graph(project_id, start)
+    count = len(ids)
+    order = _topological_order(count, offsets, targets, indegree)
+
+    # Forward pass: a task starts once all of its prerequisites finish
+    earliest_start = [0.0] * count
+    for source in order:
+        finish = earliest_start[source] + durations[source]
+        for edge in range(offsets[source], offsets[source + 1]):
+            target = targets[edge]
+            if finish > earliest_start[target]:
+                earliest_start[target] = finish
+    makespan = max((earliest_start[index] + durations[index] for index in range(count)), default=0.0)
+
+    # Backward passes: a task must finish before any successor has to start,
+    # and, for its slack, before its due date too
+    latest_finish = _latest_finish([makespan if deadline is None else min(makespan, deadline)
+                                    for deadline in deadlines], order, durations, offsets, targets)
+    float_finish = _latest_finish([makespan] * count, order, durations, offsets, targets)
+    critical = [float_finish[index] - durations[index] - earliest_start[index] <= EPSILON for index in range(count)]
+
+    # Follow one zero-float chain from a task that can start at once
+    critical_path = []
+    current = next((index for index in order if critical[index] and earliest_start[index] <= EPSILON), None)
+    while current is not None:
+        critical_path.append(ids[current])
+        finish = earliest_start[current] + durations[current]
+        current = next((targets[edge] for edge in range(offsets[current], offsets[current + 1])
+                        if critical[targets[edge]] and abs(earliest_start[targets[edge]] - finish) <= EPSILON),
+                       None)
+
+    tasks = []
+    for index in order:
+        slack = latest_finish[index] - durations[index] - earliest_start[index]
+        tasks.append({
+            'id': ids[index],
+            'duration_hours': durations[index],
+            'earliest_start': earliest_start[index],
+            'earliest_finish': earliest_start[index] + durations[index],
+            'latest_start': latest_finish[index] - durations[index],
+            'latest_finish': latest_finish[index],
+            'slack': slack,
+            'critical': critical[index]
+        })
+
+    return {
+        'project_id': project_id,
+        'start': start.isoformat(),
+        'finish': (start + timedelta(hours=makespan)).isoformat(),
+        'duration_hours': makespan,
+        'critical_path': critical_path,
+        'tasks': tasks
+    }
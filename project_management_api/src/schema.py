@@ -0,0 +1,12 @@
+from src.models.user import db
+
+
+def ensure_indexes():
+    """Create any declared index that is missing from an existing table.
+
+    db.create_all() only emits CREATE INDEX together with CREATE TABLE, so
+    indexes added to models later would never reach an existing database.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
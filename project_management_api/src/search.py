@@ -0,0 +1,241 @@
+import re
+import structlog
+from flask import current_app, has_app_context
+from sqlalchemy import column, event, func, inspect, literal_column, or_, table, text
+from sqlalchemy.exc import OperationalError
+from src.models.user import db
+
+logger = structlog.get_logger()
+
+# Full-text search over the columns each model lists in ``__searchable__``.
+#
+# On SQLite every searchable table gets an FTS5 index ``<table>_fts`` plus an
+# ordinary ``<table>_fts_ids`` table that maps entity ids onto FTS rowids. On
+# PostgreSQL it gets ``<table>_fts`` holding one tsvector per entity behind a
+# GIN index. Any other backend (or SQLite built without FTS5) falls back to
+# the old LIKE scans. Indexes are kept current from the session's flush
+# events, so only ORM writes are picked up; bulk Query.update() callers must
+# call rebuild_index() themselves.
+
+SQLITE = 'sqlite'
+POSTGRES = 'postgresql'
+LIKE = 'like'
+
+
+def searchable_models():
+    """Return every mapped model that declares ``__searchable__`` columns"""
+    return [mapper.class_ for mapper in db.Model.registry.mappers
+            if getattr(mapper.class_, '__searchable__', None)]
+
+
+def _document_sql(model):
+    """SQL expression concatenating a model's searchable columns"""
+    return " || ' ' || ".join(f"coalesce({name}, '')" for name in model.__searchable__)
+
+
+def _create_sqlite_index(conn, model):
+    name = model.__tablename__
+    columns = ', '.join(model.__searchable__)
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {name}_fts USING fts5({columns}, tokenize='unicode61')"
+    ))
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name}_fts_ids ("
+        f"doc_id INTEGER PRIMARY KEY AUTOINCREMENT, entity_id VARCHAR(36) NOT NULL UNIQUE)"
+    ))
+
+
+def _create_postgres_index(conn, model):
+    name = model.__tablename__
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name}_fts ("
+        f"entity_id VARCHAR(36) PRIMARY KEY, document TSVECTOR NOT NULL)"
+    ))
+    conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS ix_{name}_fts_document ON {name}_fts USING GIN (document)"
+    ))
+
+
+def _index_sqlite(conn, model, entity_ids):
+    name = model.__tablename__
+    columns = ', '.join(model.__searchable__)
+    source_columns = ', '.join(f'b.{column_name}' for column_name in model.__searchable__)
+    for entity_id in entity_ids:
+        params = {'id': entity_id}
+        conn.execute(text(f"INSERT OR IGNORE INTO {name}_fts_ids (entity_id) VALUES (:id)"), params)
+        conn.execute(text(
+            f"DELETE FROM {name}_fts WHERE rowid = "
+            f"(SELECT doc_id FROM {name}_fts_ids WHERE entity_id = :id)"
+        ), params)
+        conn.execute(text(
+            f"INSERT INTO {name}_fts (rowid, {columns}) "
+            f"SELECT m.doc_id, {source_columns} FROM {name} b "
+            f"JOIN {name}_fts_ids m ON m.entity_id = b.id WHERE b.id = :id"
+        ), params)
+
+
+def _unindex_sqlite(conn, model, entity_ids):
+    name = model.__tablename__
+    for entity_id in entity_ids:
+        params = {'id': entity_id}
+        conn.execute(text(
+            f"DELETE FROM {name}_fts WHERE rowid = "
+            f"(SELECT doc_id FROM {name}_fts_ids WHERE entity_id = :id)"
+        ), params)
+        conn.execute(text(f"DELETE FROM {name}_fts_ids WHERE entity_id = :id"), params)
+
+
+def _index_postgres(conn, model, entity_ids):
+    name = model.__tablename__
+    conn.execute(text(
+        f"INSERT INTO {name}_fts (entity_id, document) "
+        f"SELECT id, to_tsvector('simple', {_document_sql(model)}) FROM {name} WHERE id = ANY(:ids) "
+        f"ON CONFLICT (entity_id) DO UPDATE SET document = excluded.document"
+    ), {'ids': list(entity_ids)})
+
+
+def _unindex_postgres(conn, model, entity_ids):
+    name = model.__tablename__
+    conn.execute(text(f"DELETE FROM {name}_fts WHERE entity_id = ANY(:ids)"), {'ids': list(entity_ids)})
+
+
+def index_entities(model, entity_ids, conn=None):
+    """Index rows written outside the ORM unit of work, e.g. by bulk inserts"""
+    backend = current_app.extensions.get('search', LIKE)
+    conn = conn if conn is not None else db.session.connection()
+    if entity_ids and backend == SQLITE:
+        _index_sqlite(conn, model, entity_ids)
+    elif entity_ids and backend == POSTGRES:
+        _index_postgres(conn, model, entity_ids)
+
+
+def unindex_entities(model, entity_ids, conn=None):
+    """Drop rows removed outside the ORM unit of work, e.g. by bulk deletes"""
+    backend = current_app.extensions.get('search', LIKE)
+    conn = conn if conn is not None else db.session.connection()
+    if entity_ids and backend == SQLITE:
+        _unindex_sqlite(conn, model, entity_ids)
+    elif entity_ids and backend == POSTGRES:
+        _unindex_postgres(conn, model, entity_ids)
+
+
+def rebuild_index(model, conn=None):
+    """Drop and repopulate the search index for one model from its base table"""
+    backend = current_app.extensions.get('search', LIKE)
+    conn = conn if conn is not None else db.session.connection()
+    name = model.__tablename__
+    if backend == SQLITE:
+        columns = ', '.join(model.__searchable__)
+        source_columns = ', '.join(f'b.{column_name}' for column_name in model.__searchable__)
+        conn.execute(text(f"DELETE FROM {name}_fts"))
+        conn.execute(text(f"DELETE FROM {name}_fts_ids"))
+        conn.execute(text(f"INSERT INTO {name}_fts_ids (entity_id) SELECT id FROM {name}"))
+        conn.execute(text(
+            f"INSERT INTO {name}_fts (rowid, {columns}) "
+            f"SELECT m.doc_id, {source_columns} FROM {name} b JOIN {name}_fts_ids m ON m.entity_id = b.id"
+        ))
+    elif backend == POSTGRES:
+        conn.execute(text(f"DELETE FROM {name}_fts"))
+        conn.execute(text(
+            f"INSERT INTO {name}_fts (entity_id, document) "
+            f"SELECT id, to_tsvector('simple', {_document_sql(model)}) FROM {name}"
+        ))
+
+
+def init_search(app):
+    """Create the per-entity search indexes and backfill any that are empty"""
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        backend = dialect if dialect in (SQLITE, POSTGRES) else LIKE
+        try:
+            with db.engine.begin() as conn:
+                for model in searchable_models():
+                    if backend == SQLITE:
+                        _create_sqlite_index(conn, model)
+                    elif backend == POSTGRES:
+                        _create_postgres_index(conn, model)
+        except OperationalError as e:
+            # SQLite compiled without FTS5
+            logger.warning("search_index_unavailable", error=str(e))
+            backend = LIKE
+        app.extensions['search'] = backend
+
+        if backend == LIKE:
+            return
+        with db.engine.begin() as conn:
+            for model in searchable_models():
+                name = model.__tablename__
+                index_table = f'{name}_fts_ids' if backend == SQLITE else f'{name}_fts'
+                indexed = conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {index_table})")).scalar()
+                populated = conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar()
+                if populated and not indexed:
+                    rebuild_index(model, conn)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _update_search_indexes(session, flush_context):
+    if not has_app_context():
+        return
+    backend = current_app.extensions.get('search', LIKE)
+    if backend == LIKE:
+        return
+
+    changed = {}
+    removed = {}
+    for obj in session.new:
+        if getattr(obj, '__searchable__', None):
+            changed.setdefault(type(obj), set()).add(obj.id)
+    for obj in session.dirty:
+        if getattr(obj, '__searchable__', None):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in obj.__searchable__):
+                changed.setdefault(type(obj), set()).add(obj.id)
+    for obj in session.deleted:
+        if getattr(obj, '__searchable__', None):
+            removed.setdefault(type(obj), set()).add(obj.id)
+
+    if not changed and not removed:
+        return
+
+    conn = session.connection()
+    index = _index_sqlite if backend == SQLITE else _index_postgres
+    unindex = _unindex_sqlite if backend == SQLITE else _unindex_postgres
+    for model, entity_ids in changed.items():
+        index(conn, model, entity_ids)
+    for model, entity_ids in removed.items():
+        unindex(conn, model, entity_ids)
+
+
+def _terms(search):
+    return re.findall(r'\w+', search.lower())
+
+
+def search_filter(query, model, search):
+    """Restrict a query to rows matching ``search`` and order them by relevance.
+
+    Every word in ``search`` must match, and each is treated as a prefix so
+    partial input from search boxes still finds results.
+    """
+    backend = current_app.extensions.get('search', LIKE)
+    terms = _terms(search)
+    name = model.__tablename__
+
+    if backend == SQLITE and terms:
+        match = ' '.join(f'"{term}"*' for term in terms)
+        ids = table(f'{name}_fts_ids', column('doc_id'), column('entity_id'))
+        fts = table(f'{name}_fts', column('rowid'))
+        return (query
+                .join(ids, ids.c.entity_id == model.id)
+                .join(fts, fts.c.rowid == ids.c.doc_id)
+                .filter(literal_column(f'{name}_fts').op('MATCH')(match))
+                .order_by(func.bm25(literal_column(f'{name}_fts'))))
+
+    if backend == POSTGRES and terms:
+        ts_query = func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+        fts = table(f'{name}_fts', column('entity_id'), column('document'))
+        return (query
+                .join(fts, fts.c.entity_id == model.id)
+                .filter(fts.c.document.op('@@')(ts_query))
+                .order_by(func.ts_rank(fts.c.document, ts_query).desc()))
+
+    return query.filter(or_(*[getattr(model, column_name).contains(search) for column_name in model.__searchable__]))
@@ -0,0 +1,108 @@
+import codecs
+import csv
+import json
+from itertools import islice
+import structlog
+from src.errors import HttpException
+from src.models.user import db
+
+logger = structlog.get_logger()
+
+CSV_TYPES = ('text/csv', 'application/csv')
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/json-lines')
+
+
+def _lines(stream, chunk_size=64 * 1024):
+    """Decode a binary request stream into text lines without reading it all"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += decoder.decode(chunk, final=not chunk)
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            yield line + '\n'
+        if not chunk:
+            break
+    if buffer:
+        yield buffer
+
+
+def _csv_records(stream):
+    reader = csv.DictReader(_lines(stream))
+    for row_number, row in enumerate(reader, start=1):
+        if None in row:
+            yield row_number, None, 'Row has more fields than the header'
+            continue
+        yield row_number, {key: value for key, value in row.items() if value != ''}, None
+
+
+def _ndjson_records(stream):
+    row_number = 0
+    for line in _lines(stream):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield row_number, None, 'Invalid JSON'
+            continue
+        if not isinstance(record, dict):
+            yield row_number, None, 'Expected a JSON object'
+            continue
+        yield row_number, record, None
+
+
+def iter_records(request):
+    """Return an iterator of (row_number, record, error) over an NDJSON or CSV upload.
+
+    The body is read incrementally from request.stream, so memory use does not
+    grow with the size of the upload. Row numbers count data rows from 1.
+    """
+    if request.mimetype in CSV_TYPES:
+        return _csv_records(request.stream)
+    if request.mimetype in NDJSON_TYPES:
+        return _ndjson_records(request.stream)
+    raise HttpException(415, 'Upload must be text/csv or application/x-ndjson')
+
+
+def batched(iterable, size):
+    """Split an iterable into lists of at most ``size`` items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def import_results(records, batch_size, import_batch):
+    """Run ``import_batch`` over chunks of ``records`` and yield NDJSON result lines.
+
+    The 200 response has already started when a chunk runs, so a chunk that
+    fails for any reason is rolled back and reported as one error result
+    per row instead of cutting the stream short.
+    """
+    for batch in batched(records, max(batch_size, 1)):
+        try:
+            results = import_batch(batch)
+        except Exception as e:
+            db.session.rollback()
+            if isinstance(e, HttpException):
+                error = e.message
+            else:
+                logger.exception("import_batch_failed", exc_info=e)
+                error = 'Batch insert failed'
+            results = [{'row': row_number, 'status': 'error', 'error': error} for row_number, _, _ in batch]
+        for result in results:
+            yield json.dumps(result) + '\n'
+
+
+def split_list(value, separator=';'):
+    """Read a list field that may arrive as a JSON array or a CSV cell"""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [item.strip() for item in str(value).split(separator) if item.strip()]
@@ -0,0 +1,99 @@
+from sqlalchemy import case, event, func, inspect, select
+from src.history import committed_value, track_previous_values
+from src.models.user import db
+from src.models.project import ProjectTaskStats, Task
+
+# project_task_stats holds one row of task counters per project that has
+# ever had a task. ORM inserts, status/project changes and deletes adjust
+# the counters from the session's flush events, inside the same
+# transaction as the task write. A project with no stats row has no tasks;
+# if a delta arrives for a project whose row is missing, the row is
+# rebuilt from tasks with a GROUP BY instead. Bulk Query.update()/delete()
+# callers bypass the events and must call apply_task_deltas() or
+# rebuild_task_stats() themselves.
+
+
+def _counter_columns(status):
+    columns = ['total_tasks']
+    if status in ProjectTaskStats.STATUS_COLUMNS:
+        columns.append(ProjectTaskStats.STATUS_COLUMNS[status])
+    return columns
+
+
+def add_task_delta(deltas, project_id, status, amount):
+    """Accumulate ``amount`` tasks of ``status`` for a project into ``deltas``"""
+    if project_id is None:
+        return
+    counters = deltas.setdefault(project_id, {})
+    for column in _counter_columns(status):
+        counters[column] = counters.get(column, 0) + amount
+
+
+def apply_task_deltas(conn, deltas):
+    """Apply ``{project_id: {column: delta}}`` to project_task_stats"""
+    stats = ProjectTaskStats.__table__
+    for project_id, counters in deltas.items():
+        counters = {column: amount for column, amount in counters.items() if amount}
+        if not counters:
+            continue
+        result = conn.execute(
+            stats.update()
+            .where(stats.c.project_id == project_id)
+            .values({column: stats.c[column] + amount for column, amount in counters.items()})
+        )
+        if result.rowcount == 0:
+            # No row yet: the GROUP BY already sees this transaction's writes
+            rebuild_task_stats(conn, project_id)
+
+
+def rebuild_task_stats(conn=None, project_id=None):
+    """Recount project_task_stats from tasks, for one project or all of them"""
+    conn = conn or db.session.connection()
+    stats = ProjectTaskStats.__table__
+    tasks = Task.__table__
+    columns = [tasks.c.project_id, func.count().label('total_tasks')]
+    for status, column in ProjectTaskStats.STATUS_COLUMNS.items():
+        columns.append(func.coalesce(func.sum(case((tasks.c.status == status, 1), else_=0)), 0).label(column))
+    counts = select(*columns).group_by(tasks.c.project_id)
+
+    delete = stats.delete()
+    if project_id is not None:
+        counts = counts.where(tasks.c.project_id == project_id)
+        delete = delete.where(stats.c.project_id == project_id)
+    conn.execute(delete)
+    conn.execute(stats.insert().from_select([column.name for column in columns], counts))
+
+
+def backfill_task_stats():
+    """Build project_task_stats on first start against an existing database"""
+    if db.session.query(ProjectTaskStats.project_id).first() is None and \
+            db.session.query(Task.id).first() is not None:
+        rebuild_task_stats()
+        db.session.commit()
+
+
+# The counters need a task's old status and project to know which bucket it is leaving
+track_previous_values(Task.status, Task.project_id)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _update_task_stats(session, flush_context):
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Task):
+            add_task_delta(deltas, obj.project_id, obj.status, 1)
+    for obj in session.dirty:
+        if isinstance(obj, Task):
+            state = inspect(obj)
+            if not (state.attrs.status.history.has_changes() or
+                    state.attrs.project_id.history.has_changes()):
+                continue
+            add_task_delta(deltas, committed_value(state, 'project_id'), committed_value(state, 'status'), -1)
+            add_task_delta(deltas, obj.project_id, obj.status, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Task):
+            state = inspect(obj)
+            add_task_delta(deltas, committed_value(state, 'project_id'), committed_value(state, 'status'), -1)
+
+    if deltas:
+        apply_task_deltas(session.connection(), deltas)
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, or_, select
+from src.models.user import db, User
+from src.models.project import Task, ProjectTeam
+
+# Per-user, per-week load from open tasks against weekly capacity.
+#
+# A task's load is its remaining hours (estimated minus actual, never
+# negative) in the week its due_date falls in, counted from the start of
+# the window; overdue tasks land in the first week and undated tasks are
+# reported separately as unscheduled. Bucketing and summing happen in the
+# database (one GROUP BY over the tasks, joined to users and their team
+# contributions), so only the non-empty (user, week) cells reach Python,
+# however many tasks there are.
+#
+# Weekly capacity is WORKLOAD_WEEKLY_HOURS scaled by the user's
+# availability_status and by their summed contribution_percentage across
+# active project teams (a membership without one counts as 100%, and the
+# total is capped at 100%). Users on no team get full capacity.
+
+AVAILABILITY_FACTORS = {'available': 1.0, 'busy': 0.5, 'unavailable': 0.0}
+
+
+def week_start(day=None):
+    """Midnight on the Monday of ``day``'s week (today by default)"""
+    day = day or datetime.utcnow()
+    return datetime(day.year, day.month, day.day) - timedelta(days=day.weekday())
+
+
+def _load_rows(start, weeks, project_id):
+    estimated = func.coalesce(Task.estimated_hours, 0)
+    actual = func.coalesce(Task.actual_hours, 0)
+    remaining = case((estimated > actual, estimated - actual), else_=0)
+    # First week whose end the due date falls before; overdue tasks match week 0
+    week = case(*[(Task.due_date < start + timedelta(weeks=index + 1), index) for index in range(weeks)],
+                else_=None)
+
+    tasks = select(Task.assigned_to.label('user_id'), week.label('week'), remaining.label('hours')).where(
+        Task.assigned_to.isnot(None),
+        Task.status != 'completed',
+        or_(Task.due_date.is_(None), Task.due_date < start + timedelta(weeks=weeks))
+    )
+    team = select(
+        ProjectTeam.user_id,
+        func.sum(func.coalesce(ProjectTeam.contribution_percentage, 100)).label('contribution')
+    ).where(ProjectTeam.is_active == True)
+    if project_id:
+        tasks = tasks.where(Task.project_id == project_id)
+        team = team.where(ProjectTeam.project_id == project_id)
+    tasks = tasks.subquery()
+    team = team.group_by(ProjectTeam.user_id).subquery()
+
+    load = select(tasks.c.user_id, tasks.c.week, func.sum(tasks.c.hours).label('hours')).group_by(
+        tasks.c.user_id, tasks.c.week
+    ).subquery()
+    return db.session.execute(
+        select(load.c.user_id, User.availability_status, team.c.contribution, load.c.week, load.c.hours)
+        .join(User, User.id == load.c.user_id)
+        .outerjoin(team, team.c.user_id == load.c.user_id)
+        .order_by(load.c.user_id)
+    ).all()
+
+
+def _weekly_capacity(hours, availability_status, contribution):
+    share = min(contribution if contribution is not None else 100, 100) / 100
+    return hours * AVAILABILITY_FACTORS.get(availability_status, 1.0) * share
+
+
+def team_workload(start=None, weeks=12, project_id=None, weekly_hours=40):
+    """Per-user weekly load, capacity and overloaded weeks, most overloaded first"""
+    start = week_start(start)
+    users = {}
+    for user_id, availability_status, contribution, week, hours in _load_rows(start, weeks, project_id):
+        entry = users.get(user_id)
+        if entry is None:
+            entry = users[user_id] = {
+                'user_id': user_id,
+                'availability_status': availability_status,
+                'capacity_hours': _weekly_capacity(weekly_hours, availability_status, contribution),
+                'load_hours': [0] * weeks,
+                'unscheduled_hours': 0
+            }
+        if week is None:
+            entry['unscheduled_hours'] = int(hours)
+        else:
+            entry['load_hours'][week] = int(hours)
+
+    for entry in users.values():
+        capacity = entry['capacity_hours']
+        entry['utilization'] = [round(load / capacity, 2) if capacity else None for load in entry['load_hours']]
+        entry['overloaded_weeks'] = [week for week, load in enumerate(entry['load_hours']) if load > capacity]
+        entry['peak_excess_hours'] = max(entry['load_hours']) - capacity if weeks else 0
+
+    return {
+        'start': start.isoformat(),
+        'weeks': [(start + timedelta(weeks=index)).date().isoformat() for index in range(weeks)],
+        'weekly_hours': weekly_hours,
+        'users': sorted(users.values(), key=lambda entry: (-entry['peak_excess_hours'], entry['user_id']))
+    }
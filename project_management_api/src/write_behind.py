@@ -0,0 +1,117 @@
+import atexit
+import os
+import threading
+import weakref
+import structlog
+from sqlalchemy import bindparam, or_, update
+from src.models.user import User, db
+
+logger = structlog.get_logger()
+
+# Every live buffer in the process; one exit hook flushes them all, and the
+# weak references let buffers of discarded apps be collected
+_buffers = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all():
+    for buffer in list(_buffers):
+        buffer.close()
+
+
+class LastLoginBuffer:
+    """Collects last-login timestamps in memory and writes them in batches.
+
+    Logins only call record(); the buffer issues a single executemany UPDATE
+    once LAST_LOGIN_FLUSH_SIZE users are pending, every
+    LAST_LOGIN_FLUSH_INTERVAL seconds from a background thread, and when the
+    process exits. An interval of 0 disables the timer. Timestamps only ever
+    move forward, so a late flush cannot overwrite a newer login. close()
+    stops the timer and writes what is left.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.max_size = app.config.get('LAST_LOGIN_FLUSH_SIZE', 500)
+        self.interval = app.config.get('LAST_LOGIN_FLUSH_INTERVAL', 5)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pid = None
+        self._stop = threading.Event()
+        _buffers.add(self)
+
+    def record(self, user_id, timestamp):
+        """Remember that a user logged in; flushes when the buffer is full"""
+        self._ensure_timer()
+        with self._lock:
+            current = self._pending.get(user_id)
+            if current is None or timestamp > current:
+                self._pending[user_id] = timestamp
+            full = len(self._pending) >= self.max_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write every pending timestamp in one batched UPDATE"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        users = User.__table__
+        statement = update(users).where(
+            users.c.id == bindparam('b_id'),
+            or_(users.c.last_login.is_(None), users.c.last_login < bindparam('b_last_login'))
+        ).values(last_login=bindparam('b_last_login'))
+        rows = [{'b_id': user_id, 'b_last_login': ts} for user_id, ts in pending.items()]
+        with self.app.app_context():
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(statement, rows)
+            except Exception as e:
+                # Put the batch back so the next flush retries it
+                with self._lock:
+                    for user_id, ts in pending.items():
+                        if user_id not in self._pending or self._pending[user_id] < ts:
+                            self._pending[user_id] = ts
+                logger.exception("last_login_flush_failed", exc_info=e)
+                return 0
+        return len(rows)
+
+    def _ensure_timer(self):
+        # Started lazily, and again after a fork, since threads do not survive fork()
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._pending = {}
+        if self._stop.is_set():
+            return
+        # The thread only holds a weak reference, so it cannot keep a
+        # discarded app alive; it exits once the buffer is closed or gone
+        thread = threading.Thread(
+            target=_run, args=(weakref.ref(self), self._stop, self.interval),
+            name='last-login-flusher', daemon=True
+        )
+        thread.start()
+
+    def close(self):
+        """Stop the background timer and flush whatever is still pending"""
+        self._stop.set()
+        _buffers.discard(self)
+        return self.flush()
+
+
+def _run(ref, stop, interval):
+    while not stop.wait(interval):
+        buffer = ref()
+        if buffer is None:
+            return
+        buffer.flush()
+        del buffer
+
+
+def init_last_login_buffer(app):
+    app.extensions['last_login_buffer'] = LastLoginBuffer(app)
@@ -1,11 +1,15 @@
+import json
 import pytest
 import sys
 import os
+from contextlib import contextmanager
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from sqlalchemy import event
 from src.main import create_app
 from src.config import Config
+from src.models.user import db
 
 class TestConfig(Config):
     TESTING = True
@@ -15,7 +19,80 @@ class TestConfig(Config):
 def app():
     app = create_app(TestConfig)
     yield app
+    app.extensions['last_login_buffer'].close()
 
 @pytest.fixture
 def client(app):
     return app.test_client()
+
+@pytest.fixture
+def post(client):
+    """POST a JSON payload: ``post('/api/projects', {"name": "Alpha"})``"""
+    def post(url, payload):
+        return client.post(url, data=json.dumps(payload), content_type='application/json')
+    return post
+
+@pytest.fixture
+def put(client):
+    """PUT a JSON payload: ``put(f'/api/tasks/{task_id}', {"status": "done"})``"""
+    def put(url, payload):
+        return client.put(url, data=json.dumps(payload), content_type='application/json')
+    return put
+
+@pytest.fixture
+def create_project(post):
+    """Create a project through the API and return its id"""
+    def create_project(name, **fields):
+        return post('/api/projects', {"name": name, **fields}).json['id']
+    return create_project
+
+@pytest.fixture
+def create_task(post):
+    """Create a task through the API; returns the response"""
+    def create_task(project_id, title, **fields):
+        return post('/api/tasks', {"title": title, "project_id": project_id, **fields})
+    return create_task
+
+@pytest.fixture
+def create_role(post):
+    """Create a role through the API and return its JSON"""
+    def create_role(name, parent_id=None, **fields):
+        payload = {"name": name, **fields}
+        if parent_id:
+            payload["parent_role_id"] = parent_id
+        return post('/api/roles', payload).json
+    return create_role
+
+@pytest.fixture
+def create_user(post):
+    """Create a user through the API; ``fields`` override the defaults"""
+    def create_user(username, **fields):
+        payload = {
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "password",
+            "first_name": "Test",
+            "last_name": "User"
+        }
+        payload.update(fields)
+        return post('/api/users', payload)
+    return create_user
+
+@pytest.fixture
+def capture_sql(app):
+    """Context manager collecting the SQL statements run inside it:
+
+        with capture_sql() as statements:
+            client.get(url)
+    """
+    @contextmanager
+    def capture():
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                yield statements
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+    return capture
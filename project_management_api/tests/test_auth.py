@@ -1,30 +1,105 @@
-import json
-
-def test_register(client):
-    response = client.post('/api/auth/register', data=json.dumps({
+def test_register(post):
+    response = post('/api/auth/register', {
         "username": "testuser",
         "email": "testuser@example.com",
         "password": "password",
         "first_name": "Test",
         "last_name": "User"
-    }), content_type='application/json')
+    })
     assert response.status_code == 201
     assert 'user' in response.json
 
-def test_login(client):
+def test_login(post):
     # First, register a user
-    client.post('/api/auth/register', data=json.dumps({
+    post('/api/auth/register', {
         "username": "testuser",
         "email": "testuser@example.com",
         "password": "password",
         "first_name": "Test",
         "last_name": "User"
-    }), content_type='application/json')
+    })
 
     # Now, log in
-    response = client.post('/api/auth/login', data=json.dumps({
+    response = post('/api/auth/login', {
         "username_or_email": "testuser",
         "password": "password"
-    }), content_type='application/json')
+    })
     assert response.status_code == 200
     assert 'token' in response.json
+
+def test_login_rehashes_outdated_password_hash(app, post):
+    from src.models.user import User
+
+    post('/api/auth/register', {
+        "username": "testuser",
+        "email": "testuser@example.com",
+        "password": "password",
+        "first_name": "Test",
+        "last_name": "User"
+    })
+
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+    response = post('/api/auth/login', {
+        "username_or_email": "testuser",
+        "password": "password"
+    })
+    assert response.status_code == 200
+
+    with app.app_context():
+        user = User.query.filter_by(username='testuser').first()
+        assert user.password_hash.startswith('pbkdf2:sha256:1000$')
+        assert user.check_password('password')
+
+def test_last_login_is_written_in_batches(app, client, post):
+    from src.models.user import User
+
+    response = post('/api/auth/register', {
+        "username": "testuser",
+        "email": "testuser@example.com",
+        "password": "password",
+        "first_name": "Test",
+        "last_name": "User"
+    })
+    user_id = response.json['user']['id']
+
+    response = client.post(f'/api/users/{user_id}/login')
+    assert response.status_code == 200
+
+    buffer = app.extensions['last_login_buffer']
+    with app.app_context():
+        assert User.query.get(user_id).last_login is None
+    assert buffer.flush() == 1
+    with app.app_context():
+        assert User.query.get(user_id).last_login is not None
+
+def test_closed_or_discarded_buffers_stop_their_flush_timer(app):
+    import gc
+    import threading
+    import weakref
+    from datetime import datetime
+    from src import write_behind
+    from src.write_behind import LastLoginBuffer
+
+    def start_flusher():
+        existing = set(threading.enumerate())
+        buffer = LastLoginBuffer(app)
+        buffer.record(1, datetime.utcnow())
+        [thread] = [t for t in threading.enumerate() if t not in existing and t.name == 'last-login-flusher']
+        return buffer, thread
+
+    app.config['LAST_LOGIN_FLUSH_INTERVAL'] = 0.01
+    buffer, thread = start_flusher()
+    assert buffer in write_behind._buffers
+    buffer.close()
+    assert buffer not in write_behind._buffers
+    thread.join(timeout=1)
+    assert not thread.is_alive()
+
+    # A buffer nobody closes is not kept alive by its timer or the exit hook
+    buffer, thread = start_flusher()
+    ref = weakref.ref(buffer)
+    del buffer
+    gc.collect()
+    assert ref() is None
+    thread.join(timeout=1)
+    assert not thread.is_alive()
@@ -0,0 +1,41 @@
+def create_contract(post, title):
+    return post('/api/contracts', {
+        "title": title, "contract_number": f"CNT-{title}", "terms_and_conditions": "x" * 5000
+    }).json['id']
+
+def test_list_defers_large_text_by_default(client, post, capture_sql):
+    create_contract(post, "Alpha")
+    with capture_sql() as statements:
+        response = client.get('/api/contracts')
+    contract = response.json['contracts'][0]
+    assert contract['title'] == "Alpha"
+    assert 'terms_and_conditions' not in contract
+    assert not any('terms_and_conditions' in statement for statement in statements)
+
+def test_fields_narrow_list_and_detail(client, post, capture_sql):
+    contract_id = create_contract(post, "Beta")
+
+    with capture_sql() as statements:
+        response = client.get('/api/contracts?fields=title,status&cursor=')
+    assert response.json['contracts'] == [{'id': contract_id, 'title': "Beta", 'status': 'draft'}]
+    assert not any('description' in statement for statement in statements)
+
+    detail = client.get(f'/api/contracts/{contract_id}?fields=terms_and_conditions').json
+    assert detail['terms_and_conditions'] == "x" * 5000
+    assert 'title' not in detail
+    assert detail['costs'] == []
+
+    assert len(client.get(f'/api/contracts/{contract_id}').json['terms_and_conditions']) == 5000
+    assert client.get('/api/contracts?fields=title,secret').status_code == 400
+
+def test_fields_on_costs_and_budgets(client, post):
+    budget_id = post('/api/budgets', {"name": "Ops", "total_budget": 100}).json['id']
+    cost_id = post('/api/costs', {"description": "Hosting", "amount": 12.5}).json['id']
+
+    assert client.get('/api/costs?fields=description').json['costs'] == [{'id': cost_id, 'description': "Hosting"}]
+    assert client.get(f'/api/costs/{cost_id}?fields=description').json == {'id': cost_id, 'description': "Hosting"}
+    assert client.get(f'/api/costs/{cost_id}?fields=amount').json == {'id': cost_id, 'amount': 12.5}
+    budgets = client.get('/api/budgets?fields=name').json
+    assert budgets == [{'id': budget_id, 'name': "Ops"}]
+    budget = client.get(f'/api/budgets/{budget_id}?fields=name').json
+    assert (budget['name'], 'total_budget' in budget) == ("Ops", False)
@@ -0,0 +1,325 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+from src.models.user import db
+from src.models.project import Project
+from src.models.contract import Contract, Cost, Budget
+
+def seed_ledger(app):
+    with app.app_context():
+        alpha, beta = Project(name="Alpha"), Project(name="Beta")
+        db.session.add_all([alpha, beta])
+        db.session.flush()
+        db.session.add_all([
+            Contract(title="A", contract_number="C-A", project_id=alpha.id, total_value=Decimal('1000.10')),
+            Contract(title="B", contract_number="C-B", project_id=beta.id, total_value=Decimal('500.00')),
+            Budget(name="A budget", project_id=alpha.id, total_budget=Decimal('200.00'), approval_status='approved'),
+            Budget(name="B draft", project_id=beta.id, total_budget=Decimal('999.00')),
+            Cost(project_id=alpha.id, amount=Decimal('0.10'), status='approved', category='labor', vendor='Acme',
+                 date_incurred=datetime(2024, 1, 5)),
+            Cost(project_id=alpha.id, amount=Decimal('0.20'), status='approved', category='labor', vendor='Acme',
+                 date_incurred=datetime(2024, 1, 20)),
+            Cost(project_id=alpha.id, amount=Decimal('49.70'), status='pending', category='software',
+                 date_incurred=datetime(2024, 2, 1)),
+            Cost(project_id=beta.id, amount=Decimal('10.00'), status='approved', category='labor', vendor='Acme',
+                 date_incurred=datetime(2024, 2, 2)),
+        ])
+        db.session.commit()
+        return alpha.id, beta.id
+
+def test_financial_summary_totals_are_exact(app, client):
+    alpha_id, _ = seed_ledger(app)
+    summary = client.get('/api/financial-summary').json
+    assert summary['total_contract_value'] == '1500.10'
+    assert summary['total_approved_costs'] == '10.30'
+    assert summary['total_pending_costs'] == '49.70'
+    assert summary['total_budget_allocated'] == '200.00'
+    assert summary['budget_utilization'] == '5.15'
+    assert (summary['contract_count'], summary['cost_count'], summary['budget_count']) == (2, 4, 2)
+
+    scoped = client.get(f'/api/financial-summary?project_id={alpha_id}&date_to=2024-01-31').json
+    assert (scoped['total_approved_costs'], scoped['total_pending_costs'], scoped['cost_count']) == ('0.30', '0.00', 2)
+
+def test_financial_summary_breakdowns(app, client):
+    alpha_id, beta_id = seed_ledger(app)
+    by_project = {row['project_id']: row for row in
+                  client.get('/api/financial-summary?group_by=project').json['breakdown']}
+    assert by_project[alpha_id]['total_approved_costs'] == '0.30'
+    assert by_project[alpha_id]['budget_utilization'] == '0.15'
+    assert (by_project[beta_id]['total_contract_value'], by_project[beta_id]['budget_utilization']) == ('500.00', '0.00')
+
+    by_month = client.get('/api/financial-summary?group_by=month').json['breakdown']
+    assert [(row['month'], row['total_approved_costs'], row['cost_count']) for row in by_month] == [
+        ('2024-01', '0.30', 2), ('2024-02', '10.00', 2)
+    ]
+    by_vendor = client.get('/api/financial-summary?group_by=vendor').json['breakdown']
+    assert [(row['vendor'], row['cost_count']) for row in by_vendor] == [('Acme', 3), (None, 1)]
+    assert client.get('/api/financial-summary?group_by=owner').status_code == 400
+
+def rollup_buckets():
+    from src.models.contract import CostDailyRollup
+    buckets = {}
+    for row in CostDailyRollup.query.all():
+        key = (row.project_id, row.contract_id, row.category, row.status, row.day)
+        amount, count = buckets.get(key, (Decimal('0'), 0))
+        buckets[key] = (amount + row.amount, count + row.cost_count)
+    return {key: value for key, value in buckets.items() if value != (0, 0)}
+
+def test_cost_rollups_follow_cost_writes(app, client, post, put, capture_sql):
+    from src.cost_rollup import rebuild_cost_rollups
+
+    alpha_id, _ = seed_ledger(app)
+    cost_id = post('/api/costs', {
+        "project_id": alpha_id, "description": "Licence", "amount": 5.25, "category": "software",
+        "date_incurred": "2024-03-10T12:00:00"
+    }).json['id']
+    put(f'/api/costs/{cost_id}', {"amount": 7.75, "date_incurred": "2024-03-11T09:00:00"})
+    post(f'/api/costs/{cost_id}/approve', {})
+    with app.app_context():
+        first_cost = Cost.query.filter_by(amount=Decimal('49.70')).one().id
+    client.delete(f'/api/costs/{first_cost}')
+
+    with app.app_context():
+        incremental = rollup_buckets()
+        rebuild_cost_rollups()
+        db.session.commit()
+        assert rollup_buckets() == incremental
+    with capture_sql() as statements:
+        summary = client.get('/api/financial-summary').json
+    assert (summary['total_approved_costs'], summary['total_pending_costs'], summary['cost_count']) == \
+        ('18.05', '0.00', 4)
+    assert len(statements) == 1 and 'cost_daily_rollup' in statements[0] and 'FROM costs' not in statements[0]
+
+def test_compacted_rollups_give_the_same_answers(app, client):
+    from datetime import date
+    from src.cost_rollup import compact_cost_rollups
+    from src.models.contract import CostDailyRollup, CostMonthlyRollup
+
+    seed_ledger(app)
+    queries = ['/api/financial-summary', '/api/financial-summary?date_from=2024-01-10',
+               '/api/financial-summary?date_from=2024-02-01&group_by=category',
+               '/api/financial-summary?group_by=month']
+    before = [client.get(url).json for url in queries]
+    with app.app_context():
+        assert compact_cost_rollups(before=date(2024, 2, 1)) == 2
+        assert CostDailyRollup.query.filter(CostDailyRollup.day < date(2024, 2, 1)).count() == 0
+        assert [(row.month, row.amount, row.cost_count) for row in CostMonthlyRollup.query.all()] == [
+            (date(2024, 1, 1), Decimal('0.30'), 2)
+        ]
+        jan_cost = Cost.query.filter_by(amount=Decimal('0.10')).one()
+        jan_cost.status = 'rejected'
+        db.session.commit()
+        compact_cost_rollups(before=date(2024, 2, 1))
+        assert [(row.status, row.amount) for row in CostMonthlyRollup.query.order_by(CostMonthlyRollup.status)] == [
+            ('approved', Decimal('0.20')), ('rejected', Decimal('0.10'))
+        ]
+        jan_cost.status = 'approved'
+        db.session.commit()
+
+    assert [client.get(url).json for url in queries] == before
+    assert before[1]['total_approved_costs'] == '10.20'
+
+def test_date_to_includes_the_whole_day_on_both_paths(app, client):
+    with app.app_context():
+        db.session.add(Cost(description="Noon", amount=Decimal('5'), status='approved',
+                            date_incurred=datetime(2024, 3, 10, 12)))
+        db.session.commit()
+    url = '/api/financial-summary?date_from=2024-03-10&date_to=2024-03-10'
+    answers = []
+    # Long retention reads the rollups; none sends a mid-month bound to raw costs
+    for retention in (100000, 0):
+        app.config['COST_ROLLUP_DAILY_RETENTION_DAYS'] = retention
+        summary = client.get(url).json
+        answers.append((summary['cost_count'], summary['total_approved_costs']))
+    assert answers == [(1, '5.00'), (1, '5.00')]
+
+
+def test_budget_ledger_tracks_approved_spend(app, client, post, put):
+    from src.budget_ledger import reconcile_budgets
+
+    budget_id = post('/api/budgets', {"name": "Ops", "total_budget": 100}).json['id']
+    other_id = post('/api/budgets', {"name": "Other", "total_budget": 50}).json['id']
+    cost_id = post('/api/costs', {"description": "Servers", "amount": 30,
+                                          "budget_allocation_id": budget_id}).json['id']
+    assert client.get(f'/api/budgets/{budget_id}').json['spent_budget'] == 0
+
+    post(f'/api/costs/{cost_id}/approve', {})
+    put(f'/api/costs/{cost_id}', {"amount": 45.5})
+    budget = client.get(f'/api/budgets/{budget_id}').json
+    assert (budget['spent_budget'], budget['remaining_budget'], budget['actual_spent_budget']) == (45.5, 54.5, 45.5)
+    assert 'allocated_costs' not in budget
+    assert len(client.get(f'/api/budgets/{budget_id}?include=costs').json['allocated_costs']) == 1
+
+    put(f'/api/costs/{cost_id}', {"budget_allocation_id": other_id})
+    assert client.get(f'/api/budgets/{other_id}').json['spent_budget'] == 45.5
+    client.delete(f'/api/costs/{cost_id}')
+    assert client.get(f'/api/budgets/{other_id}').json['remaining_budget'] == 50
+
+    entries = client.get(f'/api/budgets/{budget_id}/ledger').json['entries']
+    assert [(entry['reason'], entry['amount']) for entry in entries] == [
+        ('approval', 30), ('adjustment', 15.5), ('reallocation', -45.5)
+    ]
+    with app.app_context():
+        assert reconcile_budgets() == []
+
+def test_reconciliation_repairs_drifted_budgets(app, client, post):
+    from src.budget_ledger import reconcile_budgets
+
+    budget_id = post('/api/budgets', {"name": "Drift", "total_budget": 100}).json['id']
+    cost_id = post('/api/costs', {"description": "Approved", "amount": 20,
+                                          "budget_allocation_id": budget_id}).json['id']
+    post(f'/api/costs/{cost_id}/approve', {})
+    with app.app_context():
+        # A bulk update skips the flush events and so the ledger
+        Cost.query.filter_by(budget_allocation_id=budget_id).update({'amount': 25}, synchronize_session=False)
+        db.session.commit()
+        mismatches = reconcile_budgets(repair=True)
+        assert [(row['budget_id'], row['spent_budget'], row['approved_costs']) for row in mismatches] == [
+            (budget_id, Decimal('20.00'), Decimal('25.00'))
+        ]
+        assert reconcile_budgets() == []
+    assert client.get(f'/api/budgets/{budget_id}').json['remaining_budget'] == 75
+
+def test_report_currency_converts_at_date_effective_rates(app, client, tmp_path):
+    from src.fx import fx_rates, load_fx_rates
+
+    rates = tmp_path / 'rates.csv'
+    rates.write_text("currency,effective_date,rate\n"
+                     "EUR,2024-01-01,1.10\nEUR,2024-02-01,1.20\nGBP,2024-01-01,1.25\n")
+    with app.app_context():
+        assert load_fx_rates(str(rates)) == 3
+        today = fx_rates.rate('EUR')
+        project = Project(name="Abroad")
+        db.session.add(project)
+        db.session.flush()
+        db.session.add_all([
+            Contract(title="Euro", contract_number="C-EUR", project_id=project.id, total_value=Decimal('100'),
+                     currency='EUR'),
+            Budget(name="Pounds", project_id=project.id, total_budget=Decimal('80'), currency='GBP',
+                   approval_status='approved'),
+            Cost(project_id=project.id, amount=Decimal('10'), currency='EUR', status='approved',
+                 date_incurred=datetime(2024, 1, 15)),
+            Cost(project_id=project.id, amount=Decimal('10'), currency='EUR', status='approved',
+                 date_incurred=datetime(2024, 2, 15)),
+            Cost(project_id=project.id, amount=Decimal('5'), status='pending', date_incurred=datetime(2024, 2, 15)),
+        ])
+        db.session.commit()
+    assert today == Decimal('1.2')
+
+    usd = client.get('/api/financial-summary?report_currency=usd').json
+    assert usd['currency'] == 'USD'
+    assert (usd['total_approved_costs'], usd['total_pending_costs']) == ('23.00', '5.00')
+    assert (usd['total_contract_value'], usd['total_budget_allocated']) == ('120.00', '100.00')
+
+    eur = client.get('/api/financial-summary?report_currency=EUR&group_by=month').json
+    assert [(row['month'], row['total_approved_costs'], row['total_pending_costs']) for row in eur['breakdown']] == [
+        ('2024-01', '10.00', '0.00'), ('2024-02', '10.00', '4.17')
+    ]
+    assert client.get('/api/financial-summary').json['total_approved_costs'] == '20.00'
+    assert client.get('/api/financial-summary?report_currency=JPY').status_code == 400
+
+    with app.app_context():
+        db.session.add(Cost(amount=Decimal('1'), currency='EUR', status='approved', date_incurred=datetime(2023, 6, 1)))
+        db.session.commit()
+    response = client.get('/api/financial-summary?report_currency=USD')
+    assert response.status_code == 400
+    assert 'Missing exchange rates' in response.json['error']
+
+def test_converted_totals_do_not_change_when_rollups_compact(app, client, tmp_path):
+    from datetime import date
+    from src.cost_rollup import compact_cost_rollups
+    from src.fx import load_fx_rates
+
+    rates = tmp_path / 'rates.csv'
+    rates.write_text("currency,effective_date,rate\nEUR,2024-01-01,1.00\nEUR,2024-01-20,2.00\n")
+    with app.app_context():
+        load_fx_rates(str(rates))
+        db.session.add(Cost(amount=Decimal('10'), currency='EUR', status='approved',
+                            date_incurred=datetime(2024, 1, 25)))
+        db.session.commit()
+    urls = ['/api/financial-summary?report_currency=USD',
+            '/api/financial-summary?report_currency=USD&group_by=month']
+    before = [client.get(url).json for url in urls]
+    assert before[0]['total_approved_costs'] == '20.00'
+    with app.app_context():
+        compact_cost_rollups(before=date(2024, 2, 1))
+    assert [client.get(url).json for url in urls] == before
+
+def test_report_currency_needs_a_rate_in_effect_today(app, client, tmp_path):
+    from src.fx import load_fx_rates
+
+    rates = tmp_path / 'rates.csv'
+    rates.write_text("currency,effective_date,rate\nCHF,2999-01-01,1.10\n")
+    with app.app_context():
+        load_fx_rates(str(rates))
+    response = client.get('/api/financial-summary?report_currency=CHF')
+    assert response.status_code == 400
+    assert response.json['error'] == 'No exchange rate in effect today for CHF'
+
+def test_bulk_cost_import_streams_dedupes_and_validates(app, client, post, create_user):
+    project_id = post('/api/projects', {"name": "Imports"}).json['id']
+    budget_id = post('/api/budgets', {"name": "Vendors", "total_budget": 1000}).json['id']
+    post('/api/costs', {"description": "Earlier", "amount": 5, "vendor": "Acme", "invoice_number": "INV-1"})
+    approver_id = create_user("approver").json['id']
+
+    body = (
+        "description,amount,vendor,invoice_number,project_id,budget_allocation_id,status,date_incurred,approved_by\n"
+        f"Hosting,100.50,Acme,INV-2,{project_id},{budget_id},approved,2024-03-01T00:00:00,{approver_id}\n"
+        "Repeat,5,Acme,INV-1,,,,\n"
+        f"Same batch,1,Acme,INV-2,{project_id},,,\n"
+        "Bad amount,lots,Other,INV-9,,,,\n"
+        "Bad project,3,Other,INV-10,missing,,,\n"
+        f"Licences,20,Other,INV-11,{project_id},{budget_id},approved,2024-03-02T00:00:00,{approver_id}\n"
+        ",7,Other,INV-12,,,,\n"
+        "Not a number,NaN,Other,INV-13,,,,\n"
+        "Too large,1e12,Other,INV-14,,,,\n"
+    )
+    response = client.post('/api/costs/bulk?batch_size=3', data=body, content_type='text/csv')
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [(r['row'], r['status']) for r in results] == [
+        (1, 'created'), (2, 'duplicate'), (3, 'duplicate'), (4, 'error'), (5, 'error'), (6, 'created'), (7, 'error'),
+        (8, 'error'), (9, 'error')
+    ]
+    assert results[2]['id'] == results[0]['id']
+    assert [results[3]['error'], results[4]['error'], results[6]['error']] == [
+        'Invalid amount', 'Unknown project_id', 'Missing fields: description'
+    ]
+    assert results[7]['error'] == results[8]['error'] == 'Invalid amount'
+
+    imported = client.get(f'/api/costs/{results[0]["id"]}').json
+    assert (imported['amount'], imported['approved_by']) == (100.5, approver_id)
+    assert imported['approval_date'] is not None
+    assert client.get(f'/api/budgets/{budget_id}').json['spent_budget'] == 120.5
+    summary = client.get(f'/api/financial-summary?project_id={project_id}').json
+    assert (summary['total_approved_costs'], summary['cost_count']) == ('120.50', 2)
+
+    # A bad amount only fails its own row, not the chunk it arrived in
+    body = ("description,amount,tax_rate,currency,status,approved_by\nFine,1,,eur,,\nOdd,Infinity,,,,\n"
+            "Taxed,2,1000,,,\nEuros,3,,EUROS,,\nUnsigned,4,,,approved,\nStranger,4,,,paid,nobody\n")
+    response = client.post('/api/costs/bulk', data=body, content_type='text/csv')
+    checked = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [(r['status'], r.get('error')) for r in checked] == [
+        ('created', None), ('error', 'Invalid amount'), ('error', 'Invalid tax_rate'),
+        ('error', 'Invalid currency'), ('error', 'approved_by is required for status approved'),
+        ('error', 'Unknown approved_by')
+    ]
+    assert client.get(f"/api/costs/{checked[0]['id']}").json['currency'] == 'EUR'
+
+
+def test_contract_numbers_come_from_reserved_blocks(app, post):
+    from src.models.sequence import SequenceCounter
+    from src.numbering import SequenceAllocator, contract_numbers
+
+    app.config['CONTRACT_NUMBER_BLOCK_SIZE'] = 10
+    year = datetime.utcnow().year
+    numbers = [post('/api/contracts', {"title": f"C{index}"}).json['contract_number'] for index in range(12)]
+    assert numbers == [f'CNT-{year}-{index:06d}' for index in range(1, 13)]
+    assert post('/api/contracts', {"title": "Given", "contract_number": "X-1"}).json['contract_number'] == "X-1"
+
+    with app.app_context():
+        # Another worker reserves the block after this one's
+        other = SequenceAllocator('contract_number', 'CONTRACT_NUMBER_BLOCK_SIZE')
+        assert other.next_value() == 21
+        assert contract_numbers.next_value() == 13
+        assert db.session.get(SequenceCounter, 'contract_number').next_value == 31
@@ -0,0 +1,28 @@
+def create_users(create_user, count):
+    for i in range(count):
+        create_user(f"user{i}", last_name=f"User{i}")
+
+def test_offset_pagination(client, create_user):
+    create_users(create_user, 3)
+    response = client.get('/api/users?page=2&per_page=2')
+    assert response.status_code == 200
+    assert response.json['total'] == 3
+    assert response.json['pages'] == 2
+    assert len(response.json['users']) == 1
+
+def test_cursor_pagination_walks_all_rows(client, create_user):
+    create_users(create_user, 5)
+    seen = []
+    cursor = ''
+    while cursor is not None:
+        response = client.get(f'/api/users?per_page=2&cursor={cursor}')
+        assert response.status_code == 200
+        assert 'total' not in response.json
+        seen.extend(user['username'] for user in response.json['users'])
+        cursor = response.json['next_cursor']
+    assert sorted(seen) == [f"user{i}" for i in range(5)]
+
+def test_invalid_cursor(client):
+    response = client.get('/api/users?cursor=not-a-cursor')
+    assert response.status_code == 400
+    assert response.json['error'] == 'Invalid cursor'
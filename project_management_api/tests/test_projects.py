@@ -0,0 +1,255 @@
+import json
+from src.models.user import db
+from src.models.project import Task, ProjectTaskStats
+from src.task_stats import rebuild_task_stats
+
+def test_task_summary_follows_task_writes(app, client, create_project):
+    project_id = create_project("Counters")
+    other_id = create_project("Other")
+    assert client.get(f'/api/projects/{project_id}').json['task_summary']['total_tasks'] == 0
+
+    with app.app_context():
+        tasks = [Task(title=f"Task {i}", project_id=project_id) for i in range(4)]
+        tasks[0].status = 'completed'
+        tasks[1].status = 'blocked'
+        db.session.add_all(tasks)
+        db.session.commit()
+
+        tasks[2].status = 'in_progress'
+        tasks[3].project_id = other_id
+        db.session.delete(tasks[1])
+        db.session.commit()
+
+    summary = client.get(f'/api/projects/{project_id}').json['task_summary']
+    assert summary == {
+        'total_tasks': 2, 'completed_tasks': 1, 'in_progress_tasks': 1, 'blocked_tasks': 0
+    }
+    assert client.get(f'/api/projects/{other_id}').json['task_summary']['total_tasks'] == 1
+
+def test_rebuild_matches_incremental_counters(app, create_project):
+    project_id = create_project("Rebuild")
+    with app.app_context():
+        db.session.add_all([Task(title="A", project_id=project_id, status='review'),
+                            Task(title="B", project_id=project_id)])
+        db.session.commit()
+        incremental = db.session.get(ProjectTaskStats, project_id).to_summary()
+
+        rebuild_task_stats()
+        db.session.commit()
+        db.session.expire_all()
+        stats = db.session.get(ProjectTaskStats, project_id)
+        assert stats.to_summary() == incremental
+        assert (stats.total_tasks, stats.todo_tasks, stats.review_tasks) == (2, 1, 1)
+
+def test_tasks_carry_comment_count_and_expand_comments(app, client, capture_sql, post, create_project):
+    from src.models.comment import Comment
+    from src.models.user import User
+
+    project_id = create_project("Comments")
+    task_ids = [post('/api/tasks', {"title": f"Task {i}", "project_id": project_id}).json['id'] for i in range(3)]
+    with app.app_context():
+        author = User(username="commenter", email="c@example.com", first_name="C", last_name="U",
+                      password_hash="x")
+        db.session.add(author)
+        db.session.flush()
+        db.session.add_all([Comment(content=f"Note {i}", task_id=task_ids[0], user_id=author.id)
+                            for i in range(2)])
+        db.session.commit()
+
+    tasks = client.get(f'/api/projects/{project_id}/tasks').json
+    assert sorted(task['comment_count'] for task in tasks) == [0, 0, 2]
+    assert all('comments' not in task for task in tasks)
+
+    with capture_sql() as statements:
+        tasks = client.get(f'/api/projects/{project_id}/tasks?include=comments').json
+    assert sorted(len(task['comments']) for task in tasks) == [0, 0, 2]
+    assert len(statements) == 2
+
+    assert client.get(f'/api/tasks/{task_ids[0]}?expand=comments').json['comments'][0]['content'].startswith("Note")
+    assert client.get(f'/api/tasks/{task_ids[0]}?include=owner').status_code == 400
+
+def test_schedule_critical_path(client, create_project, create_task):
+    project_id = create_project("Schedule")
+    a = create_task(project_id, "A", estimated_hours=4).json['id']
+    b = create_task(project_id, "B", estimated_hours=2, dependencies=[a]).json['id']
+    c = create_task(project_id, "C", estimated_hours=5, dependencies=[a]).json['id']
+    d = create_task(project_id, "D", estimated_hours=1, dependencies=[b, c]).json['id']
+
+    schedule = client.get(f'/api/projects/{project_id}/schedule').json
+    assert schedule['duration_hours'] == 10
+    assert schedule['critical_path'] == [a, c, d]
+    tasks = {task['id']: task for task in schedule['tasks']}
+    assert (tasks[b]['earliest_start'], tasks[b]['slack']) == (4, 3)
+    assert tasks[d]['earliest_start'] == 9
+
+def test_late_tasks_off_the_longest_chain_are_not_critical(client, create_project, create_task):
+    project_id = create_project("Deadlines")
+    a = create_task(project_id, "A", estimated_hours=8).json['id']
+    b = create_task(project_id, "B", estimated_hours=2, dependencies=[a]).json['id']
+    # Overdue, but on a short chain of its own
+    late = create_task(project_id, "Late", estimated_hours=3, due_date="2000-01-01T00:00:00").json['id']
+
+    schedule = client.get(f'/api/projects/{project_id}/schedule').json
+    tasks = {task['id']: task for task in schedule['tasks']}
+    assert tasks[late]['slack'] < 0 and not tasks[late]['critical']
+    assert schedule['critical_path'] == [a, b]
+    assert tasks[a]['critical'] and tasks[b]['critical']
+
+def test_deleting_a_task_removes_it_from_dependents(client, post, create_project, create_task):
+    project_id = create_project("Cleanup")
+    a = create_task(project_id, "A", estimated_hours=1).json['id']
+    b = create_task(project_id, "B", estimated_hours=1).json['id']
+    c = create_task(project_id, "C", estimated_hours=1, dependencies=[a, b]).json['id']
+
+    client.delete(f'/api/tasks/{a}')
+    assert json.loads(client.get(f'/api/tasks/{c}').json['dependencies']) == [b]
+    post('/api/tasks/bulk', {"delete": [b]})
+    assert json.loads(client.get(f'/api/tasks/{c}').json['dependencies']) == []
+    assert client.get(f'/api/projects/{project_id}/schedule').json['critical_path'] == [c]
+
+def test_dependency_cycles_and_foreign_tasks_are_rejected(client, put, create_project, create_task):
+    project_id = create_project("Cycles")
+    other_id = create_project("Elsewhere")
+    a = create_task(project_id, "A").json['id']
+    b = create_task(project_id, "B", dependencies=[a]).json['id']
+    foreign = create_task(other_id, "X").json['id']
+
+    response = put(f'/api/tasks/{a}', {"dependencies": [b]})
+    assert response.status_code == 400
+    assert 'cycle' in response.json['error']
+    assert create_task(project_id, "C", dependencies=[foreign]).status_code == 400
+
+    client.delete(f'/api/tasks/{a}')
+    assert client.get(f'/api/projects/{project_id}/schedule').json['critical_path'] == [b]
+
+def test_task_tree_loads_subtree_in_one_query(app, client, capture_sql, put, create_project, create_task):
+
+    project_id = create_project("Tree")
+    root = create_task(project_id, "Root", estimated_hours=2, progress_percentage=0).json['id']
+    child = create_task(project_id, "Child", parent_task_id=root, estimated_hours=6).json['id']
+    create_task(project_id, "Leaf", parent_task_id=child, estimated_hours=2)
+    create_task(project_id, "Sibling", parent_task_id=root)
+    put(f'/api/tasks/{child}', {"progress_percentage": 50, "actual_hours": 4})
+
+    with capture_sql() as statements:
+        tree = client.get(f'/api/tasks/{root}/tree?rollup=true').json
+    assert len(statements) == 1
+    assert [task['title'] for task in tree['subtasks']] == ["Child", "Sibling"]
+    assert tree['subtasks'][0]['subtasks'][0]['title'] == "Leaf"
+    assert tree['rollup'] == {'task_count': 4, 'estimated_hours': 10, 'actual_hours': 4,
+                              'progress_percentage': 27.27}
+
+    shallow = client.get(f'/api/tasks/{root}/tree?depth=1').json
+    assert shallow['subtasks'][0]['subtasks'] == []
+    assert 'rollup' not in shallow
+    assert client.get('/api/tasks/missing/tree').status_code == 404
+
+def test_bulk_task_operations(client, post, create_project, create_task):
+    project_id = create_project("Sprint")
+    ids = [create_task(project_id, f"Bulk {i}").json['id'] for i in range(4)]
+
+    response = post('/api/tasks/bulk', {
+        "create": [{"title": "Fresh", "project_id": project_id, "status": "in_progress"}],
+        "update": [{"id": ids[0], "status": "completed"}, {"id": ids[1], "status": "completed"},
+                   {"id": ids[2], "priority": "high", "due_date": "2030-01-01T00:00:00"}],
+        "delete": [ids[3]]
+    })
+    assert response.status_code == 200
+    assert response.json['updated'] == ids[:3]
+    assert response.json['deleted'] == [ids[3]]
+
+    assert client.get(f'/api/tasks/{ids[0]}').json['completed_at'] is not None
+    assert client.get(f'/api/tasks/{ids[2]}').json['priority'] == 'high'
+    assert client.get(f'/api/tasks/{ids[3]}').status_code == 404
+    assert client.get('/api/tasks/search?q=bulk').json[-1]['id'] != ids[3]
+    assert len(client.get('/api/tasks/search?q=bulk').json) == 3
+    assert client.get(f'/api/projects/{project_id}').json['task_summary'] == {
+        'total_tasks': 4, 'completed_tasks': 2, 'in_progress_tasks': 1, 'blocked_tasks': 0
+    }
+
+def test_bulk_task_operations_are_all_or_nothing(client, post, create_project, create_task):
+    project_id = create_project("Rejected")
+    task_id = create_task(project_id, "Keep").json['id']
+
+    response = post('/api/tasks/bulk', {
+        "create": [{"title": "Never", "project_id": project_id}],
+        "update": [{"id": task_id, "status": "done"}, {"id": "missing", "status": "blocked"}],
+        "delete": [task_id]
+    })
+    assert response.status_code == 400
+    assert [(error['op'], error['index']) for error in response.json['errors']] == [
+        ('update', 0), ('update', 1), ('delete', 0)
+    ]
+    assert client.get(f'/api/projects/{project_id}').json['task_summary']['total_tasks'] == 1
+
+    response = post('/api/tasks/bulk', {"create": [
+        {"title": "Bad start", "project_id": project_id, "start_date": "someday"},
+        {"title": "Bad dependency", "project_id": project_id, "dependencies": ["missing"]},
+        {"title": "Fine", "project_id": project_id, "dependencies": [task_id]},
+        {"title": "Also bad", "project_id": project_id, "dependencies": ["gone"]},
+    ]})
+    assert response.status_code == 400
+    assert [(error['index'], error['error']) for error in response.json['errors']] == [
+        (0, 'Invalid start_date: someday')
+    ]
+
+    response = post('/api/tasks/bulk', {"create": [
+        {"title": "Bad dependency", "project_id": project_id, "dependencies": ["missing"]},
+        {"title": "Fine", "project_id": project_id, "dependencies": [task_id]},
+        {"title": "Also bad", "project_id": project_id, "dependencies": ["gone"]},
+    ]})
+    assert response.status_code == 400
+    assert [(error['index'], error['error']) for error in response.json['errors']] == [
+        (0, 'Unknown dependency in this project: missing'), (2, 'Unknown dependency in this project: gone')
+    ]
+    assert client.get(f'/api/projects/{project_id}').json['task_summary']['total_tasks'] == 1
+
+def test_bulk_tasks_rejects_a_body_that_is_not_an_object(post):
+    for body in ([], "create", 3):
+        response = post('/api/tasks/bulk', body)
+        assert response.status_code == 400
+
+def test_bulk_creates_cannot_hang_off_tasks_deleted_alongside(client, post, create_project, create_task):
+    project_id = create_project("Parents")
+    doomed = create_task(project_id, "Doomed").json['id']
+    keeper = create_task(project_id, "Keeper").json['id']
+
+    response = post('/api/tasks/bulk', {
+        "create": [
+            {"title": "Orphan", "project_id": project_id, "parent_task_id": doomed},
+            {"title": "Nowhere", "project_id": project_id, "parent_task_id": "missing"},
+            {"title": "Waits", "project_id": project_id, "dependencies": [keeper, doomed]},
+            {"title": "Fine", "project_id": project_id, "parent_task_id": keeper, "dependencies": [keeper]},
+        ],
+        "delete": [doomed]
+    })
+    assert response.status_code == 400
+    assert [(error['index'], error['error']) for error in response.json['errors']] == [
+        (0, 'Parent task is deleted in this request'), (1, 'Parent task not found'),
+        (2, f'Dependency deleted in this request: {doomed}')
+    ]
+    assert client.get(f'/api/projects/{project_id}').json['task_summary']['total_tasks'] == 2
+
+def test_board_groups_top_tasks_per_column_in_one_query(app, client, capture_sql, create_project, create_task):
+
+    project_id = create_project("Board")
+    low = create_task(project_id, "Low", priority="low").json['id']
+    late = create_task(project_id, "Late", priority="high", due_date="2030-06-01T00:00:00").json['id']
+    undated = create_task(project_id, "Undated", priority="high").json['id']
+    soon = create_task(project_id, "Soon", priority="high", due_date="2030-01-01T00:00:00").json['id']
+    urgent = create_task(project_id, "Urgent", priority="critical").json['id']
+    done = create_task(project_id, "Done", status="completed").json['id']
+
+    with capture_sql() as statements:
+        board = client.get(f'/api/projects/{project_id}/board?limit=4&fields=title').json
+    assert len(statements) == 2  # the project lookup and the board itself
+
+    columns = {column['status']: column for column in board['columns']}
+    assert [column['status'] for column in board['columns']][:2] == ['todo', 'in_progress']
+    assert columns['todo']['total'] == 5
+    assert [task['id'] for task in columns['todo']['tasks']] == [urgent, soon, late, undated]
+    assert low not in [task['id'] for task in columns['todo']['tasks']]
+    assert columns['todo']['tasks'][0] == {'id': urgent, 'title': "Urgent"}
+    assert [task['id'] for task in columns['completed']['tasks']] == [done]
+    assert columns['blocked'] == {'status': 'blocked', 'total': 0, 'tasks': []}
+    assert client.get('/api/projects/missing/board').status_code == 404
@@ -0,0 +1,11 @@
+from src.models.project import Task
+from src.query_audit import audit
+
+def test_list_query_shapes_use_indexes(app):
+    with app.app_context():
+        assert audit() == {}
+
+def test_audit_flags_full_scans(app):
+    with app.app_context():
+        findings = audit({'priority only': lambda: Task.query.filter(Task.priority == 'high')})
+    assert findings == {'priority only': ['SCAN tasks']}
@@ -0,0 +1,143 @@
+def test_role_hierarchy(client, create_role):
+    root = create_role("Engineering")
+    lead = create_role("Lead", root['id'])
+    dev = create_role("Developer", lead['id'])
+    create_role("Intern", dev['id'])
+
+    response = client.get(f"/api/roles/{lead['id']}/hierarchy")
+    assert [a['name'] for a in response.json['ancestors']] == ['Engineering']
+    descendants = response.json['descendants']
+    assert [d['name'] for d in descendants] == ['Developer']
+    assert [d['name'] for d in descendants[0]['subroles']] == ['Intern']
+
+def test_rename_cascades_paths(client, put, create_role):
+    root = create_role("Engineering")
+    lead = create_role("Lead", root['id'])
+    dev = create_role("Developer", lead['id'])
+
+    response = put(f"/api/roles/{root['id']}", {"name": "R&D"})
+    assert response.json['path'] == '/R&D'
+    assert client.get(f"/api/roles/{dev['id']}").json['path'] == '/R&D/Lead/Developer'
+
+def test_move_subtree(client, put, create_role):
+    eng = create_role("Engineering")
+    ops = create_role("Operations")
+    lead = create_role("Lead", eng['id'])
+    dev = create_role("Developer", lead['id'])
+
+    response = put(f"/api/roles/{lead['id']}", {"parent_role_id": ops['id']})
+    assert response.status_code == 200
+    moved = client.get(f"/api/roles/{dev['id']}").json
+    assert moved['path'] == '/Operations/Lead/Developer'
+    assert moved['level'] == 2
+
+    hierarchy = client.get(f"/api/roles/{dev['id']}/hierarchy").json
+    assert [a['name'] for a in hierarchy['ancestors']] == ['Operations', 'Lead']
+    assert client.get(f"/api/roles/{eng['id']}/hierarchy").json['descendants'] == []
+
+    response = put(f"/api/roles/{lead['id']}", {"parent_role_id": None})
+    assert client.get(f"/api/roles/{dev['id']}").json['path'] == '/Lead/Developer'
+    assert client.get(f"/api/roles/{dev['id']}").json['level'] == 1
+
+def test_move_under_own_descendant_is_rejected(put, create_role):
+    root = create_role("Engineering")
+    lead = create_role("Lead", root['id'])
+
+    response = put(f"/api/roles/{root['id']}", {"parent_role_id": lead['id']})
+    assert response.status_code == 400
+
+def test_effective_permissions(client, create_user, post, put, create_role):
+    user_id = create_user("perm").json['id']
+    root = post('/api/roles', {
+        "name": "Manager", "permissions": ["approve_costs"], "can_view_reports": True
+    }).json
+    child = create_role("Analyst", root['id'])
+
+    assert client.get(f'/api/users/{user_id}/permissions').json['permissions'] == []
+
+    assignment = post('/api/user-roles', {
+        "user_id": user_id, "role_id": child['id']
+    }).json
+    permissions = client.get(f'/api/users/{user_id}/permissions').json['permissions']
+    assert sorted(permissions) == ['approve_costs', 'view_reports']
+
+    put(f"/api/roles/{root['id']}", {"permissions": ["export_data"]})
+    permissions = client.get(f'/api/users/{user_id}/permissions').json['permissions']
+    assert sorted(permissions) == ['export_data', 'view_reports']
+
+    client.delete(f"/api/user-roles/{assignment['id']}")
+    assert client.get(f'/api/users/{user_id}/permissions').json['permissions'] == []
+
+def test_permission_bits_do_not_depend_on_what_a_worker_saw_first(app, client, create_user, post):
+    from src.permissions import PermissionResolver
+
+    users = []
+    for index, permissions in enumerate((["zeta"], ["alpha"])):
+        users.append(create_user(f"bits{index}").json['id'])
+        role = post('/api/roles', {
+            "name": f"Bits{index}", "permissions": permissions
+        }).json
+        post('/api/user-roles', {"user_id": users[-1], "role_id": role['id']})
+
+    assert 'mask' not in client.get(f'/api/users/{users[0]}/permissions').json
+    with app.app_context():
+        first, second = PermissionResolver(), PermissionResolver()
+        masks = [first.get_mask(users[0]), first.get_mask(users[1])]
+        assert [second.get_mask(users[1]), second.get_mask(users[0])] == masks[::-1]
+        assert first.names(masks[0]) == ['zeta'] and first.has_permission(users[1], 'alpha')
+
+def test_role_users_query_count_is_constant(client, create_user, capture_sql, post, create_role):
+    role = create_role("Reviewer")
+
+    def count_queries(count):
+        for i in range(count):
+            user_id = create_user(f"u{count}_{i}").json['id']
+            post('/api/user-roles', {"user_id": user_id, "role_id": role['id']})
+        with capture_sql() as statements:
+            response = client.get(f"/api/roles/{role['id']}/users")
+        return len(response.json), len(statements)
+
+    assert count_queries(1)[1] == count_queries(4)[1]
+
+def test_expired_assignments_are_hidden_and_swept(app, client, create_user, post, create_role):
+    from src.models.role import UserRole
+
+    user_id = create_user("temp").json['id']
+    role = create_role("Contractor")
+    post('/api/user-roles', {
+        "user_id": user_id, "role_id": role['id'], "expires_at": "2000-01-01T00:00:00"
+    })
+
+    assert client.get(f'/api/users/{user_id}/roles').json == []
+    assert client.get(f"/api/roles/{role['id']}/users").json == []
+
+    assert app.extensions['jobs']['expire_role_assignments'].run_once() == 1
+    with app.app_context():
+        assert UserRole.query.filter_by(user_id=user_id).one().status == 'expired'
+
+def test_periodic_job_runs_once_per_interval_across_workers(app):
+    from src.jobs import PeriodicJob
+    from src.models.lease import JobLease
+
+    runs = []
+    def worker(owner, fails=False):
+        def job():
+            if fails:
+                raise RuntimeError("boom")
+            runs.append(owner)
+            return owner
+        periodic = PeriodicJob(app, 'sweep', 60, job)
+        periodic.owner = owner
+        return periodic
+
+    assert worker('host:1').run_once() == 'host:1'
+    # The lease is kept for the rest of the interval
+    assert worker('host:2').run_once() is None
+    assert runs == ['host:1']
+
+    with app.app_context():
+        JobLease.release('sweep', 'host:1')
+    # A failed run hands the lease back straight away
+    assert worker('host:3', fails=True).run_once() is None
+    assert worker('host:2').run_once() == 'host:2'
+    assert runs == ['host:1', 'host:2']
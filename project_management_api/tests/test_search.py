@@ -0,0 +1,57 @@
+def test_search_uses_fts_index(app, client, create_user):
+    assert app.extensions['search'] == 'sqlite'
+    create_user("alice", first_name="Alice")
+    create_user("bob", first_name="Robert")
+
+    response = client.get('/api/users?search=ali')
+    assert [user['username'] for user in response.json['users']] == ['alice']
+
+def test_search_index_follows_updates(client, create_user, put):
+    user_id = create_user("carol", bio="kubernetes operator").json['id']
+    assert len(client.get('/api/users/search?q=kubernetes').json) == 1
+
+    put(f'/api/users/{user_id}', {"bio": "terraform"})
+    assert client.get('/api/users/search?q=kubernetes').json == []
+    assert len(client.get('/api/users/search?q=terraform').json) == 1
+
+def test_search_ranks_best_match_first(client, post):
+    post('/api/projects', {
+        "name": "Billing", "description": "invoicing service with an optional vision based receipt scanner"
+    })
+    post('/api/projects', {
+        "name": "Vision", "description": "vision models"
+    })
+    post('/api/projects', {
+        "name": "Other", "description": "unrelated"
+    })
+
+    names = [p['name'] for p in client.get('/api/projects?search=vision').json['projects']]
+    assert names == ['Vision', 'Billing']
+
+def test_search_index_drops_deleted_rows(client, post):
+    model_id = post('/api/ai-models', {"name": "Sentiment classifier"}).json['id']
+    assert client.get('/api/ai-models?search=sentiment').json['total'] == 1
+
+    client.delete(f'/api/ai-models/{model_id}')
+    assert client.get('/api/ai-models?search=sentiment').json['total'] == 0
+
+def test_skill_search_matches_whole_skills(client, create_user):
+    create_user("gopher", skills=["Go", "Kubernetes"])
+    create_user("djangonaut", skills=["Django", "Python"])
+    create_user("polyglot", skills=["python", "go"])
+
+    response = client.get('/api/users/search?skills=go')
+    assert sorted(user['username'] for user in response.json) == ['gopher', 'polyglot']
+
+    response = client.get('/api/users/search?skills=Go&skills=Python')
+    assert [user['username'] for user in response.json] == ['polyglot']
+
+def test_skill_search_any_with_ranking(client, create_user, put):
+    create_user("gopher", skills=["Go", "Kubernetes"])
+    user_id = create_user("polyglot", skills=["Python"]).json['id']
+    put(f'/api/users/{user_id}', {"skills": ["Python", "Go", "Rust"]})
+
+    response = client.get('/api/users/search?skills=go&skills=rust&skills_match=any&rank_by_skills=true')
+    assert [(user['username'], user['skill_match_score']) for user in response.json] == [
+        ('polyglot', 1.0), ('gopher', 0.5)
+    ]
@@ -0,0 +1,116 @@
+import json
+
+def test_bulk_import_ndjson(client, create_user, post):
+    create_user("existing", first_name="Old")
+
+    rows = [
+        {"username": "ann", "email": "ann@example.com", "password": "pw", "first_name": "Ann",
+         "last_name": "Lee", "skills": ["Go"]},
+        {"username": "existing", "email": "new@example.com", "password": "pw", "first_name": "X",
+         "last_name": "Y"},
+        {"username": "ann2", "email": "ann@example.com", "password": "pw", "first_name": "Ann",
+         "last_name": "Lee"},
+        {"username": "ben", "email": "ben@example.com", "first_name": "Ben", "last_name": "Ng"},
+    ]
+    body = '\n'.join(json.dumps(row) for row in rows) + '\nnot json\n'
+    response = client.post('/api/users/bulk?batch_size=2', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+
+    results = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [(r['row'], r['status']) for r in results] == [
+        (1, 'created'), (2, 'error'), (3, 'error'), (4, 'error'), (5, 'error')
+    ]
+    assert results[1]['error'] == 'Username already exists'
+    assert results[2]['error'] == 'Email already exists'
+    assert results[4]['error'] == 'Invalid JSON'
+
+    assert [u['username'] for u in client.get('/api/users/search?skills=go').json] == ['ann']
+    assert client.get('/api/users?search=ann').json['total'] == 1
+    login = post('/api/auth/login', {
+        "username_or_email": "ann", "password": "pw"
+    })
+    assert login.status_code == 200
+
+def test_bulk_import_reports_a_failed_batch_and_carries_on(client, monkeypatch):
+    from src.errors import HttpException
+    from src.hashing import password_hasher
+
+    calls = []
+    hash_many = password_hasher.hash_many
+    def busy_once(passwords):
+        calls.append(len(passwords))
+        if len(calls) == 1:
+            raise HttpException(503, 'Authentication service is busy, please retry')
+        return hash_many(passwords)
+    monkeypatch.setattr(password_hasher, 'hash_many', busy_once)
+
+    body = "username,email,password,first_name,last_name\n" + "".join(
+        f"busy{i},busy{i}@example.com,pw,B,U\n" for i in range(3)
+    )
+    response = client.post('/api/users/bulk?batch_size=2', data=body, content_type='text/csv')
+    results = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [(r['row'], r['status'], r.get('error')) for r in results] == [
+        (1, 'error', 'Authentication service is busy, please retry'),
+        (2, 'error', 'Authentication service is busy, please retry'),
+        (3, 'created', None)
+    ]
+
+def test_bulk_import_csv(client):
+    body = (
+        "username,email,password,first_name,last_name,skills,hourly_rate\n"
+        "cara,cara@example.com,pw,Cara,Diaz,Python;SQL,45.50\n"
+        "dev,dev@example.com,pw,Dev,Rao,,abc\n"
+    )
+    response = client.post('/api/users/bulk', data=body, content_type='text/csv')
+    results = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [r['status'] for r in results] == ['created', 'error']
+    assert results[1]['error'] == 'Invalid hourly_rate'
+
+def test_bulk_import_rejects_unknown_format(client):
+    response = client.post('/api/users/bulk', data='{}', content_type='application/json')
+    assert response.status_code == 415
+
+def test_workload_buckets_remaining_hours_by_week(app, client):
+    from datetime import datetime
+    from src.models.user import db, User
+    from src.models.project import Project, ProjectTeam, Task
+
+    with app.app_context():
+        busy = User(username="busy", email="busy@example.com", first_name="B", last_name="U",
+                    password_hash="x", availability_status='busy')
+        free = User(username="free", email="free@example.com", first_name="F", last_name="U",
+                    password_hash="x")
+        project = Project(name="Load")
+        db.session.add_all([busy, free, project])
+        db.session.flush()
+        db.session.add(ProjectTeam(project_id=project.id, user_id=free.id, role_in_project='developer',
+                                   contribution_percentage=50))
+        db.session.add_all([
+            # overdue, lands in the first week
+            Task(title="Late", project_id=project.id, assigned_to=busy.id, estimated_hours=30,
+                 actual_hours=5, due_date=datetime(2029, 12, 20)),
+            Task(title="Week 2", project_id=project.id, assigned_to=busy.id, estimated_hours=8,
+                 due_date=datetime(2030, 1, 9)),
+            Task(title="Done", project_id=project.id, assigned_to=busy.id, estimated_hours=50,
+                 status='completed', due_date=datetime(2030, 1, 9)),
+            Task(title="Someday", project_id=project.id, assigned_to=free.id, estimated_hours=6),
+            Task(title="Over", project_id=project.id, assigned_to=free.id, estimated_hours=4,
+                 actual_hours=9, due_date=datetime(2030, 1, 2)),
+            Task(title="Far", project_id=project.id, assigned_to=free.id, estimated_hours=100,
+                 due_date=datetime(2031, 1, 1)),
+        ])
+        db.session.commit()
+        busy_id, free_id = busy.id, free.id
+
+    workload = client.get('/api/workload?start=2030-01-01&weeks=3').json
+    assert workload['start'] == '2029-12-31T00:00:00'
+    assert workload['weeks'] == ['2029-12-31', '2030-01-07', '2030-01-14']
+    first, second = workload['users']
+    assert first['user_id'] == busy_id
+    assert (first['capacity_hours'], first['load_hours']) == (20, [25, 8, 0])
+    assert first['overloaded_weeks'] == [0]
+    assert second['user_id'] == free_id
+    assert (second['capacity_hours'], second['load_hours'], second['unscheduled_hours']) == (20, [0, 0, 0], 6)
+
+    overloaded = client.get('/api/workload?start=2030-01-01&weeks=3&overloaded=true').json['users']
+    assert [entry['user_id'] for entry in overloaded] == [busy_id]